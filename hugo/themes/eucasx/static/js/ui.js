@@ -27,3 +27,198 @@
         toggleClass(menuLink, active);
     };
 }(this, this.document));
+
+// Tables written as data files by the plugins (see pages.large_table()):
+// only the rows scrolled into view are in the page, so tables of tens of
+// thousands of rows stay responsive.
+(function (window, document) {
+    var VIEW_ROWS = 25,
+        OVERSCAN = 10;
+
+    function cellText(value) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        if (typeof value === 'object') {
+            return value.h.replace(/<[^>]*>/g, '').replace(/&lt;/g, '<').replace(/&gt;/g, '>')
+                          .replace(/&quot;/g, '"').replace(/&#39;/g, "'").replace(/&amp;/g, '&');
+        }
+        return String(value);
+    }
+
+    function sortKey(value) {
+        var text;
+        if (typeof value === 'number') {
+            return value;
+        }
+        text = cellText(value);
+        if (text !== '' && !isNaN(text)) {
+            return Number(text);
+        }
+        return text.toLowerCase();
+    }
+
+    function compareKeys(a, b) {
+        // Numbers sort before text
+        if (typeof a !== typeof b) {
+            return typeof a === 'number' ? -1 : 1;
+        }
+        return a < b ? -1 : (a > b ? 1 : 0);
+    }
+
+    function DataTable(element, data) {
+        var self = this,
+            i;
+        this.element = element;
+        this.columns = data.columns;
+        this.rows = data.rows;
+        this.texts = [];
+        for (i = 0; i < this.rows.length; i++) {
+            this.texts.push(this.rows[i].map(cellText).join('\n').toLowerCase());
+        }
+        this.order = this.rows.map(function (row, index) { return index; });
+        this.visible = this.order;
+        this.sortColumn = -1;
+        this.descending = false;
+        this.rowHeight = 0;
+        this.first = -1;
+
+        element.innerHTML = '';
+        this.controls = document.createElement('div');
+        this.controls.className = 'eucasx-table-controls';
+        this.filter = document.createElement('input');
+        this.filter.type = 'search';
+        this.filter.placeholder = 'Filter';
+        this.count = document.createElement('span');
+        this.controls.appendChild(this.filter);
+        this.controls.appendChild(this.count);
+
+        this.head = document.createElement('table');
+        this.head.className = 'pure-table pure-table-bordered eucasx-table-head';
+        this.headRow = this.head.createTHead().insertRow(-1);
+        this.columns.forEach(function (column, index) {
+            var th = document.createElement('th');
+            th.textContent = column;
+            th.title = 'Sort by ' + column;
+            th.onclick = function () { self.sort(index); };
+            self.headRow.appendChild(th);
+        });
+
+        this.view = document.createElement('div');
+        this.view.className = 'eucasx-table-view';
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'eucasx-table-spacer';
+        this.body = document.createElement('table');
+        this.body.className = 'pure-table pure-table-bordered eucasx-table-body';
+        this.tbody = document.createElement('tbody');
+        this.body.appendChild(this.tbody);
+        this.spacer.appendChild(this.body);
+        this.view.appendChild(this.spacer);
+
+        element.appendChild(this.controls);
+        element.appendChild(this.head);
+        element.appendChild(this.view);
+
+        this.view.onscroll = function () { self.render(false); };
+        this.filter.oninput = function () {
+            window.clearTimeout(self.filterTimer);
+            self.filterTimer = window.setTimeout(function () { self.update(); }, 150);
+        };
+        this.update();
+    }
+
+    DataTable.prototype.sort = function (index) {
+        var rows = this.rows,
+            keys = rows.map(function (row) { return sortKey(row[index]); }),
+            sign;
+        this.descending = this.sortColumn === index ? !this.descending : false;
+        this.sortColumn = index;
+        sign = this.descending ? -1 : 1;
+        this.order = rows.map(function (row, i) { return i; });
+        this.order.sort(function (a, b) {
+            return sign * compareKeys(keys[a], keys[b]) || a - b;
+        });
+        Array.prototype.forEach.call(this.headRow.cells, function (th, i) {
+            th.className = i === index ? (sign > 0 ? 'eucasx-sort-asc' : 'eucasx-sort-desc') : '';
+        });
+        this.update();
+    };
+
+    DataTable.prototype.update = function () {
+        var texts = this.texts,
+            words = this.filter.value.toLowerCase().split(/\s+/).filter(Boolean);
+        if (words.length) {
+            this.visible = this.order.filter(function (index) {
+                return words.every(function (word) { return texts[index].indexOf(word) !== -1; });
+            });
+        } else {
+            this.visible = this.order;
+        }
+        this.count.textContent = this.visible.length === this.rows.length ?
+                this.rows.length + ' rows' : this.visible.length + ' of ' + this.rows.length + ' rows';
+        this.view.scrollTop = 0;
+        this.render(true);
+    };
+
+    DataTable.prototype.renderRows = function (first, last) {
+        var tbody = document.createElement('tbody'),
+            i, j, tr, td, value;
+        for (i = first; i < last; i++) {
+            tr = tbody.insertRow(-1);
+            if (i % 2) {
+                tr.className = 'pure-table-odd';
+            }
+            for (j = 0; j < this.columns.length; j++) {
+                td = tr.insertCell(-1);
+                value = this.rows[this.visible[i]][j];
+                if (value !== null && typeof value === 'object') {
+                    td.innerHTML = value.h;
+                } else {
+                    td.textContent = cellText(value);
+                }
+                td.title = cellText(value);
+            }
+        }
+        this.body.replaceChild(tbody, this.tbody);
+        this.tbody = tbody;
+    };
+
+    DataTable.prototype.render = function (force) {
+        var total = this.visible.length,
+            first, last;
+        if (!this.rowHeight && total) {
+            // Measure a rendered row once, the rows can't wrap.
+            this.renderRows(0, 1);
+            this.rowHeight = this.tbody.rows[0].offsetHeight || 30;
+        }
+        first = Math.max(0, Math.floor(this.view.scrollTop / (this.rowHeight || 30)) - OVERSCAN);
+        first -= first % 2;
+        if (!force && first === this.first) {
+            return;
+        }
+        this.first = first;
+        last = Math.min(total, first + VIEW_ROWS + 2 * OVERSCAN);
+        this.view.style.height = Math.min(total, VIEW_ROWS) * this.rowHeight + 'px';
+        this.spacer.style.height = total * this.rowHeight + 'px';
+        this.body.style.top = first * this.rowHeight + 'px';
+        this.renderRows(first, last);
+    };
+
+    function load(element) {
+        var request = new XMLHttpRequest();
+        request.onreadystatechange = function () {
+            if (request.readyState !== 4) {
+                return;
+            }
+            if ((request.status >= 200 && request.status < 300) || (request.status === 0 && request.responseText)) {
+                new DataTable(element, JSON.parse(request.responseText));
+            } else {
+                element.textContent = 'Unable to load ' + element.getAttribute('data-src');
+            }
+        };
+        request.open('GET', element.getAttribute('data-src'), true);
+        request.send();
+    }
+
+    Array.prototype.forEach.call(document.querySelectorAll('.eucasx-table'), load);
+}(this, this.document));
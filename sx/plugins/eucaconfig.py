@@ -34,12 +34,35 @@ import subprocess
 import sx
 import sx.plugins
 from sx.logwriter import LogWriter
+from sx.plugins.lib.eucalyptus import model
+from sx.plugins.lib.eucalyptus import netconfig
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+from sx.plugins.lib.eucalyptus.confgroups import ConfigGroups, canonical_value
+from sx.plugins.lib.eucalyptus.hosts import HostIndex
+
+PROPERTIES_TABLE = pages.TableTemplate(["Property", "Value"], "<td>%s</td><td>%s</td>")
+HOST_CONFIG_TABLE = pages.TableTemplate(["Property", "Value", "Default"],
+                                        '<td>%s</td><td class="%s">%s</td><td style="white-space: nowrap">%s</td>')
+NETWORK_CONFIGURATION_PROPERTY = model.NETWORK_CONFIGURATION_PROPERTY
+IP_RANGES_TABLE = pages.TableTemplate(["Pool", "Entry", "First", "Last", "Addresses"],
+                                      "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+IP_OVERLAPS_TABLE = pages.TableTemplate(["Pool", "Entry", "Overlapping Pool", "Overlapping Entry", "Addresses"],
+                                        "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td class=\"red\">%s</td>")
+IP_COLLISIONS_TABLE = pages.TableTemplate(["Address", "Host", "Pool", "Entry"],
+                                          "<td class=\"red\">%s</td><td>%s</td><td>%s</td><td>%s</td>")
+IP_ERRORS_TABLE = pages.TableTemplate(["Pool", "Entry", "Error"], "<td>%s</td><td>%s</td><td>%s</td>")
+CONF_GROUPS_TABLE = pages.TableTemplate(["Configuration", "Hosts", "Members"], "<td>%s</td><td>%s</td><td>%s</td>")
 
 
 class Eucaconfig(sx.plugins.PluginBase):
     """
     Eucalyptus Configuration  
     """
+    # The report files read, for archive.extract().
+    REPORT_PATHS = reportdata.get_sources(reportdata.parse_config, reportdata.parse_topology)
 
     def __init__(self, pathToPluginReportDir=""):
         """
@@ -47,15 +70,21 @@ class Eucaconfig(sx.plugins.PluginBase):
         the report files will be written.
         @type pathToPluginReportDir: String
         """
+        options = dict(parallel.SETUP_OPTIONS)
+        options.update({pages.DATA_TABLES_OPTION: pages.DATA_TABLES_OPTION_DESCRIPTION})
         sx.plugins.PluginBase.__init__(self, "EucaConfig",
                                        "This plugin provides a list of possible process issues.",
                                        ["Sosreport", "Sysreport"], False, True,
-                                       {},
+                                       options,
                                        pathToPluginReportDir)
+        parallel.set_default_options(self)
+        self.setOptionValue(pages.DATA_TABLES_OPTION, 'off')
         self.euca_properties = {}
-        self.host_configs = {}
+        self.conf_groups = ConfigGroups()
+        self.ip_ranges = None
+        self.hosts = HostIndex()
         # Add properties that you want highlighted here in the html report..
-        self.highlight_properties = {"cloud.network.network_configuration": "json",
+        self.highlight_properties = {NETWORK_CONFIGURATION_PROPERTY: "json",
                                      }
 
         self.default_conf_values = {"EUCA_USER": '"eucalyptus"',
@@ -106,6 +135,7 @@ class Eucaconfig(sx.plugins.PluginBase):
                                     }
         self.default_property_values = {}
 
+    @perf.timed("setup")
     def setup(self, reports):
         """
         This function will setup data structure to hold any data/path
@@ -124,34 +154,20 @@ class Eucaconfig(sx.plugins.PluginBase):
         # 1 - try to find the CLC properties (which are found via euca-describe-properties output)
         # 2 - try to locate /etc/eucalyptus/eucalyptus.conf
         #
-        for report in reports:
-
-            # It is possible that a property value spans multiple lines (like the network configuration). In this case we need
-            # to read in the values carefully as apposed to just splitting the line.
-            key = None
-            rd = report.getDataFromFile("sos_commands/eucafrontend/euca-describe-properties")
-            if rd is not None:
-                for i in rd:
-                    i = i[:-1]  # chop newline
-                    if i.startswith("PROPERTY"):
-                        data = i.split(None, 2)[1:]  # We don't care about the 'PROPERTY' field
-                        key = data[0]
-                        value = data[1]
-                        self.euca_properties.setdefault(key, []).append(value)
-                    else:
-                        # append to last property until we reach a new state (read: PROPERTY)
-                        if key is not None:
-                            self.euca_properties[key].append(i)
+        cloud = model.get_model(self, reports)
+        self.euca_properties = cloud.getProperties()
+        # Hosts with identical configurations share a single group.
+        self.conf_groups = cloud.getConfGroups()
 
-            euca_conf_file = report.getDataFromFile("etc/eucalyptus/eucalyptus.conf")
-            if euca_conf_file is not None:
-                # need to strip the front of th estring possibly too...
-                conf_data = [tuple(i[:-1].split('=', 1))
-                             for i in euca_conf_file
-                             if not i.startswith("#")
-                             if len(i.strip()) > 0]
-                self.host_configs[report.getHostname()] = conf_data
+        #
+        # The address pools of the network configuration are checked
+        # against every address the reports know about.
+        #
+        self.ip_ranges = cloud.getAddressPools()
+        if self.ip_ranges is not None:
+            self.hosts = cloud.getHostIndex()
 
+    @perf.timed("execute")
     def execute(self):
         """
         This function should be overriden by the child if any
@@ -162,6 +178,7 @@ class Eucaconfig(sx.plugins.PluginBase):
         message = "Running execute for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("report")
     def report(self):
         """
         This function is where the reporting is done to console or to
@@ -178,66 +195,147 @@ class Eucaconfig(sx.plugins.PluginBase):
         # There should only be one
         #
         if len(self.euca_properties) > 0:
-            filename = "EucalyptusConfig.html"
-            self.write(filename, "+++")
-            self.write(filename, 'title="Cloud Configuration"')
-            self.write(filename, "weight=-1000")
-            self.write(filename, "+++")
-            self.write(filename, "")
-            self.write(filename, "<h2> Properties </h2>")
-            self.write(filename, "")
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            self.write(filename, "<th>Property</th><th>Value</th>")
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            for j, i in enumerate(sorted(self.euca_properties)):
-                # Lets treat the network config as a code highlight
-                value = "\n".join(self.euca_properties[i])
-                if i in self.highlight_properties:
-                    lang = self.highlight_properties[i]
-                    value = "<pre>" + value + "</pre>"
+            page = pages.Page(self, "EucalyptusConfig.html")
+            page.front_matter('title="Cloud Configuration"', "weight=-1000")
+            page.write("<h2> Properties </h2>")
+            page.write("")
+            page.large_table(PROPERTIES_TABLE, self.__property_rows(), "properties", len(self.euca_properties))
+            page.close()
 
-                self.write(filename, '<tr class="%s">' % 'pure-table-odd' if j % 2 != 0 else '<tr>')
-                self.write(filename, "<td>%s</td><td>%s</td>" % (i, value))
-                self.write(filename, '</tr>')
-            self.write(filename, '</tbody>')
-            self.write(filename, '</table>')
+        if self.ip_ranges is not None:
+            self.__write_network()
 
         #
-        # eucalyptus.conf files
+        # eucalyptus.conf files, one page per distinct configuration
         #
-	td_class_color = ''
-        for host in self.host_configs:
-            filename = "%s.md" % host
-            self.write(filename, '+++')
-            self.write(filename, 'title="Config for host %s"' % host)
-            self.write(filename, 'weight=-10')
-            self.write(filename, '+++')
-            self.write(filename, "")
-            self.write(filename, "## Properties (from configuration file)")
-            self.write(filename, "")
-            self.write(filename, "Note, items highlighted in RED denote a difference in configuration, not necessarily an error")
-            self.write(filename, "")
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            self.write(filename, '<th>Property</th><th>Value</th><th>Default</th>')
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            for j,i in enumerate(self.host_configs[host]):
-                def_value = ""
-                pvalue = i[1]
-                if i[0] in self.default_conf_values:
-                    def_value = self.default_conf_values[i[0]]
-                    if def_value != pvalue:
-                        td_class_color = 'red'
-                self.write(filename, '<tr class="%s">' % 'pure-table-odd' if j % 2 != 0 else '<tr>')
-                self.write(filename, '<td>%s</td><td class="%s">%s<td style="white-space: nowrap"> %s</td>' % (i[0],td_class_color, pvalue, def_value))
-                self.write(filename, '</tr>')
-                td_class_color = '' 
-            self.write(filename, '</tbody>')
-            self.write(filename, '</table>')
+        groups = self.conf_groups.getGroups()
+        for group in groups:
+            page = pages.Page(self, "conf-%s.md" % group.getName())
+            page.front_matter('title="Config %s (%d hosts)"' % (group.getName(), len(group.hosts)), "weight=-10")
+            page.write("## Hosts")
+            page.write("")
+            page.write(pages.escape(", ".join(sorted(group.hosts))))
+            page.write("")
+            page.write("## Properties (from configuration file)")
+            page.write("")
+            page.write("Note, items highlighted in RED denote a difference in configuration, not necessarily an error")
+            page.write("")
+            page.table(HOST_CONFIG_TABLE, self.__host_config_rows(group))
+            page.close()
+        if len(groups) > 0:
+            self.__write_conf_drift(groups)
+
+    def __property_rows(self):
+        for key in sorted(self.euca_properties):
+            value = pages.escape("\n".join(self.euca_properties[key]))
+            # Lets treat the network config as a code highlight
+            if key in self.highlight_properties:
+                value = "<pre>" + value + "</pre>"
+            yield key, pages.Raw(value)
+
+    def __write_network(self):
+        """
+        Writes the address pools of the network configuration, the
+        overlapping pools and the host addresses found inside a pool.
+        """
+        page = pages.Page(self, "EucalyptusNetwork.html")
+        page.front_matter('title="Network Address Pools"', "weight=-100")
+        page.write("<h2> Address Pools </h2>")
+        page.write("")
+        page.table(IP_RANGES_TABLE, ((r.pool, r.text, netconfig.int_to_ip(r.start), netconfig.int_to_ip(r.end),
+                                      r.getSize()) for r in self.ip_ranges.getRanges()))
+        if len(self.ip_ranges.getErrors()) > 0:
+            page.write("")
+            page.write("<h2> Invalid Entries </h2>")
+            page.write("")
+            page.table(IP_ERRORS_TABLE, self.ip_ranges.getErrors())
+        page.write("")
+        page.write("<h2> Overlapping Pools </h2>")
+        page.write("")
+        overlaps = self.ip_ranges.getOverlaps()
+        if len(overlaps) == 0:
+            page.write("<p>No entries overlap.</p>")
+        else:
+            page.table(IP_OVERLAPS_TABLE, ((a.pool, a.text, b.pool, b.text, self.__format_interval(first, last))
+                                           for a, b, first, last in overlaps))
+        page.write("")
+        page.write("<h2> Host Addresses inside a Pool </h2>")
+        page.write("")
+        collisions = self.ip_ranges.getCollisions(self.hosts.getAddresses())
+        if len(collisions) == 0:
+            page.write("<p>No known host address is inside a pool.</p>")
+        else:
+            page.table(IP_COLLISIONS_TABLE, ((ip, self.__format_host(ip), r.pool, r.text) for ip, r in collisions))
+        page.close()
+
+    def __format_interval(self, first, last):
+        if first == last:
+            return netconfig.int_to_ip(first)
+        return "%s - %s (%d)" % (netconfig.int_to_ip(first), netconfig.int_to_ip(last), last - first + 1)
+
+    def __format_host(self, ip):
+        names = set(self.hosts.getNames(ip))
+        report_host = self.hosts.getReportHost(ip)
+        if report_host is not None:
+            names.add(report_host)
+        return ", ".join(sorted(names))
+
+    def __write_conf_drift(self, groups):
+        """
+        Writes the list of distinct configurations and a matrix of the
+        keys that differ from the majority of the hosts.
+        """
+        page = pages.Page(self, "EucalyptusConfFiles.html")
+        page.front_matter('title="eucalyptus.conf Files"', "weight=-100")
+        page.write("<h2> Distinct Configurations </h2>")
+        page.write("")
+        page.table(CONF_GROUPS_TABLE,
+                   ((pages.Raw('<a href="../conf-%s/">%s</a>' % (g.getName(), g.getName())),
+                     len(g.hosts), ", ".join(sorted(g.hosts))) for g in groups))
+        page.write("")
+        page.write("<h2> Differences from the Majority </h2>")
+        page.write("")
+        drift_keys = self.conf_groups.getDriftKeys()
+        if len(drift_keys) == 0:
+            page.write("<p>All %d hosts have the same configuration.</p>" % self.conf_groups.getHostCount())
+        else:
+            page.write("<p>Only the values that differ from the majority of the hosts are shown.</p>")
+            page.write("")
+            headers = ["Property", "Majority"] + ["%s (%d)" % (g.getName(), len(g.hosts)) for g in groups]
+            matrix_table = pages.TableTemplate(headers, "%s" * len(headers))
+            page.table(matrix_table, self.__conf_drift_rows(drift_keys, groups))
+        page.close()
+
+    def __conf_drift_rows(self, drift_keys, groups):
+        majority = self.conf_groups.getMajorityValues()
+        for key in drift_keys:
+            row = [pages.cell(key), pages.cell(self.__conf_value_label(majority[key]))]
+            for group in groups:
+                value = group.values.get(key)
+                if value == majority[key]:
+                    row.append(pages.cell(""))
+                else:
+                    row.append(pages.cell(self.__conf_value_label(value), css_class="red"))
+            yield row
+
+    def __conf_value_label(self, value):
+        if value is None:
+            return "(not set)"
+        return value
+
+    def __host_config_rows(self, group):
+        # The canonical values are the same for every host of the group,
+        # whatever the quoting or order of their files.
+        for key, value in sorted(group.values.items()):
+            def_value = ""
+            td_class_color = ""
+            if key in self.default_conf_values:
+                def_value = canonical_value(self.default_conf_values[key])
+                if def_value != value:
+                    td_class_color = "red"
+            yield key, td_class_color, value, def_value
 
+    @perf.timed("action")
     def action(self):
         """
         This function performs some external task such as opening web
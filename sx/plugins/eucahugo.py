@@ -15,7 +15,10 @@
 # along with this program.  If not, see http://www.gnu.org/licenses/.
 """
 This plugin processes the output of other eucalyptus sxconsole
-plugins. It runs the Hugo command to generate a website.
+plugins. It runs the Hugo command to generate a website, or renders the
+site in-process when the renderer option is set to 'builtin'. The built
+site can be precompressed, and served by Hugo or by a builtin server
+that sends the precompressed files.
 
 Skeleton files are expected to be in: /usr/share/eucalyptus/hugo
 
@@ -27,19 +30,51 @@ It will need to be enabled.
 @version   :  1.0 
 """
 import os
+import time
 import shutil
+import socket
 import logging
 import subprocess
 
 import sx
 import sx.plugins
 from sx.logwriter import LogWriter
+from sx.plugins.lib.eucalyptus import manifest
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import precompress
+from sx.plugins.lib.eucalyptus import render
+from sx.plugins.lib.eucalyptus import server
+
+# Content hashes of the last build, kept in the report directory.
+MANIFEST_NAME = ".eucahugo-manifest.json"
+# The options that change the built site, recorded in the manifest.
+BUILD_OPTIONS = ["renderer"]
+# Content hashes of the precompressed files, kept in the report directory.
+PRECOMPRESS_MANIFEST_NAME = ".eucahugo-gzip-manifest.json"
+# Timing and I/O counters of the plugins, kept in the report directory.
+PERFORMANCE_FILE = "eucasx-performance.json"
+# Seconds to wait for hugo serve to open its port.
+SERVE_READY_TIMEOUT = 30
+
+PHASES_TABLE = pages.TableTemplate(["Plugin", "Setup", "Execute", "Report", "Action", "Build", "Total"],
+                                   "<td>%s</td>" * 7)
+COUNTERS_TABLE = pages.TableTemplate(["Plugin", "Files", "Bytes", "Lines", "Rows", "Pages"],
+                                     "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+PARSERS_TABLE = pages.TableTemplate(["Plugin", "Parser", "Seconds"], "<td>%s</td><td>%s</td><td>%s</td>")
+INPUTS_TABLE = pages.TableTemplate(["Input", "Plugin", "Files", "Bytes", "Lines"],
+                                   "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+# The (title, data file name) of the tables of the Performance page.
+PERFORMANCE_TABLES = [("Phases (seconds)", "phases"), ("Counters", "counters"),
+                      ("Parsers", "parsers"), ("Inputs", "inputs")]
 
 
 class Eucahugo(sx.plugins.PluginBase):
     """
     Eucalyptus HTML Generation using Hugo
     """
+    # The report files read, for archive.extract().
+    REPORT_PATHS = []
 
     def __init__(self, pathToPluginReportDir=""):
         """
@@ -50,18 +85,30 @@ class Eucahugo(sx.plugins.PluginBase):
         sx.plugins.PluginBase.__init__(self, "EucaHugo",
                                        "This plugin processes reports.",
                                        ["Sosreport", "Sysreport"], False, True,
-                                       {"serve": "Launches Hugo with the 'serve' command. [off]",
+                                       {"serve": "Serve the site with Hugo's 'serve' command when 'on', or with the builtin server of the precompressed site when 'static'. [off]",
                                         "port": "Port to use when serving pages. [4000]",
-                                        "skelfiles": "Files where Hugo defaults are located: [/usr/share/eucalyptus/hugo]"
+                                        "bind": "Address to serve pages on, 'all' for every interface. [127.0.0.1]",
+                                        "skelfiles": "Files where Hugo defaults are located: [/usr/share/eucalyptus/hugo]",
+                                        "incremental": "Only copy changed skeleton files and skip Hugo when no page changed. [on]",
+                                        "renderer": "Build the site with 'hugo' or with the 'builtin' renderer, which doesn't need Hugo installed. [hugo]",
+                                        "precompress": "Write gzip compressed copies of the text files of the built site for web servers. [off]",
+                                        "performance": "Add a Performance page with the timings and I/O counters of the plugins. [off]"
                                         },
                                        pathToPluginReportDir)
         self.setOptionValue("serve", 'off')
         self.setOptionValue("port", '4000')
+        self.setOptionValue("bind", '127.0.0.1')
         self.setOptionValue("skelfiles", '/usr/share/eucalyptus/hugo')
+        self.setOptionValue("incremental", 'on')
+        self.setOptionValue("renderer", 'hugo')
+        self.setOptionValue("precompress", 'off')
+        self.setOptionValue("performance", 'off')
 
-        self.default_hostname = "192.168.1.41" # sxconsole doesn't parse the options clean enough to allow passing ips addrs.
-        #self.setOptionValue("hostname", '127.0.0.1')
+        self.__skeleton = {}
+        self.__content = {}
+        self.__options = {}
 
+    @perf.timed("setup")
     def setup(self, reports):
         """
         This function will setup data structure to hold any data/path
@@ -75,6 +122,7 @@ class Eucahugo(sx.plugins.PluginBase):
         message = "Running setup for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("execute")
     def execute(self):
         """
         This function should be overriden by the child if any
@@ -85,6 +133,7 @@ class Eucahugo(sx.plugins.PluginBase):
         message = "Running execute for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("report")
     def report(self):
         """
         This function is where the reporting is done to console or to
@@ -93,11 +142,229 @@ class Eucahugo(sx.plugins.PluginBase):
         message = "Generating report for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    def __get_build_options(self):
+        return dict([(name, self.getOptionValue(name)) for name in BUILD_OPTIONS])
+
+    def __build_incremental(self, hugo_files, report_path):
+        """
+        Copies the skeleton files that changed since the last build and
+        compares the content pages and the BUILD_OPTIONS with the
+        manifest of the last build.
+
+        @return: True if Hugo needs to be run.
+        @rtype: Boolean
+        """
+        manifest_path = os.path.join(report_path, MANIFEST_NAME)
+        old = manifest.load(manifest_path)
+
+        skeleton = manifest.hash_tree(hugo_files)
+        old_skeleton = old.get("skeleton", {})
+        copied = []
+        for relpath in sorted(skeleton):
+            dst_file = os.path.join(report_path, relpath)
+            if old_skeleton.get(relpath) == skeleton[relpath] and os.path.exists(dst_file):
+                continue
+            if not os.path.isdir(os.path.dirname(dst_file)):
+                os.makedirs(os.path.dirname(dst_file))
+            shutil.copy2(os.path.join(hugo_files, relpath), dst_file)
+            copied.append(relpath)
+        if copied:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Copied %d changed skeleton files." % len(copied))
+
+        content = manifest.hash_tree(os.path.join(report_path, "content"))
+        added, changed, removed = manifest.diff(old.get("content", {}), content)
+        for label, paths in [("Added", added), ("Changed", changed), ("Removed", removed)]:
+            for relpath in paths:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).info("%s page: %s" % (label, relpath))
+
+        options = self.__get_build_options()
+        options_changed = old.get("options") != options
+        if options_changed:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).info("Build options changed: %s"
+                                                        % ", ".join(["%s=%s" % o for o in sorted(options.items())]))
+
+        self.__skeleton = skeleton
+        self.__content = content
+        self.__options = options
+        if removed or options_changed:
+            # Hugo doesn't remove the pages of deleted content from the
+            # destination, and the other renderer's pages must go.
+            shutil.rmtree(os.path.join(report_path, "public"), True)
+        if (copied or added or changed or removed or options_changed or not old.get("built") or
+                not os.path.isdir(os.path.join(report_path, "public"))):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Rebuilding the site, %d pages added, %d changed, %d removed."
+                                                          % (len(added), len(changed), len(removed)))
+            return True
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("No pages changed since the last build, skipping Hugo in %s" % report_path)
+        return False
+
+    def __save_manifest(self, report_path, built):
+        manifest.save(os.path.join(report_path, MANIFEST_NAME),
+                      {"skeleton": self.__skeleton, "content": self.__content, "options": self.__options,
+                       "built": built})
+
+    def __run_hugo(self, report_path):
+        """
+        Builds the site into report_path/public with the configured
+        renderer.
+
+        @return: The (returncode, stdout, stderr) of the build.
+        @rtype: Tuple
+        """
+        public_dir = os.path.join(report_path, "public")
+        if self.getOptionValue("renderer") == "builtin":
+            try:
+                urls = render.SiteRenderer(report_path, public_dir).render()
+            except (render.TemplateError, IOError, OSError), e:
+                return 1, "", "Failed to render the site: %s" % e
+            return 0, "Rendered %d pages" % len(urls), ""
+
+        command = ["hugo",'-s',report_path,'-d', public_dir]
+        try:
+            task = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError, e:
+            return 1, "", "Unable to run hugo (%s), set the renderer option to 'builtin' if Hugo isn't installed." % e
+        (stdout, stderr) = task.communicate()
+        return task.returncode, stdout, stderr
+
+    def __get_performance_dir(self):
+        # The data files are named after this plugin, like its data tables.
+        return os.path.basename(self.getPathToPluginReportDir().rstrip(os.sep))
+
+    def __write_performance(self, report_path):
+        """
+        Writes the Performance page into the content directory. The page
+        only holds the placeholders of the tables, whose data is written
+        after the build by __write_performance_data(), so it is the same
+        on every run and doesn't defeat the incremental build.
+        """
+        self.clean()
+        page = pages.Page(self, "Performance.html")
+        page.front_matter('title="Performance"', "weight=100", 'menu="main"')
+        page.write("<p>The timings and I/O counters of the last run, the site build included in the action of %s.</p>"
+                   % pages.escape(self.getName()))
+        for title, name in PERFORMANCE_TABLES:
+            page.write("")
+            page.write("<h2> %s </h2>" % title)
+            page.write("")
+            page.data_placeholder("/%s/%s/%s.json" % (pages.DATA_DIR, self.__get_performance_dir(), name), name)
+        page.close()
+
+        old_dir = self.getPathToPluginReportDir()
+        new_dir = os.path.join(report_path, "content", os.path.basename(old_dir))
+        if os.path.exists(new_dir):
+            shutil.rmtree(new_dir)
+        os.rename(old_dir, new_dir)
+
+    def __write_performance_data(self, report_path):
+        """
+        Writes the tables of the Performance page as data files in the
+        static directory, for the next build and hugo serve, and in the
+        built site, which the incremental build may not rebuild.
+        """
+        all_stats = perf.get_all_stats()
+        inputs = [(relpath, s.name) + tuple(counts) for s in all_stats for relpath, counts in s.inputs.items()]
+        tables = {"phases": (PHASES_TABLE, [[s.name] + [round(s.phases[p], 3) if p in s.phases else ""
+                                                        for p in perf.PHASES + ("build",)] +
+                                            [round(s.getTotalTime(), 3)] for s in all_stats]),
+                  "counters": (COUNTERS_TABLE, [[s.name] + [s.counters[c] for c in perf.COUNTERS] for s in all_stats]),
+                  "parsers": (PARSERS_TABLE, [(s.name, name, round(seconds, 3)) for s in all_stats
+                                              for name, seconds in sorted(s.parsers.items(), key=lambda p: -p[1])]),
+                  "inputs": (INPUTS_TABLE, sorted(inputs, key=lambda i: (-i[3], i[0], i[1])))}
+        for root in ("static", "public"):
+            if root == "public" and not os.path.isdir(os.path.join(report_path, root)):
+                continue
+            data_dir = os.path.join(report_path, root, pages.DATA_DIR, self.__get_performance_dir())
+            try:
+                if not os.path.isdir(data_dir):
+                    os.makedirs(data_dir)
+                for name, (template, rows) in tables.items():
+                    fout = open(os.path.join(data_dir, name + ".json"), "w")
+                    try:
+                        fout.write(pages.get_data_text(template, rows)[0])
+                    finally:
+                        fout.close()
+            except (IOError, OSError), e:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to write the performance data in %s: %s" % (data_dir, e))
+
+    def __save_performance(self, report_path, start):
+        perf.get_stats(self.getName()).add_time("action", time.time() - start)
+        perf.save(os.path.join(report_path, PERFORMANCE_FILE))
+        if self.getOptionValue("performance") == "on":
+            self.__write_performance_data(report_path)
+
+    def __precompress(self, report_path):
+        compressed, unchanged, removed = precompress.compress_tree(os.path.join(report_path, "public"),
+                                                                   os.path.join(report_path, PRECOMPRESS_MANIFEST_NAME))
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Precompressed %d files, %d unchanged, %d removed."
+                                                      % (compressed, unchanged, removed))
+
+    def __get_port(self):
+        try:
+            return int(self.getOptionValue("port"))
+        except (TypeError, ValueError):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Invalid value for option port: %s, using 4000." % self.getOptionValue("port"))
+            return 4000
+
+    def __serve(self, report_path):
+        """
+        Starts Hugo serving the site in the background, or leaves the
+        server of an earlier run running. Hugo rebuilds the pages itself
+        when the content changes.
+        """
+        running = server.get_server(report_path)
+        if running is not None:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Hugo is already serving %s at %s" % (report_path, running.getUrl()))
+            return
+        port = self.__get_port()
+        bind = server.get_bind_address(self.getOptionValue("bind"))
+        command = ["hugo", "serve", "--bind=%s" % bind, "--port=%d" % port, "-s", report_path]
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Command: %s" % " ".join(command))
+        hugo = server.ManagedServer("hugo", command, bind, port, cwd=report_path, ready_re=server.HUGO_READY_RE)
+        try:
+            hugo.start()
+        except OSError, e:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to run hugo serve: %s" % e)
+            return
+        server.register(report_path, hugo)
+        if hugo.waitReady(SERVE_READY_TIMEOUT):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Hugo is serving %s at %s" % (report_path, hugo.getUrl()))
+        elif hugo.isRunning():
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Hugo is not ready after %d seconds, it keeps starting in the background." % SERVE_READY_TIMEOUT)
+        else:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Hugo exited while starting to serve %s" % report_path)
+
+    def __serve_static(self, report_path):
+        """
+        Starts the builtin server of the built site in the background, or
+        leaves the server of an earlier run running. It serves the files
+        of the public directory as they are, so each build shows up on
+        the next page load.
+        """
+        public_dir = os.path.join(report_path, "public")
+        running = server.get_server(public_dir)
+        if running is not None:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Already serving %s at %s" % (public_dir, running.getUrl()))
+            return
+        if not os.path.isdir(public_dir):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("No site to serve in %s" % public_dir)
+            return
+        static = server.StaticServer("static", public_dir, server.get_bind_address(self.getOptionValue("bind")),
+                                     self.__get_port())
+        try:
+            static.start()
+        except socket.error, e:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to serve %s at %s: %s" % (public_dir, static.getUrl(), e))
+            return
+        server.register(public_dir, static)
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Serving %s at %s" % (public_dir, static.getUrl()))
+
     def action(self):
         """
         This function performs some external task such as opening web
         browser or file viewer to view a file.
         """
+        start = time.time()
         # Always print this message if you going to call this function
         # so that logging is notified that this function has been called.
         message = "Performing action for plugin: %s" % (self.getName())
@@ -112,38 +379,52 @@ class Eucahugo(sx.plugins.PluginBase):
             logging.getLogger(sx.MAIN_LOGGER_NAME).status("Failed to find a report directory: %s" % h)
             return -1
 
+        if self.getOptionValue("performance") == "on":
+            if not os.path.isdir(os.path.join(report_path, "content")):
+                os.mkdir(os.path.join(report_path, "content"))
+            self.__write_performance(report_path)
+
         # Lay down files needed by Hugo to build a proper "site"
         hugo_files = self.getOptionValue('skelfiles')
-        for fname in os.listdir(hugo_files):
-            src_file = os.path.join(hugo_files, fname)
-            dst_file = os.path.join(report_path, fname)
-            if os.path.isdir(src_file):
-                if not os.path.exists(dst_file):
-                    shutil.copytree(src_file, dst_file)
-            else:
-                shutil.copy2(src_file, dst_file)
+        build = True
+        if self.getOptionValue("incremental") == "on":
+            build = self.__build_incremental(hugo_files, report_path)
+        else:
+            for fname in os.listdir(hugo_files):
+                src_file = os.path.join(hugo_files, fname)
+                dst_file = os.path.join(report_path, fname)
+                if os.path.isdir(src_file):
+                    if not os.path.exists(dst_file):
+                        shutil.copytree(src_file, dst_file)
+                else:
+                    shutil.copy2(src_file, dst_file)
 
-        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Writing to: %s" % report_path)
-        command = ["hugo",'-s',report_path,'-d', os.path.join(report_path,"public")] 
-        task = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        (stdout, stderr) = task.communicate()
-        if task.returncode == 0:
-            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Ran Hugo in %s" % report_path)
-            if self.getOptionValue("serve") == "on":
-                port = self.getOptionValue("port")
-                hostname = self.default_hostname
-                logging.getLogger(sx.MAIN_LOGGER_NAME).status("Launching Hugo server on host: %s port: %s, dir: %s hit Ctrl-C to stop" % (hostname, port, report_path))
-                command = ["hugo", "serve", '--bind="%s"' % hostname, 
-                           '--port=%s' % port,
-                           "-s",os.path.join(report_path, "public")]
-                logging.getLogger(sx.MAIN_LOGGER_NAME).status("Command: %s", " ".join(command))
-                task = subprocess.Popen(command, cwd=report_path,
-                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                (stdout,stderr) = task.communicate()
-                logging.getLogger(sx.MAIN_LOGGER_NAME).status("HMMM")
+        if build:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Writing to: %s" % report_path)
+            build_start = time.time()
+            returncode, stdout, stderr = self.__run_hugo(report_path)
+            perf.get_stats(self.getName()).add_time("build", time.time() - build_start)
+            if self.getOptionValue("incremental") == "on":
+                self.__save_manifest(report_path, returncode == 0)
+            if returncode != 0:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).status("Failed to run Hugo")
+                logging.getLogger(sx.MAIN_LOGGER_NAME).status(stderr)
                 logging.getLogger(sx.MAIN_LOGGER_NAME).status(stdout)
-                # will wait until Ctrl-C is hit.
-        else:
-            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Failed to run Hugo")
-            logging.getLogger(sx.MAIN_LOGGER_NAME).status(stderr)
-            logging.getLogger(sx.MAIN_LOGGER_NAME).status(stdout)
+                self.__save_performance(report_path, start)
+                return -1
+            if self.getOptionValue("renderer") == "builtin":
+                logging.getLogger(sx.MAIN_LOGGER_NAME).status("Rendered the site in %s" % report_path)
+            else:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).status("Ran Hugo in %s" % report_path)
+            if stdout:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).info(stdout)
+
+        if self.getOptionValue("precompress") == "on":
+            self.__precompress(report_path)
+
+        self.__save_performance(report_path, start)
+
+        if self.getOptionValue("serve") == "on":
+            self.__serve(report_path)
+        elif self.getOptionValue("serve") == "static":
+            self.__serve_static(report_path)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+This plugin scans the Eucalyptus logs of every sosreport
+(var/log/eucalyptus/*.log) for known error signatures, and shows when
+and where they happen in a heatmap of the matching lines per host and
+time.
+
+The logs are streamed once, every line searched with a single combined
+expression of the signature catalog, and the reports are scanned in
+parallel with the workers option. Extra signatures can be given in a
+file with the signatures option, see logscan.load_signatures().
+
+The lines of every host logged in the time windows of the windows option
+get a page per window, extracted with the timestamp index of the logs
+(see logindex) rather than by reading them again.
+
+The plugin can be placed in the directory: $HOME/.sx/sxplugins/
+$ cp demo.py $HOME/.sx/sxplugins/
+
+It will need to be enabled.
+
+@version   :  1.0
+"""
+import os
+import re
+import math
+import time
+import shutil
+import logging
+
+import sx
+import sx.plugins
+from sx.plugins.lib.eucalyptus import logindex
+from sx.plugins.lib.eucalyptus import logscan
+from sx.plugins.lib.eucalyptus import model
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+
+# Time columns of a heatmap.
+HEATMAP_COLUMNS = 48
+HEATMAP_STYLE = "font-size: 75%"
+
+SIGNATURES_TABLE = pages.TableTemplate(["Signature", "Lines", "Hosts", "First", "Last"],
+                                       "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+LOGS_TABLE = pages.TableTemplate(["Hostname", "Log", "Matching lines"], "<td>%s</td><td>%s</td><td>%s</td>")
+SAMPLES_TABLE = pages.TableTemplate(["Hostname", "Log", "Line"], "<td>%s</td><td>%s</td><td><pre>%s</pre></td>")
+WINDOWS_TABLE = pages.TableTemplate(["Window", "From", "To", "Hosts", "Lines"],
+                                    "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+WINDOW_LOGS_TABLE = pages.TableTemplate(["Hostname", "Log", "Lines"], "<td>%s</td><td>%s</td><td>%s</td>")
+
+
+class Eucalogs(sx.plugins.PluginBase):
+    """
+    Eucalyptus Log Signatures
+    """
+    # The report files read, for archive.extract().
+    REPORT_PATHS = reportdata.get_sources(reportdata.parse_logs)
+
+    def __init__(self, pathToPluginReportDir=""):
+        """
+        @param pathToPluginReportDir: This is the root path to where
+        the report files will be written.
+        @type pathToPluginReportDir: String
+        """
+        options = dict(parallel.SETUP_OPTIONS)
+        options.update({"signatures": "File of extra log signatures, one 'name pattern' per line, "
+                                      "matched before the built-in ones. []",
+                        "windows": "Comma separated time windows to extract the log lines of, in the hosts' time, "
+                                   "like 2016-03-14T15:20/15:35. []"})
+        sx.plugins.PluginBase.__init__(self, "EucaLogs",
+                                       "This plugin counts the known errors in the Eucalyptus logs of the given sosreports.",
+                                       ["Sosreport", "Sysreport"], False, True,
+                                       options,
+                                       pathToPluginReportDir)
+        parallel.set_default_options(self)
+        self.setOptionValue("signatures", '')
+        self.setOptionValue("windows", '')
+        # key: hostname, value: (counts, samples, files, logs) of its logs
+        self.matches = {}
+        # (start, end, [(hostname, log, lines, truncated)]) of each window
+        self.windows = []
+
+    def __get_catalog(self):
+        """
+        Returns the signatures of the signatures option followed by the
+        built-in ones.
+        """
+        path = self.getOptionValue("signatures")
+        if not path:
+            return logscan.DEFAULT_SIGNATURES
+        try:
+            signatures, errors = logscan.load_signatures(path)
+        except IOError, e:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to read the signatures %s: %s" % (path, e))
+            return logscan.DEFAULT_SIGNATURES
+        for error in errors:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Ignored a signature of %s, %s" % (path, error))
+        catalog = logscan.merge_signatures(signatures)
+        try:
+            logscan.compile_catalog(catalog)
+        except re.error, e:
+            # Back references can't be combined with the other signatures.
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to combine the signatures of %s (%s), "
+                                                           "using the built-in ones." % (path, e))
+            return logscan.DEFAULT_SIGNATURES
+        return catalog
+
+    @perf.timed("setup")
+    def setup(self, reports):
+        """
+        This function will setup data structure to hold any data/path
+        to files that are needed to use in this plugin.
+
+        @param reports: This is the list of Report Objects.
+        @type reports: Array
+        """
+        # Always print this message if you going to call this function
+        # so that logging is notified that this function has been called.
+        message = "Running setup for plugin: %s" % (self.getName())
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
+
+        # The workers inherit the catalog, it is set before any parsing.
+        logscan.set_catalog(self.__get_catalog())
+        cloud = model.get_model(self, reports)
+        self.matches = cloud.getLogMatches()
+
+    @perf.timed("execute")
+    def execute(self):
+        """
+        This function should be overriden by the child if any
+        intensive tasks needs be ran. This function should be used for
+        writing to report files with write() functions or reporting
+        any test results to console.
+        """
+        message = "Running execute for plugin: %s" % (self.getName())
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
+
+        self.windows = []
+        for start, end in self.__get_windows():
+            logs = []
+            for host in sorted(self.matches):
+                for relpath, path, index in self.matches[host][3]:
+                    try:
+                        lines, truncated = logindex.extract_window(path, index, start, end)
+                    except (IOError, OSError), e:
+                        logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to read %s: %s" % (path, e))
+                        continue
+                    if lines:
+                        logs.append((host, relpath, lines, truncated))
+            self.windows.append((start, end, logs))
+
+    def __get_windows(self):
+        """
+        Returns the (start, end) timestamps of the windows option.
+        """
+        windows = []
+        for value in (self.getOptionValue("windows") or "").split(","):
+            if not value.strip():
+                continue
+            try:
+                windows.append(logindex.parse_window(value))
+            except ValueError, e:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Ignored the window %s: %s" % (value.strip(), e))
+        return windows
+
+    def __get_totals(self):
+        """
+        Returns a dict of signature to [lines, hosts, first minute, last
+        minute] over every host.
+        """
+        totals = {}
+        for host in self.matches:
+            seen = set()
+            for (name, minute), count in self.matches[host][0].items():
+                total = totals.setdefault(name, [0, 0, None, None])
+                total[0] += count
+                if name not in seen:
+                    seen.add(name)
+                    total[1] += 1
+                if minute:
+                    total[2] = min(total[2] or minute, minute)
+                    total[3] = max(total[3], minute)
+        return totals
+
+    @perf.timed("report")
+    def report(self):
+        """
+        This function is where the reporting is done to console or to
+        report files via the write() function.
+        """
+        message = "Generating report for plugin: %s" % (self.getName())
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
+
+        self.clean()
+        page = pages.Page(self, "EucalyptusLogs.md")
+        page.front_matter('title="Log Signatures"', 'menu="main"')
+        if not [host for host in self.matches if self.matches[host][2]]:
+            page.write("<p>There are no Eucalyptus logs (%s) in the reports.</p>" % pages.escape(reportdata.parse_logs.cache_sources[0]))
+            page.close()
+            return
+
+        totals = self.__get_totals()
+        names = sorted(totals, key=lambda n: (-totals[n][0], n))
+        page.write("<p>Each log line counts for the first signature it matches. The times are the ones "
+                   "logged, in the timezone of each host.</p>")
+        page.write("")
+        page.write("<h2> Signatures </h2>")
+        page.write("")
+        page.table(SIGNATURES_TABLE, [(name, totals[name][0], totals[name][1], totals[name][2] or "",
+                                       totals[name][3] or "") for name in names])
+        minutes = [totals[name][i] for name in names for i in (2, 3) if totals[name][i]]
+        if minutes:
+            buckets = logscan.get_buckets(min(minutes), max(minutes), HEATMAP_COLUMNS)
+            page.write("")
+            page.write("<h2> All Signatures </h2>")
+            page.write("")
+            self.__write_heatmap(page, buckets, None)
+            for name in names:
+                page.write("")
+                page.write("<h3> %s </h3>" % pages.escape(name))
+                page.write("")
+                self.__write_heatmap(page, buckets, name)
+
+        page.write("")
+        page.write("<h2> Samples </h2>")
+        page.write("")
+        for name in names:
+            page.write("<h3> %s </h3>" % pages.escape(name))
+            page.write("")
+            page.table(SAMPLES_TABLE, [(host, log, line) for host in sorted(self.matches)
+                                       for log, line in self.matches[host][1].get(name, [])])
+            page.write("")
+
+        page.write("<h2> Logs </h2>")
+        page.write("")
+        page.table(LOGS_TABLE, [(host, log, count) for host in sorted(self.matches)
+                                for log, count in self.matches[host][2]])
+        if self.windows:
+            page.write("")
+            page.write("<h2> Time Windows </h2>")
+            page.write("")
+            page.table(WINDOWS_TABLE, [(pages.Raw('<a href="../logwindow%d/">%d</a>' % (n + 1, n + 1)), start, end,
+                                        len(set([log[0] for log in logs])), sum([len(log[2]) for log in logs]))
+                                       for n, (start, end, logs) in enumerate(self.windows)])
+        page.close()
+        for n, window in enumerate(self.windows):
+            self.__write_window(n + 1, *window)
+
+    def __write_window(self, number, start, end, logs):
+        """
+        Writes the page of the log lines of every host in a time window.
+        """
+        page = pages.Page(self, "LogWindow%d.html" % number)
+        page.front_matter('title="Logs from %s to %s"' % (start, end))
+        page.write('<p><a href="../eucalyptuslogs/">Log signatures</a></p>')
+        page.write("<p>The lines logged from %s to %s, in the timezone of each host.</p>" % (start, end))
+        if not logs:
+            page.write("<p>No host logged anything in this window.</p>")
+            page.close()
+            return
+        page.table(WINDOW_LOGS_TABLE, [(host, relpath, "%d%s" % (len(lines), "+" if truncated else ""))
+                                       for host, relpath, lines, truncated in logs])
+        for host, relpath, lines, truncated in logs:
+            page.write("")
+            page.write("<h3> %s: %s </h3>" % (pages.escape(host), pages.escape(relpath)))
+            if truncated:
+                page.write("<p>Only the first %d lines are shown.</p>" % len(lines))
+            page.write("<pre>")
+            for line in lines:
+                page.write(pages.escape(line))
+            page.write("</pre>")
+        page.close()
+
+    def __write_heatmap(self, page, buckets, name):
+        """
+        Writes the table of the matching lines per host (the rows) and
+        time (the columns), of a single signature or of all of them when
+        name is None. The lines without a timestamp are left out.
+        """
+        start, step, columns = buckets
+        grid = {}
+        for host in self.matches:
+            for (signature, minute), count in self.matches[host][0].items():
+                if not minute or (name is not None and signature != name):
+                    continue
+                row = grid.setdefault(host, [0] * columns)
+                row[(logscan.minute_epoch(minute) - start) // step] += count
+        if not grid:
+            return
+        if step >= 86400:
+            label_format = "%Y-%m-%d"
+        elif time.gmtime(start)[:3] == time.gmtime(start + (columns - 1) * step)[:3]:
+            label_format = "%H:%M"
+        else:
+            label_format = "%m-%d %H:%M"
+        labels = [time.strftime(label_format, time.gmtime(start + c * step)) for c in range(columns)]
+        template = pages.TableTemplate(["Hostname"] + labels, "<td>%s</td>" + "%s" * columns,
+                                       striped=False, style=HEATMAP_STYLE)
+        page.write("<p>%d minutes per column from %s.</p>" % (step // 60, time.strftime("%Y-%m-%d %H:%M", time.gmtime(start))))
+        peak = math.log(1 + max([max(counts) for counts in grid.values()]))
+        page.table(template, [[host] + [self.__heat_cell(host, labels[c], count, peak) for c, count in enumerate(grid[host])]
+                              for host in sorted(grid)])
+
+    def __heat_cell(self, host, label, count, peak):
+        if count == 0:
+            return pages.cell("")
+        # Log scale, a few lines already show up next to thousands.
+        alpha = 0.15 + 0.85 * math.log(1 + count) / peak
+        return pages.cell(count, style="background-color: rgba(204, 0, 0, %.2f)" % alpha,
+                          title="%s %s: %d lines" % (host, label, count))
+
+    @perf.timed("action")
+    def action(self):
+        """
+        This function performs some external task such as opening web
+        browser or file viewer to view a file.
+        """
+        # Always print this message if you going to call this function
+        # so that logging is notified that this function has been called.
+        message = "Performing action for plugin: %s" % (self.getName())
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
+        old_dir = self.getPathToPluginReportDir()
+        h, t = os.path.split(old_dir)
+        # Make sure content directory exists
+        content_dir = os.path.join(h, "content")
+        if not os.path.exists(content_dir):
+            os.mkdir(content_dir)
+        new_dir = os.path.join(content_dir, t)
+        message = "Moving directory from %s to %s" % (old_dir, new_dir)
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
+        if os.path.exists(new_dir):
+            shutil.rmtree(new_dir)
+        os.rename(old_dir, new_dir)
@@ -34,11 +34,23 @@ import logging
 import sx
 import sx.plugins
 from sx.logwriter import LogWriter
+from sx.plugins.lib.eucalyptus import clock
+from sx.plugins.lib.eucalyptus import model
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+DATES_TABLE = pages.TableTemplate(["Hostname", "Date"], "<td>%s</td><td>%s</td>", striped=False)
+SKEW_TABLE = pages.TableTemplate(["Hostname", "Date", "UTC", "Skew from median", "Skew from report date"],
+                                 "<td>%s</td><td>%s</td><td>%s</td>%s%s")
+
 
 class Eucatimezone(sx.plugins.PluginBase):
     """
     Eucalyptus SosReport Timezone  
     """
+    # The report files read, for archive.extract().
+    REPORT_PATHS = reportdata.get_sources(reportdata.parse_date)
 
     def __init__(self, pathToPluginReportDir=""):
         """
@@ -46,13 +58,22 @@ class Eucatimezone(sx.plugins.PluginBase):
         the report files will be written.
         @type pathToPluginReportDir: String
         """
+        options = dict(parallel.SETUP_OPTIONS)
+        options.update({"maxskew": "Number of seconds a host clock can be off the median of all hosts before it is reported. [60]"})
         sx.plugins.PluginBase.__init__(self, "EucaTimeZone",
                                        "This plugin verifies that the timezones are correct across the given sosreports.",
                                        ["Sosreport", "Sysreport"], False, True,
-                                       {},
+                                       options,
                                        pathToPluginReportDir)
+        parallel.set_default_options(self)
+        self.setOptionValue("maxskew", '60')
         self.dates_by_tz = {}
+        self.date_strings = {}
+        self.epochs = {}
+        self.report_epochs = {}
+        self.skews = (None, {})
 
+    @perf.timed("setup")
     def setup(self, reports):
         """
         This function will setup data structure to hold any data/path
@@ -66,13 +87,15 @@ class Eucatimezone(sx.plugins.PluginBase):
         message = "Running setup for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
-        for report in reports:
-            po = report.getDataFromFile('date')
-            #self.dates_by_host[report.getHostname()] = po[0].rstrip()  # the first line is the header...
-            tz = po[0].rstrip().split()[-2]
-            # key: tz, value, set of hostname,datestring tuples
-            self.dates_by_tz.setdefault(tz,set()).add((report.getHostname(),po[0].rstrip()))
+        cloud = model.get_model(self, reports)
+        # key: tz, value, set of hostname,datestring tuples
+        self.dates_by_tz = cloud.getDatesByTimezone()
+        self.date_strings = cloud.getDateStrings()
+        self.epochs = cloud.getEpochs()
+        self.report_epochs = cloud.getReportEpochs()
+        self.skews = cloud.getSkews()
 
+    @perf.timed("execute")
     def execute(self):
         """
         This function should be overriden by the child if any
@@ -83,6 +106,7 @@ class Eucatimezone(sx.plugins.PluginBase):
         message = "Running execute for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("report")
     def report(self):
         """
         This function is where the reporting is done to console or to
@@ -98,33 +122,76 @@ class Eucatimezone(sx.plugins.PluginBase):
         #
         #
         #
-        filename = "EucalyptusTimezone.md"
-        self.write(filename, "+++")
-        self.write(filename, 'title="Timezone Report"')
-        self.write(filename, 'menu="main"')
-        self.write(filename, "+++")
-        self.write(filename, "")
+        page = pages.Page(self, "EucalyptusTimezone.md")
+        page.front_matter('title="Timezone Report"', 'menu="main"')
         if len(self.dates_by_tz) > 1:
-            self.write(filename, '<font color="red">An error has been detected, all timzeones should be the same.')
-            self.write(filename, 'There are %s different timezones in the cloud, there should be 1' % len(self.dates_by_tz))
-            self.write(filename, "")
-            self.write(filename, 'Please verify and fix the timzone on the set of hosts that are not compliant.')
-            self.write(filename, '</font>')
+            page.write('<font color="red">An error has been detected, all timzeones should be the same.')
+            page.write('There are %s different timezones in the cloud, there should be 1' % len(self.dates_by_tz))
+            page.write("")
+            page.write('Please verify and fix the timzone on the set of hosts that are not compliant.')
+            page.write('</font>')
         for tz in self.dates_by_tz:
-            self.write(filename, '<h2> Timezone: %s </h2>' % tz)
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            self.write(filename, '<th>Hostname</th><th>Date</th>')
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            for d,t in self.dates_by_tz[tz]:
-                self.write(filename, '<tr>')
-                self.write(filename, '<td>%s</td><td>%s</td>' % (d,t))
-                self.write(filename, '</tr>')
-	    self.write(filename, '</tbody>')
-	    self.write(filename, '</table>')
-
-
+            page.write('<h2> Timezone: %s </h2>' % pages.escape(tz))
+            page.table(DATES_TABLE, sorted(self.dates_by_tz[tz]))
+        if len(self.epochs) > 0:
+            self.__write_skew(page)
+        page.close()
+
+    def __get_max_skew(self):
+        try:
+            return abs(int(self.getOptionValue("maxskew")))
+        except (TypeError, ValueError):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Invalid value for option maxskew: %s, using 60."
+                                                           % self.getOptionValue("maxskew"))
+            return 60
+
+    def __write_skew(self, page):
+        """
+        Writes the skew of every host clock to the median of all the hosts
+        and to the report date, and the hosts off by more than maxskew.
+        """
+        max_skew = self.__get_max_skew()
+        center, skews = self.skews
+        page.write("")
+        page.write("<h2> Clock Skew </h2>")
+        page.write("")
+        page.write("<p>The dates are the time each sosreport was collected, hosts whose reports were "
+                   "collected at different times show that difference too.</p>")
+        if center is not None:
+            page.write("<p>Median of all hosts: %s</p>" % clock.format_epoch(int(center)))
+        page.write("")
+        rows = []
+        outliers = []
+        for host in sorted(self.epochs):
+            epoch = self.epochs[host]
+            skew = skews.get(host)
+            report_skew = None
+            if epoch is not None and host in self.report_epochs:
+                report_skew = epoch - self.report_epochs[host]
+            if skew is not None and abs(skew) > max_skew:
+                outliers.append((host, skew))
+            rows.append((host, self.date_strings[host], clock.format_epoch(epoch) or "(unknown timezone)",
+                         self.__skew_cell(skew, max_skew), self.__skew_cell(report_skew, max_skew)))
+        page.table(SKEW_TABLE, rows)
+        page.write("")
+        page.write("<h2> Clock Outliers </h2>")
+        page.write("")
+        if len(outliers) == 0:
+            page.write("<p>No host clock is more than %d seconds off the median.</p>" % max_skew)
+        else:
+            page.write('<p><font color="red">%d hosts are more than %d seconds off the median:</font> %s</p>'
+                       % (len(outliers), max_skew,
+                          pages.escape(", ".join(["%s (%+ds)" % (outlier, outlier_skew)
+                                                  for outlier, outlier_skew in sorted(outliers, key=lambda o: -abs(o[1]))]))))
+
+    def __skew_cell(self, skew, max_skew):
+        if skew is None:
+            return pages.cell("")
+        if abs(skew) > max_skew:
+            return pages.cell("%+ds" % skew, css_class="red")
+        return pages.cell("%+ds" % skew)
+
+    @perf.timed("action")
     def action(self):
         """
         This function performs some external task such as opening web
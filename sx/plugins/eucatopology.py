@@ -26,12 +26,10 @@ It will need to be enabled.
 @version   :  1.0 
 """
 import os
-import re
 import pdb
 import pprint
 import shutil
 import logging
-import urlparse
 import subprocess
 
 from operator import itemgetter
@@ -39,44 +37,55 @@ from operator import itemgetter
 import sx
 import sx.plugins
 from sx.logwriter import LogWriter
-
-class Service(object):
-    def __init__(self):
-        self.hostname = ""
-        self.url = ""
-        self.arn = ""
-        self.stype = ""
-        self.zone = ""
-        self.state = ""
-
-    def no_name(self):
-        return "<td>%s</td><td>%s</td><td>%s</td><td>%s</td>" % (self.url,self.state, self.arn, self.stype)
-	
-    def __str__(self):
-        return '<td>%s</td><td>%s</td><td style="white-space: nowrap">%s</td><td>%s</td><td>%s</td><td>%s</td>' % (self.hostname, self.state, self.url, self.arn, self.stype, self.zone)
+from sx.plugins.lib.eucalyptus import model
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+from sx.plugins.lib.eucalyptus.hosts import HostIndex, ip_sort_key
+from sx.plugins.lib.eucalyptus.services import ServiceStore, ZONE_STYPES
+
+TOP_LEVEL_TABLE = pages.TableTemplate(["Item", "Endpoint", "State", "ARN", "Type"],
+                                      "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+SERVICES_TABLE = pages.TableTemplate(["Item", "Name", "State", "Endpoint", "ARN", "Type", "Zone", "Report"],
+                                     '<td>%s</td><td>%s</td><td>%s</td><td style="white-space: nowrap">%s</td>'
+                                     '<td>%s</td><td>%s</td><td>%s</td><td>%s</td>')
+REPORT_MAPPING_TABLE = pages.TableTemplate(["Hostname", "IP", "Component", "Date ", "Path"],
+                                           '<td style="white-space: nowrap">%s</td><td>%s</td><td>%s</td>'
+                                           '<td style="white-space: nowrap">%s</td><td style="white-space: nowrap">%s</td>',
+                                           style="width=100%")
+UNREPORTED_HOSTS_TABLE = pages.TableTemplate(["Host", "IP", "Names", "Component"],
+                                             '<td style="white-space: nowrap">%s</td><td>%s</td><td>%s</td><td>%s</td>')
 
 
 class Eucatopology(sx.plugins.PluginBase):
     """
     Eucalyptus Cloud Topology
     """
+    # The report files read, for archive.extract(). The date is shown in
+    # the report mapping.
+    REPORT_PATHS = reportdata.get_sources(reportdata.parse_topology, reportdata.parse_date)
+
     def __init__(self, pathToPluginReportDir=""):
         """
         @param pathToPluginReportDir: This is the root path to where
         the report files will be written.
         @type pathToPluginReportDir: String
         """
+        options = dict(parallel.SETUP_OPTIONS)
+        options.update({pages.DATA_TABLES_OPTION: pages.DATA_TABLES_OPTION_DESCRIPTION})
         sx.plugins.PluginBase.__init__(self, "EucaTopology",
                                        "This plugin provides a topology view of the Eucalyptus cloud.",
                                        ["Sosreport", "Sysreport"], False, True,
-                                       {},
+                                       options,
                                        pathToPluginReportDir)
-        self.__services = []
+        parallel.set_default_options(self)
+        self.setOptionValue(pages.DATA_TABLES_OPTION, 'off')
+        self.__services = ServiceStore()
         self.__host_to_ereport = {}
-        self.__ip_to_hostname = {}
-        self.__hostname_to_ip = {}
-        self.__ip_to_types = {}
+        self.__hosts = HostIndex()
 
+    @perf.timed("setup")
     def setup(self, reports):
         """
         This function will setup data structure to hold any data/path
@@ -89,57 +98,14 @@ class Eucatopology(sx.plugins.PluginBase):
         # so that logging is notified that this function has been called.
         message = "Running setup for plugin: %s" %(self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
-        ipv4_re = re.compile(".*inet addr:([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)")
-
-        for report in reports:
-            if self.isValidReportType(report):
-                self.__host_to_ereport[report.getHostname()] = (report.getDate(),report.getPathToExtractedReport())
-                #
-                # Process euca-describe-services-all, should only be on one host
-                #
-                host_info = report.getDataFromFile("etc/hosts")
-                for i in host_info:
-                    lsplit = i.split()
-                    if report.getHostname() in lsplit:
-                        self.__ip_to_hostname[lsplit[0]] = lsplit[1:]
-                        self.__hostname_to_ip.setdefault(report.getHostname(), set()).add(lsplit[0])
-
-                #
-                # Gather ip addr info from ifconfig output also, because sometimes the hosts file
-                # doesn't have the correct information.
-                #
-                ip_addr_info = report.getDataFromFile("ifconfig")
-                if ip_addr_info is not None:
-                    ip_addrs = [m.group(1) for m in [ipv4_re.match(i) for i in ip_addr_info] if m is not None]
-		    ip_addrs = set(ip_addrs)
-		    ip_addrs.remove("127.0.0.1")
-                    self.__hostname_to_ip.setdefault(report.getHostname(), set()).update(ip_addrs)
-
-                euca_services_output = report.getDataFromFile("sos_commands/eucafrontend/euca-describe-services-all")
-               
-                # None value means that the file doesn't exist
-                if euca_services_output is None:
-                    continue
-
-                services_list = [i[:-1].split('\t') for i in euca_services_output]  # strip newline before splitting
-                for i in services_list:
-                    if i[0] == 'SERVICE':
-                        try:
-                            s = Service()
-                            s.hostname = i[3].strip()
-                            s.url = i[6].strip()
-                            s.arn = i[7].strip()
-                            s.stype = i[1].strip()
-                            s.state = i[4].strip()
-                            s.zone = i[2].strip()
-                            self.__services.append(s)
-
-                            url_p = urlparse.urlparse(s.url)
-                            self.__ip_to_types.setdefault(url_p.hostname, set()).add(s.stype)
-
-                        except IndexError:
-                            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Error on line: %s" % i)
-
+        cloud = model.get_model(self, reports)
+        for info in cloud.getReportInfos():
+            self.__host_to_ereport[info.hostname] = (info.date, info.path)
+        self.__hosts = cloud.getHostIndex()
+        # euca-describe-services-all, should only be on one host
+        self.__services = cloud.getServices()
+
+    @perf.timed("execute")
     def execute(self):
         """
         This function should be overriden by the child if any
@@ -150,6 +116,7 @@ class Eucatopology(sx.plugins.PluginBase):
         message = "Running execute for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("report")
     def report(self):
         """
         This function is where the reporting is done to console or to
@@ -165,172 +132,76 @@ class Eucatopology(sx.plugins.PluginBase):
         #
         #
         #
-        filename = "EucalyptusReportMapping.html"
-        self.write(filename, "+++")
-        self.write(filename, 'title="Report Mapping"')
-	self.write(filename, 'menu="main"')
-	self.write(filename, 'weight="-50"')
-        self.write(filename, "+++")
-        self.write(filename, "")
-        self.write(filename, '<table class="pure-table pure-table-bordered" style="width=100%">') 
-        self.write(filename, '<thead>')
-	self.write(filename, '<th>Hostname</th>')
-	self.write(filename, '<th>IP</th>')
-	self.write(filename, '<th>Component</th>')
-	self.write(filename, '<th>Date </th>')
-	self.write(filename, '<th>Path</th>')
-	self.write(filename, '</thead>')
- 	self.write(filename, '<tbody>')	
+        page = pages.Page(self, "EucalyptusReportMapping.html")
+        page.front_matter('title="Report Mapping"', 'menu="main"', 'weight="-50"')
         # We want to sort by component.
         sorted_by_component = []
         for host in self.__host_to_ereport:
-            ips = list(self.__hostname_to_ip[host])
+            ips = sorted(self.__hosts.getReportHostIps(host), key=ip_sort_key)
+            components = sorted(self.__hosts.getComponents(host)) or ["Not found", ]
+            sorted_by_component.append((host, components, ips))
 
-            for ip in ips:
-                if ip in self.__ip_to_types:
-                    components = list(self.__ip_to_types[ip])
-                    break  # we found a match, no need to proceed with the loop
-            else:
-                components = ["Not found", ]
+        rows = []
+        for host, components, ips in sorted(sorted_by_component, key=itemgetter(1)):
+            rdate, rpath = self.__host_to_ereport[host]
+            rows.append((host, ",".join(ips), self.__format_components(components), rdate, rpath))
+        page.table(REPORT_MAPPING_TABLE, rows)
 
-            components.sort()
-            sorted_by_component.append((host, components))
-        
-        for count, i in enumerate(sorted(sorted_by_component, key=itemgetter(1))):
-            i = i[0]
-            rdate, rpath = self.__host_to_ereport[i]
-            ips = list(self.__hostname_to_ip[i])
-            for ip in ips:
-                if ip in self.__ip_to_types:
-                    service_types = self.__ip_to_types[ip]
-                    break
-            else:
-                service_types = ["Not Found", ]
-
-            ips.sort(key=lambda x: [int(j) for j in x.split('.')])
-	    self.write(filename, '<tr class="%s">' % "pure-table-odd" if count % 2 != 0 else "<tr>")
-            self.write(filename, '<td style="white-space: nowrap">%s</td><td>%s</td><td>%s</td><td style="white-space: nowrap">%s</td><td style="white-space: nowrap">%s</td>' % (i, ",".join(ips), ",&#8203;".join(sorted(service_types)),rdate,rpath))
-            self.write(filename, '</tr>')
-        self.write(filename, '</tbody>')
-        self.write(filename, '</table>')
+        #
+        # Hosts that run a service but were not given a sosreport.
+        #
+        addresses = self.__hosts.getUnreportedAddresses()
+        if addresses:
+            page.write("")
+            page.write("<h2> Hosts without a sosreport </h2>")
+            page.write("")
+            rows = []
+            for address in addresses:
+                ips = sorted(self.__hosts.resolve(address), key=ip_sort_key)
+                names = set()
+                for ip in ips:
+                    names.update(self.__hosts.getNames(ip))
+                rows.append((address, ",".join(ips), ",".join(sorted(names)),
+                             self.__format_components(sorted(self.__hosts.getComponents(address)))))
+            page.table(UNREPORTED_HOSTS_TABLE, rows)
+        page.close()
 
-	
         # #######################################################################
         # Write information gathered to a report file.
         # #######################################################################
-        # This is the filename where we will write all the report
-        # files we want to generate.
-        filename = "EucalyptusTopology.html"
-
-        # Write a header
-        self.write(filename, "+++")
-        self.write(filename, 'title="Topology"')
-        self.write(filename, 'menu="main"')
-        self.write(filename, 'weight="-100"')
-        self.write(filename, "+++")
-
-        data = [i for i in self.__services if i.stype not in ["cluster","node","storage"]]
-        self.write(filename, "<h2> Top Level Cloud Components: </h2>")
-        self.write(filename, "")
-	self.write(filename, '<table class="pure-table pure-table-bordered">')
-	self.write(filename, '<thead>')
-        self.write(filename, "<th>Item</th><th>Endpoint</th><th>State</th><th>ARN</th><th>Type</th>")
-	self.write(filename, '</thead>')
+        page = pages.Page(self, "EucalyptusTopology.html")
+        page.front_matter('title="Topology"', 'menu="main"', 'weight="-100"')
 
-	self.write(filename, '<tbody>')
-        for j, i in enumerate(data):
+        page.write("<h2> Top Level Cloud Components: </h2>")
+        page.write("")
+        page.table(TOP_LEVEL_TABLE, [(j + 1,) + i.no_name() for j, i in enumerate(self.__services.getTopLevel())])
+        page.write("")
 
-            # Need to figure out highlighting of cells 
-            if i.state != "ENABLED":
-                i.state = "(red). %s" % i.state
-	    self.write(filename, '<tr class="%s">' % "pure-table-odd" if j % 2 != 0 else "<tr>")
-            self.write(filename,"<td>%d</td>%s" % (j+1, i.no_name()))
-	    self.write(filename, '</tr>')
-        self.write(filename, '</tbody>')
-	self.write(filename, '</table>')
-        self.write(filename, '')
-
-        # Cluster
-        data = [i for i in self.__services if i.stype == "cluster"]
-        self.write(filename, "<h2> Cluster Controllers:</h2>")
-        self.write(filename, "")
-        self.write(filename, '<table class="pure-table pure-table-bordered">')
-        self.write(filename, "<thead>")
-        self.write(filename, "<th>Item</th><th>Name</th><th>State</th><th>Endpoint</th><th>ARN</th><th>Type</th><th>Zone</th>")
-        self.write(filename, "</thead>")
-	self.write(filename, "<tbody>")
-        for j, i in enumerate(data):
-            if i.state != "ENABLED":
-                i.state = "(red). %s" % i.state
-            self.write(filename, '<tr class="%s">' % "pure-table-odd" if j % 2 != 0 else "<tr>")
-            self.write(filename, "<td>%d</td>%s" % (j+1, i))
-            self.write(filename, '</tr>')
-        self.write(filename, "</tbody>")
-        self.write(filename, "</table>")
-        self.write(filename, "")
-
-        # Write out Storage Controllers
-        data = [i for i in self.__services if i.stype == "storage"]
-        self.write(filename, "<h2> Storage: </h2>")
-        self.write(filename, "")
-        self.write(filename, '<table class="pure-table pure-table-bordered">')
-        self.write(filename, '<thead>')
-        self.write(filename, '<th>Item</th><th>Name</th><th>State</th><th>Endpoint</th><th>ARN</th><th>Type</th><th>Zone</th>')
-        self.write(filename, '</thead>')
-        self.write(filename, '<tbody>')
-        
-        for j, i in enumerate(data):
-            if i.state != "ENABLED":
-                i.state = "(red). %s" % i.state
-            self.write(filename, '<tr class="%s">' % "pure-table-odd" if j % 2 != 0 else "<tr>")
-            self.write(filename, "<td>%d</td>%s" % (j+1, i))
-            self.write(filename, '</tr>')
-        self.write(filename, "")
-        self.write(filename, '</tbody>')
-        self.write(filename, '</table>')
-
-        # Write out Nodes
-        data = [i for i in self.__services if i.stype == "node"]
-        self.write(filename, "<h2> Nodes:</h2>")
-        self.write(filename, "")
-        self.write(filename, '<table class="pure-table pure-table-bordered">')
-        self.write(filename, '<thead>')
-        self.write(filename, "<th>Item</th><th>Name</th><th>State</th><th>Endpoint</th><th>ARN</th><th>Type</th><th>Zone</th>")
-        self.write(filename, '</thead>')
-        for j,i in enumerate(data):
-            if i.state != "ENABLED":
-                i.state = "(red). %s" % i.state
-            self.write(filename, '<tr class="%s">' % "pure-table-odd" if j % 2 != 0 else "<tr>")
-            self.write(filename,"<td>%d</td>%s" % (j+1,i))
-            self.write(filename, '</tr>')
-        self.write(filename, '</tbody>')
-        self.write(filename, '</table>')
+        for title, stype in [("Cluster Controllers:", "cluster"), ("Storage: ", "storage"), ("Nodes:", "node")]:
+            page.write("<h2> %s</h2>" % title)
+            page.write("")
+            rows = self.__service_rows(self.__services.getByType(stype))
+            page.large_table(SERVICES_TABLE, rows, "services-%s" % stype, len(rows))
+            page.write("")
 
         # By Availability Zones
-        data = [i for i in self.__services if i.stype == "cluster"]
-        zones = set([i.zone for i in data])
-        
-        for z in zones:
-            datac = ["Cluster", [i for i in self.__services if i.stype == "cluster" if i.zone == z]]
-            datas = ["Storage", [i for i in self.__services if i.stype == "storage" if i.zone == z]]
-            datan = ["Node", [i for i in self.__services if i.stype == "node" if i.zone == z]]
-            self.write(filename, "<h2>Availability Zone: %s </h2>" % z)
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            self.write(filename, "<th>Item</th><th>Name</th><th>State</th><th>Endpoint</th><th>ARN</th><th>Type</th><th>Zone</th>")
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            j = 0
-            for d in [datac, datas, datan]:
-                name, data = d
-                for i in data:
-                    self.write(filename, '<tr class="%s">' % "pure-table-odd" if j % 2 != 0 else "<tr>")
-                    self.write(filename, "<td>%d</td>%s" % (j+1,i))
-                    self.write(filename, '</tr>')
-                    j+=1
-            self.write(filename, '</tbody>')
-            self.write(filename, '</table>')
-
+        for n, z in enumerate(self.__services.getZones()):
+            data = []
+            for stype in ZONE_STYPES:
+                data.extend(self.__services.getByZone(z, stype))
+            page.write("<h2>Availability Zone: %s </h2>" % pages.escape(z))
+            rows = self.__service_rows(data)
+            page.large_table(SERVICES_TABLE, rows, "zone-%d" % (n + 1), len(rows))
+        page.close()
+
+    def __format_components(self, components):
+        return pages.Raw(",&#8203;".join([pages.escape(c) for c in components]))
+
+    def __service_rows(self, services):
+        return [(j + 1,) + i.values() + (self.__hosts.getUrlReportHost(i.url) or "",)
+                for j, i in enumerate(services)]
+
+    @perf.timed("action")
     def action(self):
         """
         This function performs some external task such as opening web
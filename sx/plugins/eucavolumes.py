@@ -24,7 +24,9 @@ It will need to be enabled.
 @version   :  1.0 
 """
 import os
+import re
 import pdb
+import hashlib
 import pprint
 import shutil
 import logging
@@ -33,12 +35,61 @@ import subprocess
 import sx
 import sx.plugins
 from sx.logwriter import LogWriter
+from sx.plugins.lib.eucalyptus import hosts
+from sx.plugins.lib.eucalyptus import model
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import perf
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+from sx.plugins.lib.eucalyptus.volumes import VolumeStore
+
+VOLUMES_TABLE = pages.TableTemplate(["Name", "Size (in GB)", "Snapshot", "Zone", "State", "Time"],
+                                    "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+SHARDS_TABLE = pages.TableTemplate(["Zone", "State", "Volumes", "Pages"], "<td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+NODE_ATTACHMENTS_TABLE = pages.TableTemplate(["Node", "Zone", "State", "Instances", "Attachments", "Size (in GB)"],
+                                             "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>")
+INSTANCE_ATTACHMENTS_TABLE = pages.TableTemplate(["Instance", "State", "Node", "Volume", "Size (in GB)",
+                                                  "Device", "Status", "Attached"],
+                                                 "<td>%s</td>" * 8)
+UNKNOWN_NODE = "(unknown)"
+
+
+def slugify(value):
+    """
+    Returns value lower cased with anything but letters and digits
+    replaced by '-', usable in a page name.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "none"
+
+
+def get_shard_slugs(groups):
+    """
+    Returns a dict of (zone, state) to the prefix of its shard page names,
+    for groups of (zone, state, number of pages). Zones and states that
+    slugify to the same string get the short sha1 of their raw values
+    appended, so every page name is unique.
+    """
+    slugs = {}
+    names = set()
+    for zone, state, shards in groups:
+        base = "volumes-%s-%s" % (slugify(zone), slugify(state))
+        digest = hashlib.sha1("%s\0%s" % (zone, state)).hexdigest()[:8]
+        slug = base
+        attempt = 0
+        while [n for n in range(shards) if "%s-%d" % (slug, n + 1) in names]:
+            attempt += 1
+            slug = "%s-%s" % (base, digest) if attempt == 1 else "%s-%s-%d" % (base, digest, attempt)
+        names.update(["%s-%d" % (slug, n + 1) for n in range(shards)])
+        slugs[(zone, state)] = slug
+    return slugs
 
 
 class Eucavolumes(sx.plugins.PluginBase):
     """
     Eucalyptus Volumes 
     """
+    # The report files read, for archive.extract().
+    REPORT_PATHS = reportdata.get_sources(reportdata.parse_volumes, reportdata.parse_instances)
 
     def __init__(self, pathToPluginReportDir=""):
         """
@@ -46,14 +97,27 @@ class Eucavolumes(sx.plugins.PluginBase):
         the report files will be written.
         @type pathToPluginReportDir: String
         """
+        options = dict(parallel.SETUP_OPTIONS)
+        options.update({"shard": "Split the volumes into pages by zone and state: on, off or auto when there are more than pagesize volumes. [auto]",
+                        "pagesize": "Number of volumes per page when the volumes are split. [1000]",
+                        pages.DATA_TABLES_OPTION: pages.DATA_TABLES_OPTION_DESCRIPTION,
+                        })
         sx.plugins.PluginBase.__init__(self, "EucaVolumes",
                                        "This plugin provides a report on volumes.",
                                        ["Sosreport", "Sysreport"], False, True,
-                                       {},
+                                       options,
                                        pathToPluginReportDir)
+        parallel.set_default_options(self)
+        self.setOptionValue("shard", 'auto')
+        self.setOptionValue("pagesize", '1000')
+        self.setOptionValue(pages.DATA_TABLES_OPTION, 'off')
         self.default_property_values = {}
-	self.volumes = []
+        self.volumes = VolumeStore()
+        self.instances = {}
+        self.instance_nodes = {}
+        self.nodes = {}
 
+    @perf.timed("setup")
     def setup(self, reports):
         """
         This function will setup data structure to hold any data/path
@@ -72,21 +136,14 @@ class Eucavolumes(sx.plugins.PluginBase):
         # 1 - try to find the CLC properties (which are found via euca-describe-properties output)
         # 2 - try to locate /etc/eucalyptus/eucalyptus.conf
         #
-        for report in reports:
-
-            # It is possible that a property value spans multiple lines (like the network configuration). In this case we need
-            # to read in the values carefully as apposed to just splitting the line.
-            key = None
-            rd = report.getDataFromFile("sos_commands/eucafrontend/euca-describe-vols-v")
-            if rd is not None:
-                for i in rd:
-                    i = i[:-1]  # chop newline
-                    if i.startswith("VOLUME"):
-                        data = i.split('\t')[1:]  # We don't care about the 'PROPERTY' field
-                        # name,size,snap,zone,state,timestamp,standard = data
-                        self.volumes.append(tuple(data))
-                    # ignore ATTACHEMENT for now
+        cloud = model.get_model(self, reports)
+        self.volumes = cloud.getVolumes()
+        if self.volumes.getAttachmentCount() > 0:
+            self.instances = cloud.getInstances()
+            self.instance_nodes = cloud.getInstanceNodes()
+            self.nodes = cloud.getNodes()
 
+    @perf.timed("execute")
     def execute(self):
         """
         This function should be overriden by the child if any
@@ -97,6 +154,7 @@ class Eucavolumes(sx.plugins.PluginBase):
         message = "Running execute for plugin: %s" % (self.getName())
         logging.getLogger(sx.MAIN_LOGGER_NAME).status(message)
 
+    @perf.timed("report")
     def report(self):
         """
         This function is where the reporting is done to console or to
@@ -113,48 +171,140 @@ class Eucavolumes(sx.plugins.PluginBase):
         # There should only be one
         #
         if len(self.volumes) > 0:
-            filename = "EucalyptusVolumes.html"
-            self.write(filename, "+++")
-            self.write(filename, 'title="Volumes"')
-            self.write(filename, "weight=-10")
-            self.write(filename, 'menu="main"')
-            self.write(filename, "+++")
-            self.write(filename, "")
-            self.write(filename, '<h2> States </h2>')
-            state_counts = {}
-            for i in self.volumes:
-                state_counts[i[4]] = state_counts.setdefault(i[4],0) + 1 
-            print state_counts
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            keys = state_counts.keys()
-            keys.sort()
-            header = "".join(["<th>%s</th>" % i for i in keys])
-            self.write(filename, header) 
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            self.write(filename, '<tr>')
-            for i in sorted(state_counts):
-                self.write(filename, "<td>%s</td>" % state_counts[i])
-            self.write(filename, '</tr')
-            self.write(filename, '</tbody>')
-            self.write(filename, '</table>')
-            self.write(filename, '')
-            self.write(filename, "<h2> Volumes </h2>")
-            self.write(filename, "")
-            self.write(filename, '<table class="pure-table pure-table-bordered">')
-            self.write(filename, '<thead>')
-            self.write(filename, "<th>Name</th><th>Size (in GB)</th><th>Snapshot</th><th>Zone</th><th>State</th><th>Time</th>")
-            self.write(filename, '</thead>')
-            self.write(filename, '<tbody>')
-            for j, i in enumerate(self.volumes):
-                self.write(filename, '<tr class="%s">' % 'pure-table-odd' if j % 2 != 0 else '<tr>')
-                name,size,snap,zone,state,timestamp,_,_ = i
-                self.write(filename, "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>" % (name,size,snap,zone,state,timestamp))
-                self.write(filename, '</tr>')
-            self.write(filename, '</tbody>')
-            self.write(filename, '</table>')
+            page = pages.Page(self, "EucalyptusVolumes.html")
+            page.front_matter('title="Volumes"', "weight=-10", 'menu="main"')
+            page.write('<h2> States </h2>')
+            state_counts = self.volumes.getStateCounts()
+            keys = sorted(state_counts)
+            states_table = pages.TableTemplate(keys, "<td>%s</td>" * len(keys), striped=False)
+            page.table(states_table, [[state_counts[i] for i in keys]])
+            page.write('')
+
+            page_size = self.__get_page_size()
+            shard = self.getOptionValue("shard")
+            if pages.use_data_table(self, len(self.volumes)):
+                # A single data table replaces the shard pages.
+                page.write("<h2> Volumes </h2>")
+                page.write("")
+                page.data_table(VOLUMES_TABLE, (self.volumes.row(i) for i in xrange(len(self.volumes))), "volumes")
+            elif shard == "on" or (shard == "auto" and len(self.volumes) > page_size):
+                self.__write_shards(page, page_size)
+            else:
+                page.write("<h2> Volumes </h2>")
+                page.write("")
+                page.table(VOLUMES_TABLE, (self.volumes.row(i) for i in xrange(len(self.volumes))))
+            if self.volumes.getAttachmentCount() > 0:
+                page.write("")
+                page.write('<p><a href="../eucalyptusvolumeattachments/">Volume attachments</a></p>')
+            page.close()
+            if self.volumes.getAttachmentCount() > 0:
+                self.__write_attachments()
+
+    def __get_page_size(self):
+        try:
+            return max(int(self.getOptionValue("pagesize")), 1)
+        except (TypeError, ValueError):
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Invalid value for option pagesize: %s, using 1000."
+                                                           % self.getOptionValue("pagesize"))
+            return 1000
+
+    def __write_shards(self, index_page, page_size):
+        """
+        Writes the volumes in pages of at most page_size volumes per zone
+        and state, and a table linking them on the index page.
+        """
+        index_page.write("<h2> Volumes by Zone and State </h2>")
+        index_page.write("")
+        index_rows = []
+        groups = sorted(self.volumes.getGroups().items())
+        slugs = get_shard_slugs([(zone, state, (len(indexes) + page_size - 1) // page_size)
+                                 for (zone, state), indexes in groups])
+        for (zone, state), indexes in groups:
+            count = len(indexes)
+            shards = (count + page_size - 1) // page_size
+            slug = slugs[(zone, state)]
+            links = []
+            for n in range(shards):
+                name = "%s-%d" % (slug, n + 1)
+                links.append('<a href="../%s/">%d</a>' % (name, n + 1))
+                page = pages.Page(self, "%s.html" % name)
+                page.front_matter("title=%s" % pages.toml_string("Volumes in %s, %s (%d of %d)"
+                                                                 % (zone, state, n + 1, shards)), "weight=0")
+                page.write(self.__shard_navigation(slug, n + 1, shards))
+                page.write("")
+                page.table(VOLUMES_TABLE,
+                           (self.volumes.row(i) for i in indexes[n * page_size:(n + 1) * page_size]),
+                           n * page_size)
+                page.close()
+            index_rows.append((zone, state, count, pages.Raw(" ".join(links))))
+        index_page.table(SHARDS_TABLE, index_rows)
+
+    def __get_instances_by_node(self):
+        """
+        Returns a dict of node to the sorted ids of the instances with
+        attached volumes on that node. Instances that no node reports are
+        under UNKNOWN_NODE.
+        """
+        by_node = {}
+        for instance_id in self.volumes.getAttachedInstances():
+            node = self.instance_nodes.get(instance_id, UNKNOWN_NODE)
+            by_node.setdefault(node, []).append(instance_id)
+        for instance_ids in by_node.values():
+            instance_ids.sort()
+        return by_node
+
+    def __get_node_zone(self, node, instance_ids):
+        if node in self.nodes:
+            return self.nodes[node].zone
+        zones = set([self.instances[i].zone for i in instance_ids if i in self.instances])
+        return ", ".join(sorted(zones))
+
+    def __write_attachments(self):
+        """
+        Writes the volume attachments joined with the instances and the
+        nodes they run on, per node and per instance.
+        """
+        by_node = self.__get_instances_by_node()
+        nodes = sorted(by_node, key=lambda n: (n == UNKNOWN_NODE, hosts.ip_sort_key(n)))
+        page = pages.Page(self, "EucalyptusVolumeAttachments.html")
+        page.front_matter('title="Volume Attachments"', "weight=0")
+        page.write("<h2> Attachments by Node </h2>")
+        page.write("")
+        node_rows = []
+        for node in nodes:
+            attachments = [a for i in by_node[node] for a in self.volumes.getAttachmentsByInstance(i)]
+            size = 0
+            for a in attachments:
+                v = self.volumes.getVolumeIndex(self.volumes.attach_volumes[a])
+                if v is not None and self.volumes.sizes[v] > 0:
+                    size += self.volumes.sizes[v]
+            state = self.nodes[node].state_label() if node in self.nodes else ""
+            node_rows.append((node, self.__get_node_zone(node, by_node[node]), state,
+                              len(by_node[node]), len(attachments), size))
+        page.table(NODE_ATTACHMENTS_TABLE, node_rows)
+        page.write("")
+        page.write("<h2> Attachments by Instance </h2>")
+        page.write("")
+        page.table(INSTANCE_ATTACHMENTS_TABLE, self.__instance_attachment_rows(nodes, by_node))
+        page.close()
+
+    def __instance_attachment_rows(self, nodes, by_node):
+        for node in nodes:
+            for instance_id in by_node[node]:
+                instance = self.instances.get(instance_id)
+                state = instance.state if instance is not None else "(not found)"
+                for a in self.volumes.getAttachmentsByInstance(instance_id):
+                    yield (instance_id, state, node) + self.volumes.attachment_row(a)
+
+    def __shard_navigation(self, slug, number, shards):
+        links = ['<a href="../eucalyptusvolumes/">All volumes</a>']
+        if number > 1:
+            links.append('<a href="../%s-%d/">Previous</a>' % (slug, number - 1))
+        if number < shards:
+            links.append('<a href="../%s-%d/">Next</a>' % (slug, number + 1))
+        return "<p>%s</p>" % " | ".join(links)
 
+    @perf.timed("action")
     def action(self):
         """
         This function performs some external task such as opening web
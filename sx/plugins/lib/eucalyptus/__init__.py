@@ -0,0 +1,20 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Shared helpers for the Eucalyptus sxconsole plugins.
+
+This package is installed next to the sxconsole helper libraries in
+sx/plugins/lib/ so that the plugins in $HOME/.sx/sxplugins/ can import
+it as sx.plugins.lib.eucalyptus.
+"""
@@ -0,0 +1,229 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Sparse extraction of sosreport archives.
+
+The plugins declare the report paths they read in a REPORT_PATHS class
+attribute (fnmatch patterns relative to the report root). extract()
+streams an archive once and writes only the matching members, and the
+files identifying the host, so a case can be analyzed by sxconsole
+without decompressing gigabytes of logs to disk.
+
+Python 2 tarfile can't read xz, so .tar.xz archives are decompressed
+with the lzma module when one is installed (backports.lzma) and through
+the xz command otherwise. Symlinks (sosreports link date, ifconfig and
+others into sos_commands) are followed; when a link's target was already
+passed in the stream a second pass extracts it.
+
+@version   :  1.0
+"""
+import os
+import errno
+import fnmatch
+import tarfile
+import posixpath
+import subprocess
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+ARCHIVE_SUFFIXES = (".tar.xz", ".tar.gz", ".tar.bz2", ".tgz", ".tar")
+# The files sosreport writes at the report root to identify the host,
+# always extracted so that a sparse report is loaded by sxconsole -p (and
+# extracted.ExtractedReport) with the same hostname and date as a full
+# one.
+IDENTITY_PATHS = ["hostname", "date", "uname", "version.txt"]
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def report_name(archive_path):
+    """
+    Returns the name of the report directory of an archive, its file name
+    without the archive suffix.
+    """
+    name = os.path.basename(archive_path)
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def get_report_paths(plugin_classes):
+    """
+    Returns the sorted union of the REPORT_PATHS of plugin classes.
+    """
+    paths = set()
+    for plugin_class in plugin_classes:
+        paths.update(getattr(plugin_class, "REPORT_PATHS", []))
+    return sorted(paths)
+
+
+def _relative_name(member_name):
+    """
+    Returns the path of an archive member relative to the report root,
+    the top level directory of the archive, or None for the top level
+    directory itself and unsafe names.
+    """
+    name = posixpath.normpath(member_name)
+    parts = name.split("/", 1)
+    if len(parts) < 2 or name.startswith("/") or ".." in name.split("/"):
+        return None
+    return parts[1]
+
+
+def _open_stream(archive_path):
+    """
+    Returns (tarfile, process) reading the archive as a stream, the
+    process being the xz decompressor or None.
+    """
+    process = None
+    try:
+        if not archive_path.endswith(".tar.xz"):
+            return tarfile.open(archive_path, "r|*"), None
+        if lzma is not None:
+            return tarfile.open(fileobj=lzma.LZMAFile(archive_path), mode="r|"), None
+        try:
+            process = subprocess.Popen(["xz", "-dc", archive_path], stdout=subprocess.PIPE)
+        except OSError, e:
+            raise ArchiveError("Unable to run xz to read %s: %s" % (archive_path, e))
+        return tarfile.open(fileobj=process.stdout, mode="r|"), process
+    except (tarfile.TarError, IOError, EOFError), e:
+        # The first header is read when the archive is opened.
+        if process is not None:
+            process.stdout.close()
+            process.wait()
+        raise ArchiveError("Unable to read %s: %s" % (archive_path, e))
+
+
+def _matches(relpath, patterns):
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(relpath, pattern):
+            return True
+    return False
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _write_member(tar, member, dest):
+    _makedirs(os.path.dirname(dest))
+    fin = tar.extractfile(member)
+    fout = open(dest, "wb")
+    try:
+        while True:
+            block = fin.read(1024 * 1024)
+            if not block:
+                break
+            fout.write(block)
+    finally:
+        fout.close()
+        fin.close()
+
+
+def _link_target(relpath, linkname):
+    """
+    Returns the report relative path a symlink member points to, or None
+    if it points outside the report.
+    """
+    if linkname.startswith("/"):
+        return None
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(relpath), linkname))
+    if target.startswith("..") or target == ".":
+        return None
+    return target
+
+
+def _scan(archive_path, dest_dir, wanted, exact):
+    """
+    Streams an archive once, extracting the files matching the wanted
+    patterns or in the exact set. Returns (extracted, links), the links
+    being a dict of symlink path to its target for the matching
+    symlinks.
+    """
+    extracted = set()
+    links = {}
+    tar, process = _open_stream(archive_path)
+    try:
+        for member in tar:
+            relpath = _relative_name(member.name)
+            if relpath is None or not (relpath in exact or _matches(relpath, wanted)):
+                continue
+            if member.isfile():
+                _write_member(tar, member, os.path.join(dest_dir, relpath))
+                extracted.add(relpath)
+            elif member.issym():
+                target = _link_target(relpath, member.linkname)
+                if target is not None:
+                    links[relpath] = target
+    except (tarfile.TarError, IOError, EOFError), e:
+        raise ArchiveError("Unable to read %s: %s" % (archive_path, e))
+    finally:
+        tar.close()
+        if process is not None:
+            process.stdout.close()
+            process.wait()
+    return extracted, links
+
+
+def extract(archive_path, dest_dir, patterns):
+    """
+    Extracts the members of a sosreport archive matching patterns, and
+    the IDENTITY_PATHS, into dest_dir without the archive's top level
+    directory, and returns the sorted list of extracted paths relative
+    to dest_dir.
+
+    @param archive_path: The path to the sosreport archive.
+    @type archive_path: String
+    @param dest_dir: The directory the report is extracted to.
+    @type dest_dir: String
+    @param patterns: fnmatch patterns of the paths relative to the
+    report root, as in the plugins' REPORT_PATHS.
+    @type patterns: Array
+    """
+    _makedirs(dest_dir)
+    extracted, links = _scan(archive_path, dest_dir, patterns, set(IDENTITY_PATHS))
+    # Links whose target was already passed in the stream, or is itself
+    # a link, need another pass. Sosreports only link one level deep, a
+    # few passes cover any reasonable chain.
+    for _ in range(3):
+        missing = set([t for t in links.values() if t not in extracted and t not in links])
+        if not missing:
+            break
+        more, more_links = _scan(archive_path, dest_dir, [], missing)
+        extracted.update(more)
+        new_links = dict([(l, t) for l, t in more_links.items() if l not in links])
+        if not more and not new_links:
+            break
+        links.update(new_links)
+    for link, target in sorted(links.items()):
+        path = os.path.join(dest_dir, link)
+        _makedirs(os.path.dirname(path))
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(os.path.relpath(os.path.join(dest_dir, target), os.path.dirname(path)), path)
+        extracted.add(link)
+    return sorted(extracted)
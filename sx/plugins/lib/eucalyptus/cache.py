@@ -0,0 +1,313 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+On-disk cache of the data parsed from each report.
+
+The result of a per-report parser (see reportdata) is pickled into a
+cache directory of the report in the user's sx directory, named after
+the sha1 of the report's path. The cache is never kept inside the
+extracted report: the reports come from other machines, and a pickle
+shipped in a crafted archive would run code when loaded.
+
+An entry is reused as long as the parser version (and key, for parsers
+whose result depends on a setting) is unchanged and every source file it
+was built from has the same size and either the same mtime or the same
+sha1. A source can be a glob pattern, the entry is then also invalid
+when the files it matches change.
+
+Every cache directory that is used is recorded in a registry in the
+user's sx directory. enforce_limit() removes the least recently used
+cache directories once their total size goes over the limit, which keeps
+an sxarchive with hundreds of cases from growing without bound.
+
+@version   :  1.0
+"""
+import os
+import glob
+import json
+import time
+import errno
+import hashlib
+import shutil
+import logging
+import cPickle
+
+import sx
+from sx.plugins.lib.eucalyptus import manifest
+
+CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".sx", "eucasx-cache")
+REGISTRY_PATH = os.path.join(os.path.expanduser("~"), ".sx", "eucasx-cache.json")
+
+# The options added to every plugin that caches its parsed data.
+CACHE_OPTION = "cache"
+CACHE_OPTION_DESCRIPTION = "Cache the parsed report data in ~/.sx/eucasx-cache. [on]"
+CACHE_SIZE_OPTION = "cachesize"
+CACHE_SIZE_OPTION_DESCRIPTION = "Maximum size in MB of all the report caches. [512]"
+
+
+def parser(version, sources, key=None):
+    """
+    Decorator declaring the cache version of a per-report parser and the
+    report files its result is built from. The function is returned
+    unchanged so that it can still be pickled by the worker pool.
+
+    @param version: Bump this when the structure of the result changes.
+    @type version: Int
+    @param sources: The paths relative to the report root that are read,
+    or glob patterns of them.
+    @type sources: Array
+    @param key: Returns a string identifying the settings the result
+    depends on, an entry built with another key is not reused.
+    @type key: Function
+    """
+    def decorate(func):
+        func.cache_version = version
+        func.cache_sources = tuple(sources)
+        func.cache_key = key
+        return func
+    return decorate
+
+
+def _get_key(func):
+    key = getattr(func, "cache_key", None)
+    return key() if key is not None else None
+
+
+def expand_sources(sources, report_root):
+    """
+    Returns the source paths of a report, with the glob patterns replaced
+    by the sorted paths of the files they match.
+    """
+    relpaths = []
+    for relpath in sources:
+        if not glob.has_magic(relpath):
+            relpaths.append(relpath)
+            continue
+        relpaths.extend(sorted([os.path.relpath(p, report_root) for p in glob.glob(os.path.join(report_root, relpath))
+                                if os.path.isfile(p)]))
+    return relpaths
+
+
+def get_cache_dir(report_root):
+    """
+    Returns the cache directory of an extracted report, below CACHE_ROOT.
+    """
+    return os.path.join(CACHE_ROOT, hashlib.sha1(os.path.realpath(report_root)).hexdigest())
+
+
+def _source_state(path, stored=None):
+    """
+    Returns the (size, mtime, sha1) state of a source file, or None if it
+    doesn't exist. When the stored state has the same size and mtime the
+    sha1 is not recomputed.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if stored is not None and stored[0] == st.st_size and stored[1] == st.st_mtime:
+        return tuple(stored)
+    return (st.st_size, st.st_mtime, manifest.file_sha1(path))
+
+
+def _validate(entry, func, report_root):
+    """
+    Returns the current state of the entry's source files if the entry is
+    still valid, otherwise None.
+    """
+    if entry.get("version") != func.cache_version or entry.get("key") != _get_key(func):
+        return None
+    stored_sources = entry.get("sources", {})
+    relpaths = expand_sources(func.cache_sources, report_root)
+    if set(relpaths) != set(stored_sources):
+        # A file matching a pattern was added or removed.
+        return None
+    sources = {}
+    for relpath in relpaths:
+        stored = stored_sources.get(relpath)
+        path = os.path.join(report_root, relpath)
+        if stored is None:
+            if os.path.exists(path):
+                return None
+            sources[relpath] = None
+            continue
+        # Only hash the file when the size matches but the mtime moved, as
+        # happens when the same sosreport is extracted again.
+        try:
+            if os.path.getsize(path) != stored[0]:
+                return None
+        except OSError:
+            return None
+        state = _source_state(path, stored)
+        if state is None or state[2] != stored[2]:
+            return None
+        sources[relpath] = state
+    return sources
+
+
+def load_or_parse(func, info):
+    """
+    Returns func(info), from the cache when a valid entry exists. The
+    result is stored in the cache when it had to be computed.
+
+    @param func: A parser decorated with parser().
+    @type func: Function
+    @param info: The report to parse.
+    @type info: ReportInfo
+    """
+    cache_file = os.path.join(get_cache_dir(info.path), "%s.pickle" % func.__name__)
+    try:
+        fin = open(cache_file, "rb")
+        try:
+            entry = cPickle.load(fin)
+        finally:
+            fin.close()
+        sources = _validate(entry, func, info.path)
+        if sources is not None:
+            if sources != entry["sources"]:
+                # Same content with a new mtime, remember it to skip hashing next time.
+                entry["sources"] = sources
+                _store(cache_file, entry)
+            return entry["data"]
+    except (IOError, EOFError, ImportError, cPickle.UnpicklingError, AttributeError, KeyError, TypeError, ValueError):
+        pass
+
+    # Stat the sources before parsing so that a file modified while it is
+    # parsed invalidates the entry on the next run.
+    sources = dict((relpath, _source_state(os.path.join(info.path, relpath)))
+                   for relpath in expand_sources(func.cache_sources, info.path))
+    data = func(info)
+    _store(cache_file, {"version": func.cache_version, "key": _get_key(func), "sources": sources, "data": data})
+    return data
+
+
+def _store(cache_file, entry):
+    tmp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.isdir(cache_dir):
+            try:
+                # Only the user can write the pickles that are loaded.
+                os.makedirs(cache_dir, 0700)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+        fout = open(tmp_file, "wb")
+        try:
+            cPickle.dump(entry, fout, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            fout.close()
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError), e:
+        # A read only report directory just means no caching.
+        logging.getLogger(sx.MAIN_LOGGER_NAME).debug("Unable to write cache file %s: %s" % (cache_file, e))
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _dir_size(path):
+    total = 0
+    for fname in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, fname))
+        except OSError:
+            pass
+    return total
+
+
+def _load_registry():
+    try:
+        fin = open(REGISTRY_PATH, "r")
+        try:
+            return json.load(fin)
+        finally:
+            fin.close()
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_registry(registry):
+    tmp_file = "%s.%d.tmp" % (REGISTRY_PATH, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(REGISTRY_PATH)):
+            os.makedirs(os.path.dirname(REGISTRY_PATH))
+        fout = open(tmp_file, "w")
+        try:
+            json.dump(registry, fout)
+        finally:
+            fout.close()
+        os.rename(tmp_file, REGISTRY_PATH)
+    except (IOError, OSError), e:
+        logging.getLogger(sx.MAIN_LOGGER_NAME).debug("Unable to write cache registry %s: %s" % (REGISTRY_PATH, e))
+
+
+def enforce_limit(report_roots, max_bytes):
+    """
+    Records the cache directories of the reports as just used, then
+    removes the least recently used cache directories of all cases until
+    the total size is below max_bytes. The caches of report_roots are
+    never removed.
+
+    @param report_roots: The paths of the extracted reports used in this
+    run.
+    @type report_roots: Array
+    @param max_bytes: The maximum total size of all the caches.
+    @type max_bytes: Int
+    """
+    registry = _load_registry()
+    now = time.time()
+    in_use = set()
+    for root in report_roots:
+        cache_dir = get_cache_dir(root)
+        if os.path.isdir(cache_dir):
+            registry[cache_dir] = now
+            in_use.add(cache_dir)
+
+    sizes = {}
+    for cache_dir in registry.keys():
+        if os.path.isdir(cache_dir):
+            sizes[cache_dir] = _dir_size(cache_dir)
+        else:
+            del registry[cache_dir]
+
+    total = sum(sizes.values())
+    for cache_dir in sorted(registry, key=registry.get):
+        if total <= max_bytes:
+            break
+        if cache_dir in in_use:
+            continue
+        logging.getLogger(sx.MAIN_LOGGER_NAME).info("Removing report cache: %s" % cache_dir)
+        shutil.rmtree(cache_dir, True)
+        total -= sizes[cache_dir]
+        del registry[cache_dir]
+    _save_registry(registry)
+
+
+def is_enabled(plugin):
+    """
+    Returns True if the plugin's "cache" option is on.
+    """
+    return plugin.getOptionValue(CACHE_OPTION) == "on"
+
+
+def get_size_limit(plugin):
+    """
+    Returns the plugin's "cachesize" option in bytes.
+    """
+    value = plugin.getOptionValue(CACHE_SIZE_OPTION)
+    try:
+        return int(value) * 1024 * 1024
+    except (TypeError, ValueError):
+        logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Invalid value for option %s: %s, using 512." % (CACHE_SIZE_OPTION, value))
+        return 512 * 1024 * 1024
@@ -0,0 +1,150 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Conversion of the date output of the reports to UTC epochs and the clock
+skew between hosts.
+
+The timezone abbreviations are looked up in a fixed table, and numeric
+offsets are parsed once per distinct value, so converting the dates of
+hundreds of hosts is a dictionary lookup and a timegm() each. The skew of
+every host is its distance to the median of all the hosts, which needs a
+single sort instead of comparing every pair of hosts.
+
+@version   :  1.0
+"""
+import re
+import time
+import calendar
+import datetime
+
+MONTHS = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+          "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
+
+# UTC offsets in minutes of the abbreviations date prints. Ambiguous
+# abbreviations (IST, CST) use their most common meaning for our
+# deployments, North America first.
+TZ_OFFSETS = {"UTC": 0, "GMT": 0, "Z": 0, "WET": 0, "WEST": 60, "BST": 60,
+              "CET": 60, "CEST": 120, "EET": 120, "EEST": 180, "MSK": 180,
+              "IST": 330, "SGT": 480, "HKT": 480, "JST": 540, "KST": 540,
+              "AWST": 480, "ACST": 570, "ACDT": 630, "AEST": 600, "AEDT": 660,
+              "NZST": 720, "NZDT": 780,
+              "NST": -210, "NDT": -150, "AST": -240, "ADT": -180,
+              "EST": -300, "EDT": -240, "CST": -360, "CDT": -300,
+              "MST": -420, "MDT": -360, "PST": -480, "PDT": -420,
+              "AKST": -540, "AKDT": -480, "HST": -600}
+
+_numeric_tz_re = re.compile(r"^([+-])(\d\d):?(\d\d)$")
+_iso_re = re.compile(r"^(\d{4})-(\d\d)-(\d\d)(?:[ T](\d\d):(\d\d)(?::(\d\d))?)?")
+
+# Offsets of the numeric and unknown timezones seen so far.
+_tz_cache = {}
+
+
+def get_tz_offset(tz):
+    """
+    Returns the UTC offset in seconds of a timezone abbreviation or
+    numeric offset (+0200), or None if it is unknown.
+    """
+    if tz in TZ_OFFSETS:
+        return TZ_OFFSETS[tz] * 60
+    if tz not in _tz_cache:
+        offset = None
+        match = _numeric_tz_re.match(tz)
+        if match:
+            offset = (int(match.group(2)) * 60 + int(match.group(3))) * 60
+            if match.group(1) == "-":
+                offset = -offset
+        _tz_cache[tz] = offset
+    return _tz_cache[tz]
+
+
+def parse_date_output(line):
+    """
+    Returns the UTC epoch of the output of date (Tue May 12 13:41:27 PDT
+    2015), or None if it can't be parsed or the timezone is unknown.
+    """
+    fields = line.split()
+    if len(fields) != 6:
+        return None
+    month = MONTHS.get(fields[1])
+    offset = get_tz_offset(fields[4])
+    if month is None or offset is None:
+        return None
+    try:
+        hour, minute, second = [int(f) for f in fields[3].split(":")]
+        local = calendar.timegm((int(fields[5]), month, int(fields[2]), hour, minute, second, 0, 0, 0))
+    except ValueError:
+        return None
+    return local - offset
+
+
+def parse_report_date(value):
+    """
+    Returns (epoch, has_time) for the date of a report, which can be a
+    datetime, an epoch or a string (2015-05-12 13:41:27 or the output of
+    date). Dates without a time of day are midnight UTC with has_time
+    False. Returns (None, False) if the date can't be understood.
+    """
+    if value is None:
+        return None, False
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value - value.utcoffset()
+        return calendar.timegm(value.timetuple()), True
+    if isinstance(value, datetime.date):
+        return calendar.timegm(value.timetuple()), False
+    if isinstance(value, (int, long, float)):
+        return int(value), True
+    value = str(value).strip()
+    match = _iso_re.match(value)
+    if match:
+        year, month, day, hour, minute, second = [int(g or 0) for g in match.groups()]
+        try:
+            epoch = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+        except ValueError:
+            return None, False
+        return epoch, match.group(4) is not None
+    epoch = parse_date_output(value)
+    return epoch, epoch is not None
+
+
+def format_epoch(epoch):
+    if epoch is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(epoch))
+
+
+def median(values):
+    """
+    Returns the median of a non empty list of numbers.
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def get_skews(epochs):
+    """
+    Returns (median, skews) for a dict of host to epoch: the median epoch
+    and a dict of host to its signed distance in seconds to the median.
+    Hosts whose epoch is None are left out. The median is None if no
+    host has an epoch.
+    """
+    known = dict([(host, epoch) for host, epoch in epochs.items() if epoch is not None])
+    if len(known) == 0:
+        return None, {}
+    center = median(known.values())
+    return center, dict([(host, epoch - center) for host, epoch in known.items()])
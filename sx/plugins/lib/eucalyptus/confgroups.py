@@ -0,0 +1,150 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Grouping of identical eucalyptus.conf files across hosts.
+
+A configuration is canonicalized (last assignment of a key wins, keys
+sorted, surrounding whitespace and quotes removed from the values) and
+fingerprinted with the sha1 of the canonical form. Hosts with the same
+fingerprint share a ConfigGroup, so a cloud of hundreds of identically
+configured node controllers is reported as a single configuration.
+
+@version   :  1.0
+"""
+import hashlib
+
+
+def canonical_value(value):
+    """
+    Returns a value with surrounding whitespace and one level of matching
+    quotes removed, so that NC_PORT="8775" and NC_PORT=8775 compare
+    equal.
+    """
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        value = value[1:-1]
+    return value
+
+
+def canonicalize(conf):
+    """
+    Returns the canonical form of the (key, value) tuples of a
+    configuration file: a sorted tuple of (key, canonical value) with
+    only the last assignment of each key.
+    """
+    values = {}
+    for key, value in conf:
+        values[key.strip()] = canonical_value(value)
+    return tuple(sorted(values.items()))
+
+
+def fingerprint(canonical):
+    """
+    Returns the sha1 hex digest of a canonical configuration.
+    """
+    digest = hashlib.sha1()
+    for key, value in canonical:
+        digest.update("%s=%s\n" % (key, value))
+    return digest.hexdigest()
+
+
+class ConfigGroup(object):
+    """
+    A distinct configuration and the hosts that have it.
+    """
+    def __init__(self, digest, conf, canonical):
+        self.digest = digest
+        self.conf = conf
+        self.values = dict(canonical)
+        self.hosts = []
+
+    def getName(self):
+        """
+        Returns a short name for the group, stable as long as the
+        configuration does not change.
+        """
+        return self.digest[:8]
+
+
+class ConfigGroups(object):
+    """
+    The eucalyptus.conf files of a cloud grouped by fingerprint.
+    """
+    def __init__(self):
+        self.__groups = {}
+        # Derived majority values, built on first use.
+        self.__majority = None
+
+    def add(self, host, conf, digest=None, canonical=None):
+        """
+        Adds the configuration of a host. The canonical form and digest
+        are computed unless given.
+        """
+        if canonical is None:
+            canonical = canonicalize(conf)
+        if digest is None:
+            digest = fingerprint(canonical)
+        group = self.__groups.get(digest)
+        if group is None:
+            group = self.__groups[digest] = ConfigGroup(digest, conf, canonical)
+        group.hosts.append(host)
+        self.__majority = None
+
+    def __len__(self):
+        return len(self.__groups)
+
+    def getHostCount(self):
+        return sum([len(g.hosts) for g in self.__groups.values()])
+
+    def getGroups(self):
+        """
+        Returns the groups, the most common configuration first.
+        """
+        return sorted(self.__groups.values(), key=lambda g: (-len(g.hosts), g.digest))
+
+    def getMajorityValues(self):
+        """
+        Returns a dict of every key to its most common canonical value
+        across all hosts, None when most hosts don't set the key.
+        """
+        if self.__majority is None:
+            groups = self.getGroups()
+            keys = set()
+            for group in groups:
+                keys.update(group.values)
+            majority = {}
+            for key in keys:
+                counts = {}
+                for group in groups:
+                    value = group.values.get(key)
+                    counts[value] = counts.get(value, 0) + len(group.hosts)
+                # Ties go to the value of the most common configuration.
+                best = groups[0].values.get(key)
+                for group in groups[1:]:
+                    value = group.values.get(key)
+                    if counts[value] > counts[best]:
+                        best = value
+                majority[key] = best
+            self.__majority = majority
+        return self.__majority
+
+    def getDriftKeys(self):
+        """
+        Returns the sorted keys whose value differs from the majority in
+        at least one configuration.
+        """
+        majority = self.getMajorityValues()
+        groups = self.__groups.values()
+        return sorted([key for key, value in majority.items()
+                       if any([g.values.get(key) != value for g in groups])])
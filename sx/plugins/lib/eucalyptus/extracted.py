@@ -0,0 +1,85 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Extracted sosreport directories handed to the plugins by the tools that
+run them without the sxconsole command (watch.py, benchmark.py).
+
+ExtractedReport presents a directory the way sxconsole's Report does: the
+hostname is the one sosreport recorded in the report's hostname file, not
+the name of the directory (sosreport-nc1-20150512135434-4c57), and the
+date is the output of date the report recorded. The files are the ones
+archive.extract() always extracts, so sparse reports have them too.
+
+@version   :  1.0
+"""
+import os
+
+HOSTNAME_FILE = "hostname"
+DATE_FILE = "date"
+
+
+def _first_line(path):
+    """
+    Returns the first line of a file stripped, or None if the file is
+    missing or empty.
+    """
+    try:
+        fin = open(path, "r")
+    except IOError:
+        return None
+    try:
+        line = fin.readline().strip()
+    finally:
+        fin.close()
+    return line or None
+
+
+def get_hostname(report_root):
+    """
+    Returns the hostname recorded in an extracted report, or the name of
+    the report directory when it has no hostname file.
+    """
+    hostname = _first_line(os.path.join(report_root, HOSTNAME_FILE))
+    if hostname is None:
+        return os.path.basename(os.path.normpath(report_root))
+    return hostname
+
+
+class ExtractedReport(object):
+    """
+    An extracted report directory, with the part of sxconsole's Report
+    the Eucalyptus plugins use.
+    """
+    def __init__(self, path):
+        self.__path = path
+        self.__hostname = get_hostname(path)
+
+    def getHostname(self):
+        return self.__hostname
+
+    def getDate(self):
+        return _first_line(os.path.join(self.__path, DATE_FILE))
+
+    def getPathToExtractedReport(self):
+        return self.__path
+
+    def getDataFromFile(self, relpath):
+        path = os.path.join(self.__path, relpath)
+        if not os.path.isfile(path):
+            return None
+        fin = open(path, "r")
+        try:
+            return fin.readlines()
+        finally:
+            fin.close()
@@ -0,0 +1,183 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Resolution of host names, addresses and Eucalyptus components across
+all the reports of a case.
+
+HostIndex is fed every /etc/hosts entry, the addresses of each report's
+host and the service URLs. Names, addresses and components are related
+many to many, and a host that only shows up in another host's hosts file
+or in a service URL is still resolved even without a sosreport of its
+own.
+
+@version   :  1.0
+"""
+import urlparse
+
+
+def is_loopback(ip):
+    return ip.startswith("127.") or ip == "::1"
+
+
+def ip_sort_key(ip):
+    """
+    Sort key ordering IPv4 addresses numerically, followed by anything
+    else (IPv6 addresses, names) alphabetically.
+    """
+    parts = ip.split(".")
+    if len(parts) == 4 and all(p.isdigit() for p in parts):
+        return (0, tuple([int(p) for p in parts]))
+    return (1, ip)
+
+
+class HostIndex(object):
+    """
+    Many to many index of host names, IP addresses and the components
+    (service types) reachable through them.
+    """
+    def __init__(self):
+        self.__ip_to_names = {}
+        self.__name_to_ips = {}
+        self.__report_host_to_ips = {}
+        self.__ip_to_report_host = {}
+        self.__address_to_components = {}
+        # Derived ip -> components index, built on first use.
+        self.__ip_components = None
+
+    def add_hosts_entry(self, ip, names):
+        """
+        Adds an /etc/hosts entry, from any report.
+        """
+        if is_loopback(ip):
+            return
+        self.__ip_to_names.setdefault(ip, set()).update(names)
+        for name in names:
+            self.__name_to_ips.setdefault(name, set()).add(ip)
+        self.__ip_components = None
+
+    def add_report_host(self, hostname, ips):
+        """
+        Adds the addresses of the host a report was collected on.
+        """
+        ips = set([ip for ip in ips if not is_loopback(ip)])
+        self.__report_host_to_ips.setdefault(hostname, set()).update(ips)
+        for ip in ips:
+            self.__ip_to_report_host.setdefault(ip, hostname)
+        self.__ip_components = None
+
+    def add_report(self, hostname, hosts, ifconfig_ips):
+        """
+        Adds what a report tells about the hosts: every entry of its hosts
+        file, and the addresses of its own host from the entries naming it
+        and from ifconfig.
+
+        @param hosts: The (ip, [names]) entries of the hosts file.
+        @type hosts: Array
+        @param ifconfig_ips: The ifconfig addresses, None without ifconfig
+        output.
+        @type ifconfig_ips: Set
+        """
+        # Every hosts entry goes into the index, other hosts' files are
+        # often the only place a host without a sosreport is named.
+        report_ips = set()
+        for ip, names in hosts:
+            self.add_hosts_entry(ip, names)
+            if hostname in names:
+                report_ips.add(ip)
+        # The ifconfig addresses are used too, because sometimes the
+        # hosts file doesn't have the correct information.
+        if ifconfig_ips is not None:
+            report_ips.update(ifconfig_ips)
+        self.add_report_host(hostname, report_ips)
+
+    def add_service_url(self, url, stype):
+        """
+        Records that a component of type stype listens on the host (name
+        or address) of url.
+        """
+        address = urlparse.urlparse(url).hostname
+        if address:
+            self.__address_to_components.setdefault(address, set()).add(stype)
+            self.__ip_components = None
+
+    def resolve(self, address):
+        """
+        Returns the set of IP addresses of a name or address.
+        """
+        ips = self.__name_to_ips.get(address, set()) | self.__report_host_to_ips.get(address, set())
+        return ips or set([address])
+
+    def getNames(self, ip):
+        return self.__ip_to_names.get(ip, set())
+
+    def getReportHosts(self):
+        return self.__report_host_to_ips.keys()
+
+    def getReportHostIps(self, hostname):
+        return self.__report_host_to_ips.get(hostname, set())
+
+    def getAddresses(self):
+        """
+        Returns the set of every known non loopback address, from the
+        hosts files and the reports' hosts.
+        """
+        return set(self.__ip_to_names) | set(self.__ip_to_report_host)
+
+    def getReportHost(self, address):
+        """
+        Returns the hostname of the report covering a name or address, or
+        None.
+        """
+        for ip in self.resolve(address):
+            if ip in self.__ip_to_report_host:
+                return self.__ip_to_report_host[ip]
+        return None
+
+    def getUrlReportHost(self, url):
+        """
+        Returns the hostname of the report covering the host of a service
+        URL, or None.
+        """
+        address = urlparse.urlparse(url).hostname
+        if not address:
+            return None
+        return self.getReportHost(address)
+
+    def __build_ip_components(self):
+        ip_components = {}
+        for address, components in self.__address_to_components.items():
+            for ip in self.resolve(address):
+                ip_components.setdefault(ip, set()).update(components)
+        self.__ip_components = ip_components
+
+    def getComponents(self, address):
+        """
+        Returns the set of component types reachable through a name,
+        address or report hostname.
+        """
+        if self.__ip_components is None:
+            self.__build_ip_components()
+        components = set(self.__address_to_components.get(address, set()))
+        for ip in self.resolve(address):
+            components.update(self.__ip_components.get(ip, set()))
+        return components
+
+    def getUnreportedAddresses(self):
+        """
+        Returns the sorted list of service addresses that are not covered
+        by any report.
+        """
+        return sorted([address for address in self.__address_to_components
+                       if self.getReportHost(address) is None],
+                      key=ip_sort_key)
@@ -0,0 +1,173 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+The log lines of a time window, found without reading the whole logs.
+
+logscan.scan_file() indexes every log it scans: the timestamp and byte
+offset of a line every INDEX_STEP bytes, kept with the cached scan in
+the report's cache directory. extract_window() bisects that index to the
+INDEX_STEP bytes where the window starts, narrows them down with a
+binary search over the memory mapped log, and reads the lines from there
+until the end of the window. Pulling a few minutes out of a log of
+several GB reads a few hundred KB of it.
+
+The logs are expected in time order, as they are written. Lines without
+a timestamp of their own (stack traces) belong to the last line that had
+one.
+
+@version   :  1.0
+"""
+import re
+import mmap
+import bisect
+
+from sx.plugins.lib.eucalyptus import logscan
+from sx.plugins.lib.eucalyptus import perf
+
+# Maximum lines extracted from a log for a window.
+MAX_WINDOW_LINES = 5000
+# Below this many bytes the binary search gives way to reading the lines.
+_SCAN_SIZE = 4096
+
+_window_re = re.compile(r"^(\d{4}-\d\d-\d\d)[T ](\d\d:\d\d(?::\d\d)?)/(?:(\d{4}-\d\d-\d\d)[T ])?(\d\d:\d\d(?::\d\d)?)$")
+
+
+def parse_window(value):
+    """
+    Returns the (start, end) timestamps, "YYYY-MM-DD HH:MM:SS", of a
+    window written START/END, like 2016-03-14T15:20/15:35 or
+    2016-03-14T23:50:00/2016-03-15T00:10:00. The end is inclusive, a
+    minute includes its 59th second. Raises ValueError if the window
+    can't be parsed or ends before it starts.
+    """
+    m = _window_re.match(value.strip())
+    if m is None:
+        raise ValueError("expected START/END, like 2016-03-14T15:20/15:35")
+    start_day, start_time, end_day, end_time = m.groups()
+    if len(start_time) == 5:
+        start_time += ":00"
+    if len(end_time) == 5:
+        end_time += ":59"
+    start = "%s %s" % (start_day, start_time)
+    end = "%s %s" % (end_day or start_day, end_time)
+    if end < start:
+        raise ValueError("the window ends before it starts")
+    return start, end
+
+
+def _next_stamp(mm, pos, end):
+    """
+    Returns (timestamp, offset) of the first line with a timestamp from
+    the line starting at pos up to end, or (None, None).
+    """
+    while pos < end:
+        eol = mm.find("\n", pos, end)
+        if eol < 0:
+            eol = end
+        first = mm[pos]
+        if first == "[" or first.isdigit():
+            timestamp = logscan.get_timestamp(mm[pos:min(eol, pos + 64)])
+            if timestamp is not None:
+                return timestamp, pos
+        pos = eol + 1
+    return None, None
+
+
+def _line_start(mm, pos, lo):
+    """
+    Returns the offset of the first line starting at or after pos.
+    """
+    if pos <= lo:
+        return lo
+    eol = mm.find("\n", pos - 1)
+    return eol + 1 if eol >= 0 else len(mm)
+
+
+def find_offset(mm, index, timestamp):
+    """
+    Returns the offset of the first line of a memory mapped log stamped
+    at or after timestamp, or the size of the log.
+
+    @param mm: The memory mapped log.
+    @type mm: mmap
+    @param index: The (timestamp, offset) index of the log.
+    @type index: Array
+    @param timestamp: "YYYY-MM-DD HH:MM:SS"
+    @type timestamp: String
+    """
+    n = bisect.bisect_left(index, (timestamp,))
+    lo = index[n - 1][1] if n > 0 else 0
+    hi = found = index[n][1] if n < len(index) else len(mm)
+    # Every line stamped before lo is before the timestamp, found is the
+    # first line at or after it from hi on.
+    while hi - lo > _SCAN_SIZE:
+        start = _line_start(mm, (lo + hi) // 2, lo)
+        if start >= hi:
+            break
+        stamp, pos = _next_stamp(mm, start, hi)
+        if stamp is None or stamp >= timestamp:
+            if stamp is not None:
+                found = pos
+            hi = start
+        else:
+            eol = mm.find("\n", pos, hi)
+            lo = eol + 1 if eol >= 0 else hi
+    stamp, pos = _next_stamp(mm, lo, hi)
+    while stamp is not None and stamp < timestamp:
+        stamp, pos = _next_stamp(mm, mm.find("\n", pos, hi) + 1 or hi, hi)
+    return pos if stamp is not None else found
+
+
+def extract_window(path, index, start, end, max_lines=MAX_WINDOW_LINES):
+    """
+    Returns the lines of a log from start to end, both "YYYY-MM-DD
+    HH:MM:SS", and True if there were more than max_lines of them.
+
+    @param path: The log file.
+    @type path: String
+    @param index: The (timestamp, offset) index of the log built by
+    logscan.scan_file().
+    @type index: Array
+    """
+    fin = open(path, "rb")
+    try:
+        try:
+            mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # An empty log can't be mapped.
+            return [], False
+        try:
+            pos = begin = find_offset(mm, index, start)
+            size = len(mm)
+            lines = []
+            while pos < size:
+                eol = mm.find("\n", pos)
+                if eol < 0:
+                    eol = size
+                first = mm[pos]
+                if first == "[" or first.isdigit():
+                    timestamp = logscan.get_timestamp(mm[pos:min(eol, pos + 64)])
+                    if timestamp is not None and timestamp > end:
+                        break
+                if len(lines) == max_lines:
+                    perf.count_read(path, pos - begin, len(lines))
+                    return lines, True
+                lines.append(mm[pos:eol].rstrip("\r"))
+                pos = eol + 1
+            perf.count_read(path, min(pos, size) - begin, len(lines))
+            return lines, False
+        finally:
+            mm.close()
+    finally:
+        fin.close()
@@ -0,0 +1,352 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Matching of the Eucalyptus logs against a catalog of error signatures.
+
+A signature is a name and a regular expression. The catalog is compiled
+into a single alternation with one named group per signature, so each
+log line goes through the regular expression engine once whatever the
+number of signatures, and the name of the group that matched tells the
+signature. Every alternative is anchored at the start of the line
+(".*?" then the pattern), so the signatures are tried in catalog order
+rather than by where they match in the line: a line counts for the first
+one it matches, and the specific signatures come before the catch-all
+ones.
+
+Python's regular expressions lose their fast literal scan in an
+alternation, so the lines are first checked for the literals that any
+match of the catalog has to contain (found by parsing the patterns), and
+only the few lines that have one go through the combined expression.
+
+scan_file() streams a log and counts the matches per signature and per
+minute of the line's timestamp. Lines without a timestamp of their own
+(Java stack traces, continuation lines) take the one of the last line
+that had one. Only the counts and a few sample lines are kept, so the
+memory used doesn't depend on the size of the logs. The same pass builds
+the sparse timestamp index of the log used by logindex.
+
+The catalog is module level, set with set_catalog() before the reports
+are parsed, so the worker processes of parallel.parse_reports() inherit
+it.
+
+@version   :  1.0
+"""
+import re
+import time
+import hashlib
+import calendar
+import sre_parse
+import sre_constants
+
+from sx.plugins.lib.eucalyptus import clock
+from sx.plugins.lib.eucalyptus import perf
+
+# (name, pattern) of the default signatures, the catch-all ones last.
+# The patterns are case sensitive.
+DEFAULT_SIGNATURES = [
+    ("out-of-memory", r"java\.lang\.OutOfMemoryError|Cannot allocate memory|[Oo]ut of memory"),
+    ("disk-full", r"No space left on device|[Dd]isk quota exceeded"),
+    ("database", r"PSQLException|JDBCConnectionException|too many (?:clients|connections)|[Dd]eadlock detected"),
+    ("connection-refused", r"Connection refused|ConnectException|No route to host|Connection reset"),
+    ("timeout", r"SocketTimeoutException|ReadTimeoutException|[Tt]imed out|[Tt]imeout (?:waiting|while|after)"),
+    ("credentials", r"InvalidAccessKeyId|SignatureDoesNotMatch|AuthFailure|certificate (?:verify failed|has expired)"),
+    ("permission-denied", r"Permission denied|AccessDeniedException|Operation not permitted"),
+    ("instance", r"[Ff]ailed to (?:start|run|launch|reboot|terminate|migrate) (?:the )?instance|doRunInstance.*failed"),
+    ("volume", r"[Ff]ailed to (?:attach|detach|create|delete|export|unexport) (?:the )?(?:volume|snapshot)|iscsiadm.*fail"),
+    ("image", r"[Ff]ailed to (?:download|decrypt|verify|convert|bundle) (?:the )?(?:image|manifest|bundle)"),
+    ("network", r"[Ff]ailed to (?:configure|set up|setup|apply|create) (?:the )?(?:network|iptables|ebtables|ipset|bridge|tunnel)"),
+    ("libvirt", r"libvirt(?:d)?.*error|virDomain\w+ failed|libvirtError"),
+    ("service-state", r"\b(?:NOTREADY|BROKEN)\b"),
+    ("java-exception", r"\b(?:[a-z][a-z0-9_]*\.)+[A-Z]\w*(?:Exception|Error)\b"),
+    ("error", r"\bERROR\b|\bFATAL\b|\[EUCAERROR *\]|\[EUCAFATAL *\]"),
+]
+# Sample lines kept per signature and report, and their maximum length.
+MAX_SAMPLES = 3
+MAX_SAMPLE_LENGTH = 400
+# Bytes of log between two entries of a log's timestamp index.
+INDEX_STEP = 64 * 1024
+# Minutes per heatmap column, the smallest one that fits is used.
+BUCKET_STEPS = (1, 5, 10, 15, 30, 60, 120, 180, 360, 720, 1440)
+# Python 2 regular expressions can't have more groups.
+_MAX_GROUPS = 99
+# Shorter literals would let most lines through the prefilter.
+_MIN_LITERAL_LENGTH = 3
+
+_iso_time_re = re.compile(r"(\d{4}-\d\d-\d\d)[ T](\d\d:\d\d:\d\d)")
+# [Mon May 12 20:41:27 2015] of the C components (cc.log, nc.log)
+_c_time_re = re.compile(r"\[\w{3} (\w{3}) +(\d{1,2}) (\d\d:\d\d:\d\d) (\d{4})\]")
+
+_catalog = list(DEFAULT_SIGNATURES)
+_matchers = None
+
+
+def get_timestamp(line):
+    """
+    Returns the timestamp a log line starts with as "YYYY-MM-DD HH:MM:SS"
+    in the host's local time, which sorts like the time, or None.
+    """
+    first = line[:1]
+    if first.isdigit():
+        m = _iso_time_re.match(line)
+        if m is not None:
+            return "%s %s" % m.groups()
+    elif first == "[":
+        m = _c_time_re.match(line)
+        if m is not None and m.group(1) in clock.MONTHS:
+            return "%s-%02d-%02d %s" % (m.group(4), clock.MONTHS[m.group(1)], int(m.group(2)), m.group(3))
+    return None
+
+
+def minute_epoch(minute):
+    """
+    Returns the seconds since the epoch of a "YYYY-MM-DD HH:MM" minute,
+    taken as UTC.
+    """
+    return calendar.timegm(time.strptime(minute, "%Y-%m-%d %H:%M"))
+
+
+def get_buckets(first, last, max_columns):
+    """
+    Returns (start, step, columns) of the heatmap columns covering the
+    minutes first to last: the epoch of the first column, aligned on
+    the step, and the seconds per column.
+    """
+    begin = minute_epoch(first)
+    end = minute_epoch(last)
+    for minutes in BUCKET_STEPS:
+        step = minutes * 60
+        start = begin - begin % step
+        columns = (end - start) // step + 1
+        if columns <= max_columns:
+            return start, step, columns
+    # Whole days, as many per column as needed.
+    step = -(-((end - begin) // 86400 + 2) // max_columns) * 86400
+    start = begin - begin % step
+    return start, step, (end - start) // step + 1
+
+
+def load_signatures(path):
+    """
+    Returns the (name, pattern) signatures of a file with one "name
+    pattern" per line, the comment (#) and blank lines ignored, and the
+    errors of the lines that can't be used.
+    """
+    signatures = []
+    errors = []
+    fin = open(path, "r")
+    try:
+        for n, line in enumerate(fin):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split(None, 1)
+            if len(fields) != 2:
+                errors.append("line %d: expected a name and a pattern" % (n + 1))
+                continue
+            try:
+                re.compile(fields[1])
+            except re.error, e:
+                errors.append("line %d: %s" % (n + 1, e))
+                continue
+            signatures.append((fields[0], fields[1]))
+    finally:
+        fin.close()
+    return signatures, errors
+
+
+def merge_signatures(signatures, defaults=DEFAULT_SIGNATURES):
+    """
+    Returns the catalog of extra signatures followed by the default ones
+    they don't replace (by name).
+    """
+    names = set([name for name, pattern in signatures])
+    return list(signatures) + [(name, pattern) for name, pattern in defaults if name not in names]
+
+
+def set_catalog(signatures):
+    global _catalog, _matchers
+    _catalog = list(signatures)
+    _matchers = None
+
+
+def get_catalog():
+    return list(_catalog)
+
+
+def get_catalog_key():
+    """
+    Returns a digest of the catalog, the cache key of the parsed logs.
+    """
+    return hashlib.sha1(repr(_catalog)).hexdigest()
+
+
+def _get_literals(items):
+    """
+    Returns literals one of which is in every match of the parsed
+    sequence, the longest ones found, or None.
+    """
+    candidates = []
+    run = []
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            candidates.append(["".join(run)])
+            run = []
+        if op == sre_constants.SUBPATTERN:
+            candidates.append(_get_literals(av[-1]))
+        elif op == sre_constants.BRANCH:
+            branches = [_get_literals(b) for b in av[1]]
+            if None not in branches:
+                candidates.append(sum(branches, []))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            candidates.append(_get_literals(av[2]))
+    if run:
+        candidates.append(["".join(run)])
+    candidates = [c for c in candidates if c]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: min([len(l) for l in c]))
+
+
+def get_literals(pattern):
+    """
+    Returns a list of literals one of which is in every line the pattern
+    matches, or None when the pattern doesn't have long enough ones.
+    """
+    parsed = sre_parse.parse(pattern)
+    if parsed.pattern.flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_LOCALE |
+                               sre_constants.SRE_FLAG_UNICODE):
+        return None
+    literals = _get_literals(parsed)
+    if literals is None or min([len(l) for l in literals]) < _MIN_LITERAL_LENGTH:
+        return None
+    return literals
+
+
+def compile_catalog(signatures):
+    """
+    Returns the combined regular expressions of the signatures, a dict
+    of their group names to the signature names and the literals of the
+    prefilter (None when a signature has none, every line is matched
+    then). All the signatures are in the first expression unless they
+    have too many groups for a single one.
+    """
+    literals = set()
+    matchers = []
+    names = {}
+    alternatives = []
+    groups = 0
+    for n, (name, pattern) in enumerate(signatures):
+        count = re.compile(pattern).groups + 1
+        if alternatives and groups + count > _MAX_GROUPS:
+            matchers.append(re.compile("|".join(alternatives)))
+            alternatives = []
+            groups = 0
+        if literals is not None:
+            found = get_literals(pattern)
+            literals = literals.union(found) if found is not None else None
+        group = "s%d" % n
+        names[group] = name
+        alternatives.append(".*?(?P<%s>%s)" % (group, pattern))
+        groups += count
+    if alternatives:
+        matchers.append(re.compile("|".join(alternatives)))
+    if literals is not None:
+        # Drop the literals containing a shorter one, they can't add a line.
+        literals = sorted(literals, key=len)
+        literals = [l for n, l in enumerate(literals) if not [s for s in literals[:n] if s in l]]
+    return matchers, names, literals
+
+
+def _get_matchers():
+    global _matchers
+    if _matchers is None:
+        _matchers = compile_catalog(_catalog)
+    return _matchers
+
+
+def scan_file(path, counts, samples, sample_path, index=None):
+    """
+    Counts the lines of a log matching the catalog, and indexes it.
+
+    @param path: The log file.
+    @type path: String
+    @param counts: The dict of (signature, minute) to number of lines
+    the counts are added to. The minute is "YYYY-MM-DD HH:MM", or "" for
+    the lines before the first timestamp.
+    @type counts: Dict
+    @param samples: The dict of signature to (path, line) samples the
+    first matches are added to.
+    @type samples: Dict
+    @param sample_path: The path of the log in the samples.
+    @type sample_path: String
+    @param index: The list the (timestamp, offset) of a line every
+    INDEX_STEP bytes are appended to, in time order.
+    @type index: Array
+    @return: The number of matching lines.
+    @rtype: Int
+    """
+    matchers, names, literals = _get_matchers()
+    matches = 0
+    nbytes = 0
+    lines = 0
+    stamped = ""
+    stamp_line = None
+    minute = ""
+    next_entry = 0 if index is not None else float("inf")
+    fin = open(path, "r")
+    try:
+        for line in fin:
+            first = line[:1]
+            if first == "[" or first.isdigit():
+                stamped = line
+                if nbytes >= next_entry:
+                    timestamp = get_timestamp(line)
+                    # Out of order lines are left out, the index stays sorted.
+                    if timestamp is not None and (not index or timestamp >= index[-1][0]):
+                        index.append((timestamp, nbytes))
+                        next_entry = nbytes + INDEX_STEP
+            nbytes += len(line)
+            lines += 1
+            if literals is not None:
+                for literal in literals:
+                    if literal in line:
+                        break
+                else:
+                    continue
+            for matcher in matchers:
+                m = matcher.match(line)
+                if m is not None:
+                    break
+            else:
+                continue
+            # The timestamp is only parsed for the lines that match.
+            if stamped is not stamp_line:
+                stamp_line = stamped
+                timestamp = get_timestamp(stamped)
+                if timestamp is not None:
+                    minute = timestamp[:16]
+            name = names[m.lastgroup]
+            key = (name, minute)
+            counts[key] = counts.get(key, 0) + 1
+            matches += 1
+            kept = samples.setdefault(name, [])
+            if len(kept) < MAX_SAMPLES:
+                kept.append((sample_path, line.rstrip("\r\n")[:MAX_SAMPLE_LENGTH]))
+    finally:
+        fin.close()
+        perf.count_read(path, nbytes, lines)
+    return matches
@@ -0,0 +1,91 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Content hash manifests of the files that make up the Hugo site.
+
+A manifest maps the path of each file, relative to a root directory, to
+the sha1 of its content. Comparing the manifest of the previous build
+with the current files tells which files were added, changed or
+removed, independently of their mtimes (the plugins rewrite every page
+on each run).
+
+@version   :  1.0
+"""
+import os
+import json
+import hashlib
+import logging
+
+import sx
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    fin = open(path, "rb")
+    try:
+        for block in iter(lambda: fin.read(1024 * 1024), ""):
+            digest.update(block)
+    finally:
+        fin.close()
+    return digest.hexdigest()
+
+
+def hash_tree(root):
+    """
+    Returns a dict of the path relative to root of every file below root
+    to the sha1 of its content. A missing root gives an empty dict.
+    """
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fname in filenames:
+            path = os.path.join(dirpath, fname)
+            hashes[os.path.relpath(path, root)] = file_sha1(path)
+    return hashes
+
+
+def diff(old, new):
+    """
+    Returns the sorted (added, changed, removed) paths between two
+    hash dicts.
+    """
+    added = sorted([p for p in new if p not in old])
+    changed = sorted([p for p in new if p in old and old[p] != new[p]])
+    removed = sorted([p for p in old if p not in new])
+    return added, changed, removed
+
+
+def load(path):
+    """
+    Returns the manifest stored at path, or an empty one.
+    """
+    try:
+        fin = open(path, "r")
+        try:
+            return json.load(fin)
+        finally:
+            fin.close()
+    except (IOError, ValueError):
+        return {}
+
+
+def save(path, manifest):
+    try:
+        fout = open(path, "w")
+        try:
+            json.dump(manifest, fout, indent=1, sort_keys=True)
+        finally:
+            fout.close()
+    except IOError, e:
+        logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to write the manifest %s: %s" % (path, e))
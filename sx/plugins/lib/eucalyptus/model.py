@@ -0,0 +1,342 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+The cloud parsed from the reports of a run, shared by every plugin.
+
+get_model() returns the CloudModel of the reports a plugin is given.
+Each part of the model (topology, configuration, volumes, instances,
+clocks and log signatures) is parsed by the first plugin that asks for it, through
+parallel.parse_reports() with that plugin's options, and every other
+plugin gets the same objects. The parsed results of each report are
+folded into the part as they come, so reports added later with
+addReports() are parsed on their own. Indexes derived from a part (the
+address pools, the clock skews) are built on first use and dropped when
+reports are added.
+
+The plugins only read the model, they never modify what it returns.
+
+@version   :  1.0
+"""
+import os
+import logging
+
+import sx
+from sx.plugins.lib.eucalyptus import clock
+from sx.plugins.lib.eucalyptus import logscan
+from sx.plugins.lib.eucalyptus import netconfig
+from sx.plugins.lib.eucalyptus import parallel
+from sx.plugins.lib.eucalyptus import reportdata
+from sx.plugins.lib.eucalyptus.confgroups import ConfigGroups
+from sx.plugins.lib.eucalyptus.hosts import HostIndex
+from sx.plugins.lib.eucalyptus.services import Service, ServiceStore
+from sx.plugins.lib.eucalyptus.volumes import VolumeStore
+
+NETWORK_CONFIGURATION_PROPERTY = "cloud.network.network_configuration"
+
+
+class _Part(object):
+    """
+    The data a parser contributes to the model, with the reports already
+    folded into it.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.paths = set()
+
+
+class CloudModel(object):
+    def __init__(self, infos=()):
+        self.__infos = []
+        self.__paths = set()
+        self.__parts = {}
+        self.__derived = {}
+        self.__plugin = None
+        self.addReports(infos)
+
+    def addReports(self, infos):
+        """
+        Adds reports to the model and returns the ones that were not
+        already in it. The parts already parsed parse the new reports the
+        next time they are asked for.
+
+        @param infos: The parallel.ReportInfo of the reports.
+        @type infos: Array
+        """
+        added = [info for info in infos if info.path not in self.__paths]
+        for info in added:
+            self.__infos.append(info)
+            self.__paths.add(info.path)
+        if added:
+            self.__derived = {}
+        return added
+
+    def setPlugin(self, plugin):
+        """
+        Sets the plugin whose options and statistics are used by the
+        parsing done from now on.
+        """
+        self.__plugin = plugin
+
+    def getReportInfos(self):
+        return list(self.__infos)
+
+    def getReportPaths(self):
+        return set(self.__paths)
+
+    def __fold(self, func, create, add):
+        """
+        Returns the data of the part built by a parser, parsing the reports
+        not folded into it yet.
+
+        @param func: The reportdata parser.
+        @param create: Returns the empty data of the part.
+        @param add: Folds the result of a report into the data, called
+        with (data, info, result) in the order of the reports.
+        """
+        part = self.__parts.get(func.__name__)
+        if part is None:
+            part = self.__parts[func.__name__] = _Part(create())
+        missing = [info for info in self.__infos if info.path not in part.paths]
+        if missing:
+            for info, result in zip(missing, parallel.parse_reports(self.__plugin, func, missing)):
+                add(part.data, info, result)
+                part.paths.add(info.path)
+        return part.data
+
+    def __derive(self, name, build):
+        """
+        Returns an index derived from the parts, built on first use.
+        """
+        if name not in self.__derived:
+            self.__derived[name] = build()
+        return self.__derived[name]
+
+    # Topology
+    def __getTopology(self):
+        return self.__fold(reportdata.parse_topology, lambda: (HostIndex(), ServiceStore()), self.__addTopology)
+
+    @staticmethod
+    def __addTopology(data, info, result):
+        host_index, services = data
+        hosts, ifconfig_ips, records = result
+        host_index.add_report(info.hostname, hosts, ifconfig_ips)
+        for record in records:
+            s = Service.from_record(record)
+            services.add(s)
+            host_index.add_service_url(s.url, s.stype)
+
+    def getHostIndex(self):
+        """
+        Returns the HostIndex of the hosts files, the interfaces of the
+        reports' hosts and the service endpoints.
+        """
+        return self.__getTopology()[0]
+
+    def getServices(self):
+        """
+        Returns the ServiceStore of euca-describe-services-all.
+        """
+        return self.__getTopology()[1]
+
+    # Configuration
+    def __getConfig(self):
+        return self.__fold(reportdata.parse_config, lambda: ({}, ConfigGroups()), self.__addConfig)
+
+    @staticmethod
+    def __addConfig(data, info, result):
+        euca_properties, conf_groups = data
+        properties, conf, canonical, digest = result
+        # A property value can span multiple lines (like the network
+        # configuration), the parser joins the continuation lines.
+        for prop in properties:
+            euca_properties.setdefault(prop.key, []).extend(prop.lines)
+        if conf is not None:
+            # Hosts with identical configurations share a single group.
+            conf_groups.add(info.hostname, conf, digest, canonical)
+
+    def getProperties(self):
+        """
+        Returns a dict of cloud property name to its list of value lines.
+        """
+        return self.__getConfig()[0]
+
+    def getConfGroups(self):
+        """
+        Returns the ConfigGroups of the hosts' eucalyptus.conf.
+        """
+        return self.__getConfig()[1]
+
+    def getAddressPools(self):
+        """
+        Returns the netconfig.IntervalIndex of the network configuration
+        property, or None if it is not set or can't be parsed.
+        """
+        return self.__derive("address_pools", self.__buildAddressPools)
+
+    def __buildAddressPools(self):
+        properties = self.getProperties()
+        if NETWORK_CONFIGURATION_PROPERTY not in properties:
+            return None
+        try:
+            return netconfig.IntervalIndex.from_config(netconfig.load(properties[NETWORK_CONFIGURATION_PROPERTY]))
+        except (ValueError, AttributeError), e:
+            message = "Unable to parse the %s property: %s" % (NETWORK_CONFIGURATION_PROPERTY, e)
+            logging.getLogger(sx.MAIN_LOGGER_NAME).warning(message)
+            return None
+
+    # Volumes and instances
+    def getVolumes(self):
+        """
+        Returns the VolumeStore of euca-describe-vols-v.
+        """
+        return self.__fold(reportdata.parse_volumes, VolumeStore, lambda store, info, volumes: store.extend(volumes))
+
+    def __getInstances(self):
+        return self.__fold(reportdata.parse_instances, lambda: ({}, {}, {}), self.__addInstances)
+
+    @staticmethod
+    def __addInstances(data, info, result):
+        instances, instance_nodes, nodes = data
+        records, node_instances, node_services = result
+        for instance in records:
+            instances.setdefault(instance.instance_id, instance)
+        for node, instance_ids in node_instances:
+            for instance_id in instance_ids:
+                instance_nodes.setdefault(instance_id, node)
+        for node in node_services:
+            if node.hostname not in nodes:
+                nodes[node.hostname] = Service.from_record(node)
+
+    def getInstances(self):
+        """
+        Returns a dict of instance id to its parsers.InstanceRecord.
+        """
+        return self.__getInstances()[0]
+
+    def getInstanceNodes(self):
+        """
+        Returns a dict of instance id to the address of its node.
+        """
+        return self.__getInstances()[1]
+
+    def getNodes(self):
+        """
+        Returns a dict of node address to its node Service.
+        """
+        return self.__getInstances()[2]
+
+    # Clocks
+    def __getDates(self):
+        return self.__fold(reportdata.parse_date, lambda: ({}, {}, {}, {}), self.__addDate)
+
+    @staticmethod
+    def __addDate(data, info, date_str):
+        date_strings, dates_by_tz, epochs, report_epochs = data
+        if date_str is None:
+            return
+        # key: tz, value, set of hostname,datestring tuples
+        dates_by_tz.setdefault(date_str.split()[-2], set()).add((info.hostname, date_str))
+        date_strings[info.hostname] = date_str
+        epochs[info.hostname] = clock.parse_date_output(date_str)
+        epoch, has_time = clock.parse_report_date(info.date)
+        if has_time:
+            report_epochs[info.hostname] = epoch
+
+    def getDateStrings(self):
+        """
+        Returns a dict of hostname to the output of date in its report.
+        """
+        return self.__getDates()[0]
+
+    def getDatesByTimezone(self):
+        """
+        Returns a dict of timezone to a set of (hostname, date) tuples.
+        """
+        return self.__getDates()[1]
+
+    def getEpochs(self):
+        """
+        Returns a dict of hostname to the UTC epoch of its date output,
+        None when the timezone is unknown.
+        """
+        return self.__getDates()[2]
+
+    def getReportEpochs(self):
+        """
+        Returns a dict of hostname to the epoch of the report's own date,
+        for the reports whose date has a time of day.
+        """
+        return self.__getDates()[3]
+
+    def getSkews(self):
+        """
+        Returns (median, skews) of the hosts' clocks, see clock.get_skews().
+        """
+        return self.__derive("skews", lambda: clock.get_skews(self.getEpochs()))
+
+    # Logs
+    def getLogMatches(self):
+        """
+        Returns a dict of hostname to the (counts, samples, files, logs)
+        of its logs, see reportdata.parse_logs(), the logs being a list
+        of (relative path, path, timestamp index).
+        """
+        return self.__fold(reportdata.parse_logs, dict, self.__addLogs)
+
+    @staticmethod
+    def __addLogs(data, info, result):
+        if info.hostname not in data:
+            data[info.hostname] = ({}, {}, [], [])
+        counts, samples, files, logs = data[info.hostname]
+        for key, count in result[0].items():
+            counts[key] = counts.get(key, 0) + count
+        for name, lines in result[1].items():
+            kept = samples.setdefault(name, [])
+            kept.extend(lines[:logscan.MAX_SAMPLES - len(kept)])
+        files.extend(result[2])
+        for relpath in sorted(result[3]):
+            logs.append((relpath, os.path.join(info.path, relpath), result[3][relpath]))
+
+
+_model = None
+
+
+def get_model(plugin, reports):
+    """
+    Returns the CloudModel of the reports valid for a plugin. The model of
+    the previous call is reused when it covers the same reports, and
+    extended when the reports are a superset of its own.
+
+    @param plugin: The plugin asking, whose options are used by the
+    parsing it triggers.
+    @type plugin: PluginBase
+    @param reports: The reports given to the plugin's setup().
+    @type reports: Array
+    """
+    global _model
+    infos = [parallel.get_report_info(report) for report in reports if plugin.isValidReportType(report)]
+    paths = set([info.path for info in infos])
+    if _model is None or not _model.getReportPaths() <= paths:
+        _model = CloudModel()
+    _model.addReports(infos)
+    _model.setPlugin(plugin)
+    return _model
+
+
+def reset():
+    """
+    Drops the model, the next get_model() parses the reports again.
+    """
+    global _model
+    _model = None
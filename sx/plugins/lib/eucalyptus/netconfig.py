@@ -0,0 +1,205 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+The IP address pools of the cloud.network.network_configuration
+property.
+
+The PublicIps and PrivateIps entries (single addresses, a.b.c.d-e.f.g.h
+ranges or CIDR blocks) are kept as integer intervals and are never
+expanded into addresses, so a /16 pool costs the same as a single
+address. Overlaps are found with a sweep over the intervals sorted by
+start, and collisions with host addresses with a merge of the sorted
+addresses against the same intervals.
+
+@version   :  1.0
+"""
+import json
+import socket
+import struct
+
+
+class IpRange(object):
+    __slots__ = ("start", "end", "pool", "text")
+
+    def __init__(self, start, end, pool, text):
+        self.start = start
+        self.end = end
+        self.pool = pool
+        self.text = text
+
+    def getSize(self):
+        return self.end - self.start + 1
+
+
+def ip_to_int(ip):
+    """
+    Returns the integer value of a dotted IPv4 address, raises ValueError
+    if it is not one.
+    """
+    try:
+        return struct.unpack("!I", socket.inet_aton(ip.strip()))[0]
+    except (socket.error, struct.error):
+        raise ValueError("Invalid IPv4 address: %s" % ip)
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack("!I", value))
+
+
+def parse_range(text):
+    """
+    Returns the (start, end) integers of a single address, an address
+    range or a CIDR block. Raises ValueError if text is none of them.
+    """
+    text = text.strip()
+    if "/" in text:
+        address, bits = text.split("/", 1)
+        bits = int(bits)
+        if bits < 0 or bits > 32:
+            raise ValueError("Invalid prefix length: %s" % text)
+        mask = (0xffffffff << (32 - bits)) & 0xffffffff
+        start = ip_to_int(address) & mask
+        return start, start | (~mask & 0xffffffff)
+    if "-" in text:
+        first, last = text.split("-", 1)
+        start, end = ip_to_int(first), ip_to_int(last)
+        if end < start:
+            raise ValueError("Invalid address range: %s" % text)
+        return start, end
+    value = ip_to_int(text)
+    return value, value
+
+
+def load(lines):
+    """
+    Returns the network configuration parsed from the lines of the
+    property value. Raises ValueError if it is not valid JSON.
+    """
+    return json.loads("\n".join(lines))
+
+
+def iter_pools(config):
+    """
+    Yields a (pool, entry) tuple for every PublicIps and PrivateIps entry
+    of a network configuration, the pool naming where the entry is
+    declared.
+    """
+    for entry in config.get("PublicIps", []) or []:
+        yield "PublicIps", entry
+    for entry in config.get("PrivateIps", []) or []:
+        yield "PrivateIps", entry
+    for cluster in config.get("Clusters", []) or []:
+        for entry in cluster.get("PrivateIps", []) or []:
+            yield "Cluster %s PrivateIps" % cluster.get("Name", "?"), entry
+
+
+class IntervalIndex(object):
+    """
+    The address ranges of the network configuration pools, sorted by
+    start address.
+    """
+    def __init__(self):
+        self.__ranges = []
+        self.__sorted = True
+        self.__errors = []
+
+    def add(self, pool, text):
+        """
+        Adds an entry of a pool. Entries that can't be parsed are
+        remembered as errors.
+        """
+        try:
+            if not isinstance(text, basestring):
+                raise ValueError("Not an address or range: %r" % (text,))
+            start, end = parse_range(text)
+        except ValueError, e:
+            self.__errors.append((pool, text, str(e)))
+            return
+        self.__ranges.append(IpRange(start, end, pool, text))
+        self.__sorted = False
+
+    @classmethod
+    def from_config(cls, config):
+        index = cls()
+        for pool, entry in iter_pools(config):
+            index.add(pool, entry)
+        return index
+
+    def __sort(self):
+        if not self.__sorted:
+            self.__ranges.sort(key=lambda r: (r.start, r.end))
+            self.__sorted = True
+
+    def __len__(self):
+        return len(self.__ranges)
+
+    def getRanges(self):
+        self.__sort()
+        return self.__ranges
+
+    def getErrors(self):
+        return self.__errors
+
+    def getPoolSizes(self):
+        """
+        Returns a dict of pool to the number of addresses declared in it,
+        counting overlapping entries once per entry.
+        """
+        sizes = {}
+        for r in self.__ranges:
+            sizes[r.pool] = sizes.get(r.pool, 0) + r.getSize()
+        return sizes
+
+    def getOverlaps(self):
+        """
+        Returns a list of (range, range, first, last) tuples for each pair
+        of overlapping ranges, with the first and last overlapping
+        addresses as integers.
+        """
+        self.__sort()
+        overlaps = []
+        active = []
+        for r in self.__ranges:
+            active = [a for a in active if a.end >= r.start]
+            for a in active:
+                overlaps.append((a, r, r.start, min(a.end, r.end)))
+            active.append(r)
+        return overlaps
+
+    def getCollisions(self, addresses):
+        """
+        Returns a sorted list of (address, range) tuples for each of the
+        addresses that falls in a range. Addresses that aren't IPv4 are
+        ignored.
+        """
+        self.__sort()
+        values = []
+        for address in addresses:
+            try:
+                values.append((ip_to_int(address), address))
+            except ValueError:
+                continue
+        values.sort()
+        # Merge the sorted addresses with the ranges sorted by start.
+        collisions = []
+        active = []
+        i = 0
+        for value, address in values:
+            while i < len(self.__ranges) and self.__ranges[i].start <= value:
+                active.append(self.__ranges[i])
+                i += 1
+            active = [r for r in active if r.end >= value]
+            for r in active:
+                collisions.append((address, r))
+        return collisions
@@ -0,0 +1,294 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Buffered writing of the Hugo content pages generated by the plugins.
+
+A Page collects the lines of a page in memory and hands them to the
+plugin's write() in large chunks instead of one call per line. Tables
+are described once with a TableTemplate, whose header and row markup is
+compiled into format strings, so writing a row is a single string
+format. Cell values are HTML escaped unless they are wrapped in Raw.
+
+Large tables can instead be written as a JSON data file in the site's
+static/data directory with a small placeholder on the page, which the
+eucasx theme (static/js/ui.js) turns into a sortable, filterable table
+that only creates the rows in view. See large_table().
+
+@version   :  1.0
+"""
+import os
+import re
+import cgi
+import json
+import hashlib
+
+from sx.plugins.lib.eucalyptus import perf
+
+# Flush a page to disk once this many bytes have been buffered.
+MAX_BUFFER_SIZE = 4 * 1024 * 1024
+
+TABLE_CLASS = "pure-table pure-table-bordered"
+ODD_ROW_CLASS = "pure-table-odd"
+
+# The option of the plugins that can write their tables as data files.
+DATA_TABLES_OPTION = "datatables"
+DATA_TABLES_OPTION_DESCRIPTION = ("Write the large tables as JSON data rendered by the browser: "
+                                  "'auto' above 1000 rows, 'on' always or 'off'. [off]")
+DATA_TABLES_MIN_ROWS = 1000
+# The directory of the data files, below the site's static directory.
+DATA_DIR = "data"
+
+_toml_control_re = re.compile(r"[\x00-\x1f\x7f]")
+_TOML_ESCAPES = {"\b": "\\b", "\t": "\\t", "\n": "\\n", "\f": "\\f", "\r": "\\r"}
+
+
+class Raw(str):
+    """
+    A string of markup that is written to a page without escaping.
+    """
+    pass
+
+
+def escape(value):
+    """
+    Returns value converted to a string and HTML escaped, unless it is
+    Raw.
+    """
+    if isinstance(value, Raw):
+        return value
+    if not isinstance(value, basestring):
+        value = str(value)
+    return cgi.escape(value)
+
+
+def toml_string(value):
+    """
+    Returns value as a quoted TOML basic string, for the front matter.
+    """
+    if not isinstance(value, basestring):
+        value = str(value)
+    value = value.replace("\\", "\\\\").replace('"', '\\"')
+    return '"%s"' % _toml_control_re.sub(lambda m: _TOML_ESCAPES.get(m.group(0), "\\u%04x" % ord(m.group(0))), value)
+
+
+def use_data_table(plugin, row_count):
+    """
+    Returns True if a table of row_count rows is written as a data file
+    with the plugin's "datatables" option.
+    """
+    value = plugin.getOptionValue(DATA_TABLES_OPTION)
+    return value == "on" or (value == "auto" and row_count > DATA_TABLES_MIN_ROWS)
+
+
+def _data_cell(value):
+    """
+    Returns the JSON value of a cell: numbers and text as they are, Raw
+    markup as {"h": markup}.
+    """
+    if isinstance(value, Raw):
+        return {"h": str(value)}
+    if isinstance(value, (int, long, float)) and not isinstance(value, bool):
+        return value
+    if not isinstance(value, basestring):
+        value = str(value)
+    return value
+
+
+def get_data_text(template, rows):
+    """
+    Returns (JSON text, row count) of the data file of a table, in the
+    format ui.js renders.
+    """
+    data = [[_data_cell(v) for v in values] for values in rows]
+    return json.dumps({"columns": template.headers, "rows": data}, separators=(",", ":")), len(data)
+
+
+def cell(value, style=None, css_class=None, title=None):
+    """
+    Returns the Raw markup of a single td element.
+    """
+    attrs = ""
+    if css_class:
+        attrs += ' class="%s"' % cgi.escape(css_class, True)
+    if style:
+        attrs += ' style="%s"' % cgi.escape(style, True)
+    if title:
+        attrs += ' title="%s"' % cgi.escape(title, True)
+    return Raw("<td%s>%s</td>" % (attrs, escape(value)))
+
+
+class TableTemplate(object):
+    """
+    A pure-css table whose markup is compiled once and reused for every
+    row.
+    """
+    def __init__(self, headers, cells, striped=True, style=None):
+        """
+        @param headers: The column headers.
+        @type headers: Array
+        @param cells: The format string of the td elements of a row, with
+        one %s per value, for example "<td>%s</td><td>%s</td>".
+        @type cells: String
+        @param striped: Whether odd rows get the pure-table-odd class.
+        @type striped: Boolean
+        @param style: An optional style attribute of the table.
+        @type style: String
+        """
+        self.headers = list(headers)
+        style_attr = ' style="%s"' % style if style else ""
+        self.header = "\n".join(['<table class="%s"%s>' % (TABLE_CLASS, style_attr),
+                                 "<thead>",
+                                 "".join(["<th>%s</th>" % cgi.escape(h) for h in headers]),
+                                 "</thead>",
+                                 "<tbody>"])
+        self.footer = "</tbody>\n</table>"
+        self.even_row = "<tr>\n%s\n</tr>" % cells
+        if striped:
+            self.odd_row = '<tr class="%s">\n%s\n</tr>' % (ODD_ROW_CLASS, cells)
+        else:
+            self.odd_row = self.even_row
+
+    def format_row(self, index, values):
+        """
+        Returns the markup of the row at index with the values escaped.
+        """
+        template = self.odd_row if index % 2 != 0 else self.even_row
+        return template % tuple([escape(v) for v in values])
+
+
+class Page(object):
+    """
+    A content page written through a plugin's write() function.
+    """
+    def __init__(self, plugin, filename, max_buffer_size=MAX_BUFFER_SIZE):
+        """
+        @param plugin: The plugin that owns the page.
+        @type plugin: PluginBase
+        @param filename: The name of the page in the plugin's report
+        directory.
+        @type filename: String
+        """
+        self.__plugin = plugin
+        self.__filename = filename
+        self.__max_buffer_size = max_buffer_size
+        self.__lines = []
+        self.__size = 0
+
+    def getFilename(self):
+        return self.__filename
+
+    def write(self, data=""):
+        """
+        Adds a line (or several lines joined by newlines) to the page.
+        """
+        self.__lines.append(data)
+        self.__size += len(data) + 1
+        if self.__size >= self.__max_buffer_size:
+            self.flush()
+
+    def front_matter(self, *fields):
+        """
+        Writes the Hugo front matter followed by an empty line.
+
+        @param fields: The TOML lines, for example 'title="Topology"'.
+        @type fields: Array
+        """
+        self.write("\n".join(("+++",) + fields + ("+++", "")))
+
+    def table(self, template, rows, start=0):
+        """
+        Writes a complete table.
+
+        @param template: The table layout.
+        @type template: TableTemplate
+        @param rows: An iterable of the value tuples of each row.
+        @type rows: Iterable
+        @param start: The index of the first row, used for striping.
+        @type start: Int
+        """
+        self.write(template.header)
+        count = 0
+        for index, values in enumerate(rows, start):
+            self.write(template.format_row(index, values))
+            count += 1
+        self.write(template.footer)
+        perf.get_stats(self.__plugin.getName()).add_count("rows", count)
+
+    def data_table(self, template, rows, name):
+        """
+        Writes the rows as the data file static/data/<plugin>/<name>.json of
+        the site and the placeholder ui.js renders it in.
+
+        @param template: The table layout, only its headers are used.
+        @type template: TableTemplate
+        @param rows: An iterable of the value tuples of each row.
+        @type rows: Iterable
+        @param name: The name of the data file, unique for the plugin.
+        @type name: String
+        """
+        report_dir = self.__plugin.getPathToPluginReportDir()
+        plugin_dir = os.path.basename(report_dir.rstrip(os.sep))
+        data_dir = os.path.join(os.path.dirname(report_dir.rstrip(os.sep)), "static", DATA_DIR, plugin_dir)
+        text, count = get_data_text(template, rows)
+        if not os.path.isdir(data_dir):
+            os.makedirs(data_dir)
+        fout = open(os.path.join(data_dir, name + ".json"), "w")
+        try:
+            fout.write(text)
+        finally:
+            fout.close()
+        # The version changes the page when only the data does, so an
+        # incremental build still copies the new data file.
+        url = "/%s/%s/%s.json?v=%s" % (DATA_DIR, plugin_dir, name, hashlib.sha1(text).hexdigest()[:12])
+        self.data_placeholder(url, name, count)
+        perf.get_stats(self.__plugin.getName()).add_count("rows", count)
+
+    def data_placeholder(self, url, name, row_count=None):
+        """
+        Writes the placeholder ui.js renders the data file at url in, for
+        data files written outside of data_table(). The row count is left
+        out when it isn't known yet.
+        """
+        if row_count is None:
+            self.write('<div class="eucasx-table" data-src="%s">' % cgi.escape(url, True))
+            self.write('<noscript><p>This table needs JavaScript, its data is in <a href="%s">%s.json</a>.</p></noscript>'
+                       % (cgi.escape(url, True), cgi.escape(name)))
+        else:
+            self.write('<div class="eucasx-table" data-src="%s" data-rows="%d">' % (cgi.escape(url, True), row_count))
+            self.write('<noscript><p>This table of %d rows needs JavaScript, its data is in <a href="%s">%s.json</a>.</p></noscript>'
+                       % (row_count, cgi.escape(url, True), cgi.escape(name)))
+        self.write("</div>")
+
+    def large_table(self, template, rows, name, row_count):
+        """
+        Writes a table that can be large as a data file when the plugin's
+        "datatables" option asks for it, and as a table otherwise.
+        """
+        if use_data_table(self.__plugin, row_count):
+            self.data_table(template, rows, name)
+        else:
+            self.table(template, rows)
+
+    def flush(self):
+        """
+        Writes the buffered lines to the page file.
+        """
+        if self.__lines:
+            self.__plugin.write(self.__filename, "\n".join(self.__lines))
+            self.__lines = []
+            self.__size = 0
+
+    def close(self):
+        self.flush()
+        perf.get_stats(self.__plugin.getName()).add_count("pages")
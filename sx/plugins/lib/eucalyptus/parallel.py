@@ -0,0 +1,159 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Runs the per-report parsing of the plugins' setup() in a pool of worker
+processes, going through the on-disk report cache when it is enabled.
+
+The sx Report objects stay in the main process, the workers are handed
+a picklable ReportInfo and return a partial result. map_reports()
+returns the partial results in the order of the reports so that the
+plugins merge them exactly as a serial run would.
+
+@version   :  1.0
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import namedtuple
+
+import sx
+from sx.plugins.lib.eucalyptus import cache
+from sx.plugins.lib.eucalyptus import perf
+
+# The option added to every plugin that parses reports in setup().
+WORKERS_OPTION = "workers"
+WORKERS_OPTION_DESCRIPTION = "Number of worker processes used to parse the reports, 0 for one per CPU. [1]"
+
+# The options, with their defaults, of every plugin that parses reports
+# through parse_reports().
+SETUP_OPTIONS = {WORKERS_OPTION: WORKERS_OPTION_DESCRIPTION,
+                 cache.CACHE_OPTION: cache.CACHE_OPTION_DESCRIPTION,
+                 cache.CACHE_SIZE_OPTION: cache.CACHE_SIZE_OPTION_DESCRIPTION,
+                 }
+SETUP_OPTION_DEFAULTS = {WORKERS_OPTION: '1',
+                         cache.CACHE_OPTION: 'on',
+                         cache.CACHE_SIZE_OPTION: '512',
+                         }
+
+ReportInfo = namedtuple("ReportInfo", ["hostname", "date", "path"])
+
+
+def get_report_info(report):
+    """
+    Returns a picklable ReportInfo for an sx Report.
+    """
+    return ReportInfo(report.getHostname(), report.getDate(), report.getPathToExtractedReport())
+
+
+def get_worker_count(plugin):
+    """
+    Returns the number of workers requested with the plugin's "workers"
+    option. Invalid values fall back to a serial run.
+
+    @param plugin: The plugin whose option is read.
+    @type plugin: PluginBase
+    @rtype: Int
+    """
+    value = plugin.getOptionValue(WORKERS_OPTION)
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Invalid value for option %s: %s, parsing serially." % (WORKERS_OPTION, value))
+        return 1
+    if workers == 0:
+        workers = multiprocessing.cpu_count()
+    return max(workers, 1)
+
+
+def set_default_options(plugin):
+    """
+    Sets the default values of SETUP_OPTIONS on a plugin.
+    """
+    for key, value in SETUP_OPTION_DEFAULTS.items():
+        plugin.setOptionValue(key, value)
+
+
+def _parse_counted(args):
+    """
+    Returns (result, reads, seconds) of a parser run on a report, the
+    reads being the files the parser read (none on a cache hit).
+    """
+    func, info, use_cache = args
+    perf.take_reads()
+    start = time.time()
+    if use_cache:
+        result = cache.load_or_parse(func, info)
+    else:
+        result = func(info)
+    return result, perf.take_reads(), time.time() - start
+
+
+def parse_reports(plugin, func, infos):
+    """
+    Runs a per-report parser over the reports with the plugin's worker
+    and cache options, and returns the results in the order of infos.
+
+    @param plugin: The plugin whose options are used.
+    @type plugin: PluginBase
+    @param func: A module level parser decorated with cache.parser().
+    @type func: Function
+    @param infos: The reports to parse.
+    @type infos: Array
+    @rtype: Array
+    """
+    workers = get_worker_count(plugin)
+    use_cache = cache.is_enabled(plugin)
+    counted = map_reports(_parse_counted, [(func, i, use_cache) for i in infos], workers)
+    if use_cache:
+        cache.enforce_limit([i.path for i in infos], cache.get_size_limit(plugin))
+
+    stats = perf.get_stats(plugin.getName())
+    results = []
+    for info, (result, reads, seconds) in zip(infos, counted):
+        for path, (files, nbytes, lines) in reads.items():
+            stats.add_input(os.path.relpath(path, info.path), files, nbytes, lines)
+        stats.add_parser_time(func.__name__, seconds)
+        results.append(result)
+    return results
+
+
+def map_reports(func, infos, workers=1):
+    """
+    Applies func to each item and returns the results in the same order
+    as infos.
+
+    @param func: A module level function taking an item, it has to be
+    picklable to be sent to the workers.
+    @type func: Function
+    @param infos: The items to process, usually ReportInfos.
+    @type infos: Array
+    @param workers: The number of worker processes, 1 parses in the
+    calling process.
+    @type workers: Int
+    @rtype: Array
+    """
+    workers = min(workers, len(infos))
+    if workers <= 1:
+        return [func(i) for i in infos]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        # Small chunks keep the workers busy when a few reports (the CLC)
+        # are much larger than the rest.
+        results = pool.map(func, infos, 1)
+    finally:
+        pool.close()
+        pool.join()
+    return results
@@ -0,0 +1,297 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Streaming parsers for the files found in an extracted sosreport.
+
+Every parser is a generator that reads its file one line at a time and
+yields records, so the plugins never hold a whole file in memory. The
+parsers take the path to the file; use get_report_file() to resolve a
+path inside an extracted report.
+
+@version   :  1.0
+"""
+import os
+import re
+import logging
+from collections import namedtuple
+
+import sx
+from sx.plugins.lib.eucalyptus import perf
+
+# Relative paths of the files the plugins read from a sosreport.
+HOSTS_FILE = "etc/hosts"
+IFCONFIG_FILE = "ifconfig"
+DATE_FILE = "date"
+EUCA_CONF_FILE = "etc/eucalyptus/eucalyptus.conf"
+DESCRIBE_SERVICES_FILE = "sos_commands/eucafrontend/euca-describe-services-all"
+DESCRIBE_PROPERTIES_FILE = "sos_commands/eucafrontend/euca-describe-properties"
+DESCRIBE_VOLUMES_FILE = "sos_commands/eucafrontend/euca-describe-vols-v"
+# Depending on the version of the sos plugin the instances are collected
+# with or without the verbose flag, the first one found is used.
+DESCRIBE_INSTANCES_FILES = ("sos_commands/eucafrontend/euca-describe-instances-verbose",
+                            "sos_commands/eucafrontend/euca-describe-instances")
+DESCRIBE_NODES_FILE = "sos_commands/eucafrontend/euca-describe-nodes"
+# The logs of every Eucalyptus component, a glob pattern.
+EUCA_LOG_FILES = "var/log/eucalyptus/*.log"
+
+ServiceRecord = namedtuple("ServiceRecord", ["stype", "zone", "hostname", "state", "url", "arn"])
+PropertyRecord = namedtuple("PropertyRecord", ["key", "lines"])
+InstanceRecord = namedtuple("InstanceRecord", ["instance_id", "state", "zone", "itype", "public_ip", "private_ip"])
+
+_ipv4_re = re.compile(r".*inet addr:([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)")
+_address_re = re.compile(r"^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$")
+_VOLUME_PREFIXES = ("VOLUME\t", "ATTACHMENT\t")
+_instance_id_re = re.compile(r"\bi-[0-9a-fA-F]+\b")
+
+
+def get_report_file(report, relpath):
+    """
+    Returns the path to a file inside an extracted report.
+
+    @param report: The report that the file belongs to.
+    @type report: Report
+    @param relpath: The path of the file relative to the report root.
+    @type relpath: String
+    @return: The full path, or None if the file does not exist.
+    @rtype: String
+    """
+    return find_file(report.getPathToExtractedReport(), relpath)
+
+
+def find_file(report_root, relpath):
+    """
+    Returns the path to a file below an extracted report directory, or
+    None if the file does not exist.
+
+    @param report_root: The path to the extracted report.
+    @type report_root: String
+    @param relpath: The path of the file relative to the report root.
+    @type relpath: String
+    """
+    path = os.path.join(report_root, relpath)
+    if os.path.isfile(path):
+        return path
+    return None
+
+
+def iter_lines(path):
+    """
+    Yields the lines of a file with the trailing newline removed. Nothing
+    is yielded if path is None.
+    """
+    if path is None:
+        return
+    nbytes = 0
+    lines = 0
+    fin = open(path, "r")
+    try:
+        for line in fin:
+            nbytes += len(line)
+            lines += 1
+            yield line.rstrip("\r\n")
+    finally:
+        fin.close()
+        perf.count_read(path, nbytes, lines)
+
+
+def iter_tab_records(path, record_type=None):
+    """
+    Yields the tab separated fields of each line of a file, as written by
+    the euca2ools describe commands.
+
+    @param record_type: If given, only lines whose first field matches
+    are yielded (for example "SERVICE" or "VOLUME"). The other lines are
+    skipped without being split.
+    @type record_type: String
+    """
+    if record_type is None:
+        for line in iter_lines(path):
+            yield line.split("\t")
+        return
+    prefix = record_type + "\t"
+    for line in iter_lines(path):
+        if line.startswith(prefix) or line == record_type:
+            yield line.split("\t")
+
+
+def iter_properties(path):
+    """
+    Yields a PropertyRecord for each PROPERTY line of
+    euca-describe-properties output.
+
+    A property value can span multiple lines (like the network
+    configuration), the lines following a PROPERTY line are continuation
+    lines until the next PROPERTY line is reached.
+
+    Like iter_volume_records(), the file is read directly and only the
+    PROPERTY lines are split, the continuation lines are kept as they
+    are and the lines before the first record are skipped untouched.
+    """
+    if path is None:
+        return
+    nbytes = 0
+    lines = 0
+    record = None
+    fin = open(path, "r")
+    try:
+        for line in fin:
+            nbytes += len(line)
+            lines += 1
+            if line.startswith("PROPERTY"):
+                if record is not None:
+                    yield record
+                data = line.rstrip("\r\n").split(None, 2)[1:]  # We don't care about the 'PROPERTY' field
+                if not data:
+                    record = None
+                    continue
+                value = data[1] if len(data) > 1 else ""
+                record = PropertyRecord(data[0], [value])
+            elif record is not None:
+                # append to last property until we reach a new state (read: PROPERTY)
+                record.lines.append(line.rstrip("\r\n"))
+    finally:
+        fin.close()
+        perf.count_read(path, nbytes, lines)
+    if record is not None:
+        yield record
+
+
+def iter_services(path):
+    """
+    Yields a ServiceRecord for each SERVICE line of
+    euca-describe-services-all output. Malformed lines are logged and
+    skipped.
+    """
+    for fields in iter_tab_records(path, "SERVICE"):
+        try:
+            yield ServiceRecord(fields[1].strip(), fields[2].strip(), fields[3].strip(),
+                                fields[4].strip(), fields[6].strip(), fields[7].strip())
+        except IndexError:
+            logging.getLogger(sx.MAIN_LOGGER_NAME).status("Error on line: %s" % fields)
+
+
+def iter_volumes(path):
+    """
+    Yields the fields (without the leading 'VOLUME') of each VOLUME line
+    of euca-describe-vols-v output as a tuple. ATTACHMENT lines are
+    skipped.
+    """
+    for record_type, fields in iter_volume_records(path):
+        if record_type == "VOLUME":
+            # name,size,snap,zone,state,timestamp,... = fields
+            yield tuple(fields)
+
+
+def iter_volume_records(path):
+    """
+    Yields a (record_type, fields) tuple for each VOLUME and ATTACHMENT
+    line of euca-describe-vols-v output, the fields being a list without
+    the leading record type. An ATTACHMENT's fields are volume, instance,
+    device, status and attach time.
+
+    This is the hottest loop of the plugins on a large cloud, so the file
+    is read directly rather than through iter_tab_records(), and only the
+    VOLUME and ATTACHMENT lines are split.
+    """
+    if path is None:
+        return
+    nbytes = 0
+    lines = 0
+    fin = open(path, "r")
+    try:
+        for line in fin:
+            nbytes += len(line)
+            lines += 1
+            if line.startswith(_VOLUME_PREFIXES):
+                fields = line.rstrip("\r\n").split("\t")
+                yield fields[0], fields[1:]
+    finally:
+        fin.close()
+        perf.count_read(path, nbytes, lines)
+
+
+def iter_instances(path):
+    """
+    Yields an InstanceRecord for each INSTANCE line of
+    euca-describe-instances output.
+    """
+    for fields in iter_tab_records(path, "INSTANCE"):
+        fields = fields + [""] * (18 - len(fields))
+        yield InstanceRecord(fields[1], fields[5], fields[11], fields[9], fields[16], fields[17])
+
+
+def iter_node_instances(path):
+    """
+    Yields a (node, [instance ids]) tuple for each NODE of
+    euca-describe-nodes output. The node is its first IP address field;
+    the instances are the ids listed on the NODE line or on the INSTANCE
+    lines following it, which covers both output formats of the command.
+    """
+    node = None
+    instances = []
+    for fields in iter_tab_records(path):
+        if fields[0] == "NODE":
+            if node is not None:
+                yield node, instances
+            addresses = [f.strip() for f in fields[1:] if _address_re.match(f.strip())]
+            node = addresses[0] if addresses else (fields[2].strip() if len(fields) > 2 else fields[1].strip())
+            instances = _instance_id_re.findall("\t".join(fields[1:]))
+        elif fields[0] == "INSTANCE" and node is not None:
+            instances.extend(_instance_id_re.findall("\t".join(fields[1:])))
+    if node is not None:
+        yield node, instances
+
+
+def iter_conf(path):
+    """
+    Yields a (key, value) tuple for each assignment in a shell style
+    key=value configuration file such as eucalyptus.conf. Comments, blank
+    lines and lines without an assignment are skipped.
+    """
+    for line in iter_lines(path):
+        if line.startswith("#") or len(line.strip()) == 0:
+            continue
+        pair = line.split("=", 1)
+        if len(pair) == 2:
+            yield tuple(pair)
+
+
+def iter_hosts(path):
+    """
+    Yields an (ip, [names]) tuple for each entry of an /etc/hosts file.
+    """
+    for line in iter_lines(path):
+        fields = line.split("#", 1)[0].split()
+        if len(fields) > 1:
+            yield fields[0], fields[1:]
+
+
+def iter_ifconfig_ipv4(path):
+    """
+    Yields the IPv4 addresses found in ifconfig output.
+    """
+    for line in iter_lines(path):
+        m = _ipv4_re.match(line)
+        if m is not None:
+            yield m.group(1)
+
+
+def read_first_line(path):
+    """
+    Returns the first line of a file without the newline, or None if the
+    file does not exist or is empty.
+    """
+    for line in iter_lines(path):
+        return line
+    return None
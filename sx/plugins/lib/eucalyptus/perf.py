@@ -0,0 +1,147 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Phase timing and I/O counters of the plugins.
+
+sxconsole runs every plugin in the same process, so the statistics are
+kept in a module level registry keyed by plugin name. The phase methods
+are wrapped with timed(), parsers count the files, bytes and lines they
+read with count_read(), and pages.Page counts the rows and pages it
+writes. Reads done in worker processes are collected with take_reads()
+and merged by parallel.parse_reports().
+
+@version   :  1.0
+"""
+import time
+import json
+import logging
+import functools
+
+import sx
+
+COUNTERS = ("files", "bytes", "lines", "rows", "pages")
+# The phases summed in a plugin's total, the other timings (like the site
+# build of Eucahugo) are parts of one of them.
+PHASES = ("setup", "execute", "report", "action")
+
+# Per path [files, bytes, lines] read in this process since the last
+# take_reads().
+_reads = {}
+# Plugin name -> PluginStats
+_stats = {}
+
+
+class PluginStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.counters = dict([(c, 0) for c in COUNTERS])
+        # Input file (relative to the report root) -> [files, bytes, lines]
+        self.inputs = {}
+        # Parser function name -> seconds
+        self.parsers = {}
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def add_input(self, relpath, files, nbytes, lines):
+        counts = self.inputs.setdefault(relpath, [0, 0, 0])
+        counts[0] += files
+        counts[1] += nbytes
+        counts[2] += lines
+        self.counters["files"] += files
+        self.counters["bytes"] += nbytes
+        self.counters["lines"] += lines
+
+    def add_parser_time(self, name, seconds):
+        self.parsers[name] = self.parsers.get(name, 0.0) + seconds
+
+    def getTotalTime(self):
+        return sum([self.phases.get(p, 0.0) for p in PHASES])
+
+    def to_dict(self):
+        return {"phases": self.phases, "counters": self.counters, "parsers": self.parsers,
+                "inputs": dict([(p, {"files": c[0], "bytes": c[1], "lines": c[2]}) for p, c in self.inputs.items()])}
+
+
+def get_stats(name):
+    """
+    Returns the PluginStats of a plugin name, created on first use.
+    """
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = PluginStats(name)
+    return stats
+
+
+def get_all_stats():
+    """
+    Returns the PluginStats of every plugin, sorted by name.
+    """
+    return [_stats[name] for name in sorted(_stats)]
+
+
+def timed(phase):
+    """
+    Decorator adding the duration of a plugin method to the plugin's
+    statistics under phase.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            start = time.time()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                get_stats(self.getName()).add_time(phase, time.time() - start)
+        return wrapper
+    return decorate
+
+
+def count_read(path, nbytes, lines):
+    """
+    Records that a file was read by a parser.
+    """
+    counts = _reads.setdefault(path, [0, 0, 0])
+    counts[0] += 1
+    counts[1] += nbytes
+    counts[2] += lines
+
+
+def take_reads():
+    """
+    Returns the reads recorded since the last call, as a dict of path to
+    [files, bytes, lines], and resets them.
+    """
+    global _reads
+    reads = _reads
+    _reads = {}
+    return reads
+
+
+def save(path):
+    """
+    Writes the statistics of every plugin to a JSON file.
+    """
+    try:
+        fout = open(path, "w")
+        try:
+            json.dump(dict([(s.name, s.to_dict()) for s in get_all_stats()]), fout, indent=1, sort_keys=True)
+        finally:
+            fout.close()
+    except IOError, e:
+        logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to write the performance data %s: %s" % (path, e))
@@ -0,0 +1,126 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Gzip siblings of the text files of a built site.
+
+compress_tree() writes <file>.gz next to every HTML, CSS, JS, JSON and
+XML file of the public directory, so a web server can send them as they
+are to the browsers that accept gzip. The sha1 of each compressed file
+is kept in a manifest, and a file whose content didn't change since the
+last run keeps its .gz (Hugo rewrites every page on each build). Each .gz
+gets the mtime of its file, a server can tell a sibling left over by a
+build without compression is stale when it is older than the file.
+
+@version   :  1.0
+"""
+import os
+import gzip
+import logging
+
+import sx
+from sx.plugins.lib.eucalyptus import manifest
+
+GZIP_SUFFIX = ".gz"
+COMPRESSED_TYPES = (".html", ".htm", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+# Smaller files don't gain much from compression.
+MIN_SIZE = 512
+
+
+def is_compressible(path):
+    return path.lower().endswith(COMPRESSED_TYPES)
+
+
+def gzip_file(path, gz_path, level=9):
+    """
+    Writes the gzip compressed content of path to gz_path, through a
+    temporary file so a server never sends a partial sibling.
+    """
+    tmp_path = gz_path + ".tmp"
+    fin = open(path, "rb")
+    try:
+        # A fixed mtime in the header keeps the output identical for the
+        # same content.
+        fout = gzip.GzipFile(tmp_path, "wb", level, mtime=0)
+        try:
+            for block in iter(lambda: fin.read(1024 * 1024), ""):
+                fout.write(block)
+        finally:
+            fout.close()
+    finally:
+        fin.close()
+    os.rename(tmp_path, gz_path)
+
+
+def compress_tree(root, manifest_path):
+    """
+    Writes the missing or outdated gzip siblings of the files below root
+    and removes the siblings of files that are gone.
+
+    @param root: The public directory of the site.
+    @type root: String
+    @param manifest_path: The file the hashes of the compressed files are
+    kept in between runs.
+    @type manifest_path: String
+    @return: The (compressed, unchanged, removed) counts.
+    @rtype: Tuple
+    """
+    old = manifest.load(manifest_path)
+    hashes = {}
+    compressed = unchanged = removed = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fname in sorted(filenames):
+            path = os.path.join(dirpath, fname)
+            relpath = os.path.relpath(path, root)
+            if fname.endswith(GZIP_SUFFIX):
+                if not os.path.isfile(path[:-len(GZIP_SUFFIX)]):
+                    os.remove(path)
+                    removed += 1
+                continue
+            if not is_compressible(fname) or os.path.islink(path):
+                continue
+            st = os.stat(path)
+            gz_path = path + GZIP_SUFFIX
+            if st.st_size < MIN_SIZE:
+                if os.path.exists(gz_path):
+                    os.remove(gz_path)
+                    removed += 1
+                continue
+            digest = manifest.file_sha1(path)
+            hashes[relpath] = digest
+            if old.get(relpath) == digest and os.path.isfile(gz_path):
+                unchanged += 1
+            else:
+                try:
+                    gzip_file(path, gz_path)
+                except (IOError, OSError), e:
+                    logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to compress %s: %s" % (path, e))
+                    del hashes[relpath]
+                    continue
+                compressed += 1
+            os.utime(gz_path, (st.st_atime, st.st_mtime))
+    manifest.save(manifest_path, hashes)
+    return compressed, unchanged, removed
+
+
+def get_sibling(path):
+    """
+    Returns the path of the up to date gzip sibling of a file, or None.
+    """
+    gz_path = path + GZIP_SUFFIX
+    try:
+        # In whole seconds, os.utime() doesn't keep the nanoseconds.
+        return gz_path if int(os.stat(gz_path).st_mtime) >= int(os.stat(path).st_mtime) else None
+    except OSError:
+        return None
@@ -0,0 +1,523 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+An in-process renderer for the Hugo site written by the plugins.
+
+It understands what the eucasx theme and the plugins use: TOML front
+matter, the config.toml main menu, the single/list/index/404 layouts
+with their partials, and a small subset of the Go template language
+(field lookups, variables, partial, range, if, with and else). Pages are
+written to public/ with the same pretty URLs Hugo uses, so the site can
+be built on hosts that do not have Hugo installed.
+
+Markdown pages are converted with the python markdown module when it is
+installed, otherwise with a minimal converter that handles headings,
+paragraphs and the raw HTML blocks the plugins write.
+
+@version   :  1.0
+"""
+import os
+import re
+import shutil
+import logging
+
+import sx
+from sx.plugins.lib.eucalyptus.pages import Raw, escape
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+CONTENT_EXTENSIONS = (".html", ".htm", ".md", ".markdown")
+
+_action_re = re.compile(r"\{\{-?\s*(.*?)\s*-?\}\}", re.DOTALL)
+_toml_table_re = re.compile(r"^\[\[?\s*([^\]]+?)\s*\]\]?$")
+_toml_escape_re = re.compile(r"\\(u[0-9a-fA-F]{4}|.)")
+_TOML_ESCAPES = {"b": "\b", "t": "\t", "n": "\n", "f": "\f", "r": "\r", '"': '"', "\\": "\\"}
+
+
+class TemplateError(Exception):
+    pass
+
+
+# #######################################################################
+# TOML
+# #######################################################################
+def _unescape_toml(match):
+    escape = match.group(1)
+    if escape[0] == "u" and len(escape) == 5:
+        return unichr(int(escape[1:], 16)).encode("utf-8")
+    return _TOML_ESCAPES.get(escape, match.group(0))
+
+
+def _parse_toml_value(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        if value[0] == "'":
+            # Literal strings have no escapes.
+            return value[1:-1]
+        return _toml_escape_re.sub(_unescape_toml, value[1:-1])
+    if value in ("true", "false"):
+        return value == "true"
+    if value.startswith("[") and value.endswith("]"):
+        return [_parse_toml_value(v) for v in value[1:-1].split(",") if v.strip()]
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_toml(lines):
+    """
+    Parses the subset of TOML used by Hugo configurations and front
+    matter: key = value pairs, [tables] and [[arrays.of.tables]].
+
+    @param lines: The TOML lines.
+    @type lines: Iterable
+    @rtype: Dict
+    """
+    data = {}
+    current = data
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = _toml_table_re.match(line)
+        if m is not None:
+            keys = m.group(1).split(".")
+            parent = data
+            for key in keys[:-1]:
+                parent = parent.setdefault(key, {})
+            if line.startswith("[["):
+                current = {}
+                parent.setdefault(keys[-1], []).append(current)
+            else:
+                current = parent.setdefault(keys[-1], {})
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            current[key.strip()] = _parse_toml_value(value)
+    return data
+
+
+def split_front_matter(text):
+    """
+    Returns the (front matter dict, content) of a page.
+    """
+    lines = text.split("\n")
+    if not lines or lines[0].strip() != "+++":
+        return {}, text
+    for i in range(1, len(lines)):
+        if lines[i].strip() == "+++":
+            return parse_toml(lines[1:i]), "\n".join(lines[i + 1:])
+    return {}, text
+
+
+# #######################################################################
+# Markdown
+# #######################################################################
+def markdownify(text):
+    """
+    Converts markdown to HTML.
+    """
+    if markdown is not None:
+        return markdown.markdown(text)
+    blocks = []
+    for block in re.split(r"\n\s*\n", text.strip()):
+        if not block.strip():
+            continue
+        stripped = block.lstrip()
+        m = re.match(r"^(#{1,6})\s+(.*?)\s*#*$", stripped)
+        if m is not None and "\n" not in stripped:
+            level = len(m.group(1))
+            blocks.append("<h%d>%s</h%d>" % (level, m.group(2), level))
+        elif stripped.startswith("<"):
+            # Raw HTML is passed through untouched.
+            blocks.append(block)
+        else:
+            blocks.append("<p>%s</p>" % block)
+    return "\n".join(blocks)
+
+
+# #######################################################################
+# Templates
+# #######################################################################
+class _Node(object):
+    def __init__(self, kind, arg=None):
+        self.kind = kind
+        self.arg = arg
+        self.body = []
+        self.else_body = []
+
+
+def _parse_template(text):
+    """
+    Returns the node list of a template.
+    """
+    root = _Node("root")
+    # (block node, node list being filled) for each open block.
+    stack = [(root, root.body)]
+    pos = 0
+    for m in _action_re.finditer(text):
+        target = stack[-1][1]
+        if m.start() > pos:
+            target.append(_Node("text", text[pos:m.start()]))
+        pos = m.end()
+        action = m.group(1).strip()
+        word = action.split(None, 1)[0] if action else ""
+        if action.startswith("/*"):
+            continue
+        elif word in ("range", "if", "with"):
+            node = _Node(word, action[len(word):].strip())
+            target.append(node)
+            stack.append((node, node.body))
+        elif word == "else":
+            if len(stack) < 2:
+                raise TemplateError("else without a block")
+            stack[-1] = (stack[-1][0], stack[-1][0].else_body)
+        elif word == "end":
+            if len(stack) < 2:
+                raise TemplateError("end without a block")
+            stack.pop()
+        else:
+            target.append(_Node("action", action))
+    if len(stack) != 1:
+        raise TemplateError("missing end")
+    if pos < len(text):
+        root.body.append(_Node("text", text[pos:]))
+    return root.body
+
+
+def _tokenize(expr):
+    return re.findall(r'"(?:[^"\\]|\\.)*"|\S+', expr)
+
+
+def _lookup(value, name):
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        result = value.get(name)
+    else:
+        result = getattr(value, name, None)
+    if callable(result):
+        result = result()
+    return result
+
+
+class _Scope(object):
+    def __init__(self, dot, root, variables):
+        self.dot = dot
+        self.root = root
+        self.variables = variables
+
+
+class TemplateSet(object):
+    """
+    The layouts of a site, looked up in the site's layouts directory
+    before the theme's.
+    """
+    def __init__(self, layout_dirs):
+        self.__layout_dirs = layout_dirs
+        self.__cache = {}
+
+    def find(self, *names):
+        """
+        Returns the first of names that exists, or None.
+        """
+        for name in names:
+            for layout_dir in self.__layout_dirs:
+                if os.path.isfile(os.path.join(layout_dir, name)):
+                    return name
+        return None
+
+    def __get(self, name):
+        if name not in self.__cache:
+            for layout_dir in self.__layout_dirs:
+                path = os.path.join(layout_dir, name)
+                if os.path.isfile(path):
+                    fin = open(path, "r")
+                    try:
+                        self.__cache[name] = _parse_template(fin.read())
+                    finally:
+                        fin.close()
+                    break
+            else:
+                raise TemplateError("Template not found: %s" % name)
+        return self.__cache[name]
+
+    def render(self, name, dot):
+        out = []
+        self.__render_nodes(self.__get(name), _Scope(dot, dot, {}), out)
+        return "".join(out)
+
+    def __eval(self, expr, scope):
+        tokens = _tokenize(expr)
+        if not tokens:
+            return None
+        if tokens[0] == "partial":
+            if len(tokens) < 2:
+                raise TemplateError("partial needs a name: %s" % expr)
+            dot = self.__eval_term(tokens[2], scope) if len(tokens) > 2 else scope.dot
+            return Raw(self.render(os.path.join("partials", self.__eval_term(tokens[1], scope)), dot))
+        if len(tokens) > 1:
+            raise TemplateError("Unsupported template expression: %s" % expr)
+        return self.__eval_term(tokens[0], scope)
+
+    def __eval_term(self, term, scope):
+        if term.startswith('"'):
+            return term[1:-1].replace('\\"', '"')
+        if term.isdigit():
+            return int(term)
+        if term == ".":
+            return scope.dot
+        if term.startswith("$"):
+            name, _, path = term[1:].partition(".")
+            value = scope.root if name == "" else scope.variables.get(name)
+        elif term.startswith("."):
+            value = scope.dot
+            path = term[1:]
+        else:
+            raise TemplateError("Unsupported template term: %s" % term)
+        for part in path.split("."):
+            if part:
+                value = _lookup(value, part)
+        return value
+
+    def __render_nodes(self, nodes, scope, out):
+        for node in nodes:
+            if node.kind == "text":
+                out.append(node.arg)
+            elif node.kind == "action":
+                m = re.match(r"^\$(\w+)\s*:?=\s*(.*)$", node.arg)
+                if m is not None:
+                    scope.variables[m.group(1)] = self.__eval(m.group(2), scope)
+                    continue
+                value = self.__eval(node.arg, scope)
+                if value is not None:
+                    out.append(escape(value))
+            else:
+                value = self.__eval(node.arg, scope)
+                if node.kind == "range":
+                    items = list(value or [])
+                    for item in items:
+                        self.__render_nodes(node.body, _Scope(item, scope.root, dict(scope.variables)), out)
+                    if not items:
+                        self.__render_nodes(node.else_body, scope, out)
+                elif node.kind == "with":
+                    if value:
+                        self.__render_nodes(node.body, _Scope(value, scope.root, dict(scope.variables)), out)
+                    else:
+                        self.__render_nodes(node.else_body, scope, out)
+                else:
+                    self.__render_nodes(node.body if value else node.else_body, scope, out)
+
+
+# #######################################################################
+# Site
+# #######################################################################
+def _weight(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PageList(list):
+    def ByWeight(self):
+        return PageList(sorted(self, key=lambda p: (p.Weight, p.Title)))
+
+
+class MenuEntry(object):
+    def __init__(self, name, url, weight=0, pre="", identifier=""):
+        self.Name = name
+        self.URL = url
+        self.Weight = _weight(weight)
+        self.Pre = Raw(pre)
+        self.Identifier = identifier
+
+
+class Page(object):
+    """
+    The template context of a rendered page.
+    """
+    def __init__(self, site, title, url, content="", weight=0, params=None, section="", kind="page"):
+        self.Site = site
+        self.Title = title
+        self.Permalink = url
+        self.RelPermalink = url
+        self.URL = url
+        self.Content = Raw(content)
+        self.Weight = _weight(weight)
+        self.Params = params or {}
+        self.Section = section
+        self.Kind = kind
+        self.Description = self.Params.get("description", "")
+        self.Data = {"Pages": PageList()}
+        # The content file, relative to the content directory.
+        self.source = None
+
+    def IsHome(self):
+        return self.Kind == "home"
+
+
+class Site(object):
+    def __init__(self, config):
+        self.Title = config.get("title", "")
+        self.BaseURL = config.get("baseurl", "/")
+        self.Params = config.get("params", {})
+        self.Menus = {}
+
+
+class SiteRenderer(object):
+    """
+    Renders a Hugo site directory (config.toml, content/, themes/) into
+    a public directory.
+    """
+    def __init__(self, site_dir, public_dir=None):
+        self.__site_dir = site_dir
+        self.__public_dir = public_dir or os.path.join(site_dir, "public")
+        self.__config = {}
+        config_path = os.path.join(site_dir, "config.toml")
+        if os.path.isfile(config_path):
+            fin = open(config_path, "r")
+            try:
+                self.__config = parse_toml(fin.read().split("\n"))
+            finally:
+                fin.close()
+        theme_dir = os.path.join(site_dir, "themes", self.__config.get("theme", ""))
+        self.__theme_dir = theme_dir if self.__config.get("theme") else None
+        layout_dirs = [os.path.join(site_dir, "layouts")]
+        if self.__theme_dir:
+            layout_dirs.append(os.path.join(self.__theme_dir, "layouts"))
+        self.__templates = TemplateSet(layout_dirs)
+
+    def __load_pages(self, site):
+        content_dir = os.path.join(self.__site_dir, "content")
+        pages = []
+        for dirpath, dirnames, filenames in os.walk(content_dir):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                name, ext = os.path.splitext(fname)
+                if ext.lower() not in CONTENT_EXTENSIONS or name.startswith("_"):
+                    continue
+                path = os.path.join(dirpath, fname)
+                relpath = os.path.relpath(path, content_dir)
+                fin = open(path, "r")
+                try:
+                    front_matter, content = split_front_matter(fin.read())
+                finally:
+                    fin.close()
+                if ext.lower() in (".md", ".markdown"):
+                    content = markdownify(content)
+                parts = relpath.split(os.sep)
+                section = parts[0] if len(parts) > 1 else ""
+                url = "/" + "/".join([p.lower() for p in parts[:-1]] + [name.lower()]) + "/"
+                page = Page(site, front_matter.get("title", name), url, content,
+                            front_matter.get("weight", 0), front_matter, section)
+                page.source = relpath
+                pages.append(page)
+        return pages
+
+    def __build_menus(self, site, pages):
+        entries = {}
+        for menu_name, items in self.__config.get("menu", {}).items():
+            for item in items:
+                entries.setdefault(menu_name, []).append(
+                    MenuEntry(item.get("name", ""), item.get("url", ""), item.get("weight", 0),
+                              item.get("pre", ""), item.get("identifier", "")))
+        for page in pages:
+            menus = page.Params.get("menu")
+            if isinstance(menus, basestring):
+                menus = [menus]
+            for menu_name in menus or []:
+                entries.setdefault(menu_name, []).append(MenuEntry(page.Title, page.URL, page.Weight))
+        for menu_name, items in entries.items():
+            site.Menus[menu_name] = sorted(items, key=lambda e: (e.Weight, e.Name))
+
+    def __write(self, url, html):
+        if url.endswith("/"):
+            path = os.path.join(self.__public_dir, url.strip("/"), "index.html")
+        else:
+            path = os.path.join(self.__public_dir, url.lstrip("/"))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fout = open(path, "w")
+        try:
+            fout.write(html)
+        finally:
+            fout.close()
+
+    def __copy_static(self):
+        for static_dir in [os.path.join(self.__theme_dir or "", "static"), os.path.join(self.__site_dir, "static")]:
+            if not os.path.isdir(static_dir):
+                continue
+            for dirpath, dirnames, filenames in os.walk(static_dir):
+                for fname in filenames:
+                    src = os.path.join(dirpath, fname)
+                    dst = os.path.join(self.__public_dir, os.path.relpath(src, static_dir))
+                    if not os.path.isdir(os.path.dirname(dst)):
+                        os.makedirs(os.path.dirname(dst))
+                    shutil.copy2(src, dst)
+
+    def render(self):
+        """
+        Renders the site.
+
+        @return: The URLs of the rendered pages.
+        @rtype: Array
+        """
+        site = Site(self.__config)
+        pages = self.__load_pages(site)
+        self.__build_menus(site, pages)
+        rendered = []
+
+        sections = {}
+        for page in pages:
+            layout = self.__templates.find("%s/single.html" % page.Section, "_default/single.html")
+            if layout is None:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).warning("No single layout found for %s" % page.source)
+                continue
+            self.__write(page.URL, self.__templates.render(layout, page))
+            rendered.append(page.URL)
+            if page.Section:
+                sections.setdefault(page.Section, PageList()).append(page)
+
+        for section, section_pages in sorted(sections.items()):
+            layout = self.__templates.find("section/%s.html" % section, "%s/list.html" % section, "_default/list.html")
+            if layout is None:
+                continue
+            url = "/%s/" % section.lower()
+            node = Page(site, section.capitalize(), url, section=section, kind="section")
+            node.Data["Pages"] = section_pages
+            self.__write(url, self.__templates.render(layout, node))
+            rendered.append(url)
+
+        layout = self.__templates.find("index.html", "_default/list.html")
+        if layout is not None:
+            home = Page(site, site.Title, "/", kind="home")
+            home.Data["Pages"] = PageList(pages)
+            self.__write("/", self.__templates.render(layout, home))
+            rendered.append("/")
+
+        if self.__templates.find("404.html") is not None:
+            self.__write("/404.html", self.__templates.render("404.html", Page(site, "404 Page not found", "/404.html", kind="404")))
+            rendered.append("/404.html")
+
+        self.__copy_static()
+        return rendered
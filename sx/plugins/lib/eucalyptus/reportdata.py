@@ -0,0 +1,143 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Per-report parsing for the plugins' setup().
+
+Each function takes a parallel.ReportInfo and returns the partial result
+the plugin merges into its own data structures. They are module level
+functions so that they can be run by the worker processes in
+parallel.map_reports(). Bump the cache.parser() version of a function
+whenever the structure of its result changes.
+
+@version   :  1.0
+"""
+import os
+
+from sx.plugins.lib.eucalyptus import cache
+from sx.plugins.lib.eucalyptus import confgroups
+from sx.plugins.lib.eucalyptus import logscan
+from sx.plugins.lib.eucalyptus import parsers
+from sx.plugins.lib.eucalyptus.volumes import VolumeStore
+
+
+@cache.parser(2, [parsers.HOSTS_FILE, parsers.IFCONFIG_FILE, parsers.DESCRIBE_SERVICES_FILE])
+def parse_topology(info):
+    """
+    Returns (hosts, ifconfig_ips, services) for a report: the /etc/hosts
+    entries as (ip, [names]) tuples, the set of non loopback ifconfig
+    addresses (None without ifconfig output) and the list of
+    ServiceRecords from euca-describe-services-all.
+    """
+    hosts = list(parsers.iter_hosts(parsers.find_file(info.path, parsers.HOSTS_FILE)))
+
+    ifconfig_ips = None
+    path = parsers.find_file(info.path, parsers.IFCONFIG_FILE)
+    if path is not None:
+        ifconfig_ips = set(parsers.iter_ifconfig_ipv4(path))
+        ifconfig_ips.discard("127.0.0.1")
+
+    services = list(parsers.iter_services(parsers.find_file(info.path, parsers.DESCRIBE_SERVICES_FILE)))
+    return hosts, ifconfig_ips, services
+
+
+@cache.parser(2, [parsers.DESCRIBE_PROPERTIES_FILE, parsers.EUCA_CONF_FILE])
+def parse_config(info):
+    """
+    Returns (properties, conf, canonical, digest) for a report: the list
+    of PropertyRecords from euca-describe-properties, the (key, value)
+    tuples of eucalyptus.conf and their confgroups canonical form and
+    fingerprint (all three None if the file does not exist).
+    """
+    properties = list(parsers.iter_properties(parsers.find_file(info.path, parsers.DESCRIBE_PROPERTIES_FILE)))
+    conf = canonical = digest = None
+    path = parsers.find_file(info.path, parsers.EUCA_CONF_FILE)
+    if path is not None:
+        conf = list(parsers.iter_conf(path))
+        canonical = confgroups.canonicalize(conf)
+        digest = confgroups.fingerprint(canonical)
+    return properties, conf, canonical, digest
+
+
+@cache.parser(4, [parsers.DESCRIBE_VOLUMES_FILE])
+def parse_volumes(info):
+    """
+    Returns a VolumeStore of the volumes and attachments in
+    euca-describe-vols-v, read in a single pass.
+    """
+    store = VolumeStore()
+    store.load(parsers.iter_volume_records(parsers.find_file(info.path, parsers.DESCRIBE_VOLUMES_FILE)))
+    return store
+
+
+@cache.parser(1, list(parsers.DESCRIBE_INSTANCES_FILES) + [parsers.DESCRIBE_NODES_FILE,
+                                                           parsers.DESCRIBE_SERVICES_FILE])
+def parse_instances(info):
+    """
+    Returns (instances, node_instances, nodes) for a report: the list of
+    InstanceRecords from euca-describe-instances, the (node, [instance
+    ids]) tuples of euca-describe-nodes and the ServiceRecords of the node
+    services in euca-describe-services-all.
+    """
+    instances = []
+    for relpath in parsers.DESCRIBE_INSTANCES_FILES:
+        path = parsers.find_file(info.path, relpath)
+        if path is not None:
+            instances = list(parsers.iter_instances(path))
+            break
+    node_instances = list(parsers.iter_node_instances(parsers.find_file(info.path, parsers.DESCRIBE_NODES_FILE)))
+    nodes = [s for s in parsers.iter_services(parsers.find_file(info.path, parsers.DESCRIBE_SERVICES_FILE))
+             if s.stype == "node"]
+    return instances, node_instances, nodes
+
+
+@cache.parser(1, [parsers.DATE_FILE])
+def parse_date(info):
+    """
+    Returns the first line of the date output, or None.
+    """
+    line = parsers.read_first_line(parsers.find_file(info.path, parsers.DATE_FILE))
+    if line is None:
+        return None
+    return line.rstrip()
+
+
+@cache.parser(2, [parsers.EUCA_LOG_FILES], key=logscan.get_catalog_key)
+def parse_logs(info):
+    """
+    Returns (counts, samples, files, indexes) for a report: the dict of
+    (signature, minute) to the number of log lines matching the logscan
+    catalog, the dict of signature to its first (log, line) samples, the
+    list of (log, lines matched) of every log scanned and the dict of log
+    to its sparse timestamp index. The indexes are kept with the cached
+    result, so they are reused as long as the logs don't change.
+    """
+    counts = {}
+    samples = {}
+    files = []
+    indexes = {}
+    for relpath in cache.expand_sources([parsers.EUCA_LOG_FILES], info.path):
+        index = indexes[relpath] = []
+        files.append((relpath, logscan.scan_file(os.path.join(info.path, relpath), counts, samples, relpath, index)))
+    return counts, samples, files, indexes
+
+
+def get_sources(*funcs):
+    """
+    Returns the sorted union of the report files the parser functions
+    read, for the REPORT_PATHS of the plugins.
+    """
+    sources = set()
+    for func in funcs:
+        sources.update(func.cache_sources)
+    return sorted(sources)
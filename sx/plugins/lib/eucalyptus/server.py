@@ -0,0 +1,373 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Web servers running in the background while the plugins carry on.
+
+A ManagedServer starts a server command, streams its output line by line
+to the sx logger from a reader thread (so a chatty server can't fill a
+pipe and stall), and reports it ready when its output matches a pattern
+or its port accepts connections. The servers are registered by the
+directory they serve so a re-render reuses the running server. At exit
+the process keeps serving until Ctrl-C and then stops every server,
+which is what a blocking serve used to do, without holding up the rest
+of the run.
+
+StaticServer serves a built site from a thread of this process instead,
+without Hugo: it sends the gzip siblings written by precompress when the
+browser accepts them, and lets browsers revalidate pages with ETags.
+
+@version   :  1.0
+"""
+import os
+import re
+import time
+import atexit
+import socket
+import urllib
+import urlparse
+import logging
+import posixpath
+import threading
+import subprocess
+import SocketServer
+import BaseHTTPServer
+import SimpleHTTPServer
+
+import sx
+from sx.plugins.lib.eucalyptus import precompress
+
+# Hugo prints this once the site is built and the port is open.
+HUGO_READY_RE = re.compile(r"Web Server is available at")
+
+# Key -> ManagedServer
+_servers = {}
+
+
+def get_bind_address(value):
+    """
+    Returns the address to bind for a bind option value: "all" for every
+    interface, anything else as given. sxconsole doesn't pass addresses
+    in options cleanly, so a hostname is accepted too.
+    """
+    if value in ("all", "*"):
+        return "0.0.0.0"
+    return value or "127.0.0.1"
+
+
+class ManagedServer(object):
+    def __init__(self, name, command, host, port, cwd=None, ready_re=None):
+        """
+        @param name: The prefix of the logged output lines.
+        @type name: String
+        @param command: The server command and its arguments.
+        @type command: Array
+        @param host: The address the server binds.
+        @type host: String
+        @param port: The port the server listens on.
+        @type port: Int
+        @param ready_re: A compiled pattern of the output line telling
+        the server is ready, the port is polled otherwise.
+        """
+        self.name = name
+        self.command = command
+        self.host = host
+        self.port = port
+        self.cwd = cwd
+        self.ready_re = ready_re
+        self.__process = None
+        self.__reader = None
+        self.__ready = threading.Event()
+
+    def getUrl(self):
+        host = self.host
+        if host == "0.0.0.0":
+            host = socket.gethostname()
+        return "http://%s:%d/" % (host, self.port)
+
+    def start(self):
+        """
+        Starts the server in the background. Raises OSError if the command
+        can't be run.
+        """
+        self.__process = subprocess.Popen(self.command, cwd=self.cwd, stdout=subprocess.PIPE,
+                                          stderr=subprocess.STDOUT, close_fds=True)
+        self.__reader = threading.Thread(target=self.__read_output, name="%s-output" % self.name)
+        self.__reader.daemon = True
+        self.__reader.start()
+
+    def __read_output(self):
+        logger = logging.getLogger(sx.MAIN_LOGGER_NAME)
+        for line in iter(self.__process.stdout.readline, ""):
+            line = line.rstrip()
+            if line:
+                logger.info("%s: %s" % (self.name, line))
+            if self.ready_re is not None and self.ready_re.search(line):
+                self.__ready.set()
+        self.__process.stdout.close()
+
+    def isRunning(self):
+        return self.__process is not None and self.__process.poll() is None
+
+    def __accepts_connections(self):
+        host = "127.0.0.1" if self.host == "0.0.0.0" else self.host
+        try:
+            sock = socket.create_connection((host, self.port), 1)
+        except (socket.error, socket.timeout):
+            return False
+        sock.close()
+        return True
+
+    def waitReady(self, timeout):
+        """
+        Returns True once the server is ready, False if it exited or isn't
+        ready after timeout seconds.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.__ready.wait(0.2):
+                return True
+            if not self.isRunning():
+                return False
+            if self.ready_re is None and self.__accepts_connections():
+                self.__ready.set()
+                return True
+        return self.__ready.is_set()
+
+    def wait(self):
+        """
+        Blocks until the server exits.
+        """
+        # Waiting with a timeout keeps Ctrl-C working in Python 2.
+        while self.isRunning():
+            time.sleep(0.5)
+
+    def stop(self, timeout=5):
+        """
+        Stops the server, killing it if it doesn't exit within timeout
+        seconds.
+        """
+        if not self.isRunning():
+            return
+        self.__process.terminate()
+        deadline = time.time() + timeout
+        while self.__process.poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        if self.__process.poll() is None:
+            self.__process.kill()
+            self.__process.wait()
+        if self.__reader is not None:
+            self.__reader.join(timeout)
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Stopped the %s server at %s" % (self.name, self.getUrl()))
+
+
+class StaticRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """
+    Serves the files below the server's root, the precompressed variant
+    when there is one and the client accepts gzip. Pages are revalidated
+    on every visit, the versioned URLs (with a v= query, like the data
+    tables) are cached for good.
+    """
+    server_version = "eucasx"
+
+    def do_GET(self):
+        fin = self.send_head()
+        if fin is not None:
+            try:
+                self.copyfile(fin, self.wfile)
+            finally:
+                fin.close()
+
+    def do_HEAD(self):
+        fin = self.send_head()
+        if fin is not None:
+            fin.close()
+
+    def translate_path(self, path):
+        """
+        Returns the file of a URL path below the server root, or None for
+        the paths leaving it and the hidden files.
+        """
+        path = posixpath.normpath(urllib.unquote(path.split("?", 1)[0].split("#", 1)[0]))
+        parts = [p for p in path.split("/") if p and p != "."]
+        if [p for p in parts if p.startswith(".")]:
+            return None
+        return os.path.join(self.server.root, *parts)
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if path is not None and os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                self.send_response(301)
+                self.send_header("Location", self.path.split("?", 1)[0] + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            path = os.path.join(path, "index.html")
+        if path is None or not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return None
+
+        ctype = self.guess_type(path)
+        encoding = None
+        accepted = [e.split(";", 1)[0].strip() for e in self.headers.get("Accept-Encoding", "").split(",")]
+        if "gzip" in accepted:
+            sibling = precompress.get_sibling(path)
+            if sibling is not None:
+                path = sibling
+                encoding = "gzip"
+        try:
+            fin = open(path, "rb")
+        except IOError:
+            self.send_error(404, "File not found")
+            return None
+        st = os.fstat(fin.fileno())
+        etag = '"%x-%x%s"' % (int(st.st_mtime), st.st_size, "-gz" if encoding else "")
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            fin.close()
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
+
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(st.st_size))
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if "v" in urlparse.parse_qs(urlparse.urlsplit(self.path).query):
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return fin
+
+    def address_string(self):
+        # The default looks the client's name up for every request.
+        return self.client_address[0]
+
+    def log_message(self, format, *args):
+        logging.getLogger(sx.MAIN_LOGGER_NAME).info("%s: %s %s" % (self.server.name, self.address_string(), format % args))
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StaticServer(object):
+    """
+    Serves a directory from a thread of this process, with the same
+    interface as ManagedServer.
+    """
+    def __init__(self, name, root, host, port):
+        """
+        @param name: The prefix of the logged requests.
+        @type name: String
+        @param root: The directory served.
+        @type root: String
+        @param host: The address the server binds.
+        @type host: String
+        @param port: The port the server listens on.
+        @type port: Int
+        """
+        self.name = name
+        self.root = root
+        self.host = host
+        self.port = port
+        self.__httpd = None
+        self.__thread = None
+
+    def getUrl(self):
+        host = self.host
+        if host == "0.0.0.0":
+            host = socket.gethostname()
+        return "http://%s:%d/" % (host, self.port)
+
+    def start(self):
+        """
+        Starts serving in the background. Raises socket.error if the
+        address can't be bound.
+        """
+        self.__httpd = _ThreadingHTTPServer((self.host, self.port), StaticRequestHandler)
+        self.__httpd.root = self.root
+        self.__httpd.name = self.name
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, name="%s-server" % self.name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def isRunning(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def waitReady(self, timeout):
+        # The port is open once start() returns.
+        return self.isRunning()
+
+    def wait(self):
+        """
+        Blocks until the server stops.
+        """
+        while self.isRunning():
+            time.sleep(0.5)
+
+    def stop(self, timeout=5):
+        if not self.isRunning():
+            return
+        self.__httpd.shutdown()
+        self.__httpd.server_close()
+        self.__thread.join(timeout)
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Stopped the %s server at %s" % (self.name, self.getUrl()))
+
+
+def get_server(key):
+    """
+    Returns the running server registered under key, or None.
+    """
+    server = _servers.get(key)
+    if server is not None and not server.isRunning():
+        del _servers[key]
+        server = None
+    return server
+
+
+def register(key, server):
+    _servers[key] = server
+
+
+def stop_all():
+    for key in list(_servers):
+        _servers.pop(key).stop()
+
+
+def serve_until_interrupted():
+    """
+    Blocks while a registered server runs, and stops them all on Ctrl-C.
+    """
+    running = [s for s in _servers.values() if s.isRunning()]
+    if not running:
+        return
+    for server in running:
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Serving %s, hit Ctrl-C to stop" % server.getUrl())
+    try:
+        for server in running:
+            server.wait()
+    except KeyboardInterrupt:
+        pass
+    stop_all()
+
+
+atexit.register(serve_until_interrupted)
@@ -0,0 +1,110 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+The Eucalyptus services found in euca-describe-services-all output.
+
+ServiceStore indexes the services by type, zone, hostname and state as
+they are added, so a report section is a single lookup instead of a scan
+of every service.
+
+@version   :  1.0
+"""
+
+# The service types that belong to an availability zone, in the order
+# they are listed for a zone.
+ZONE_STYPES = ("cluster", "storage", "node")
+
+
+class Service(object):
+    __slots__ = ("hostname", "url", "arn", "stype", "zone", "state")
+
+    def __init__(self, hostname="", url="", arn="", stype="", zone="", state=""):
+        self.hostname = hostname
+        self.url = url
+        self.arn = arn
+        self.stype = stype
+        self.zone = zone
+        self.state = state
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Returns a Service for a parsers.ServiceRecord.
+        """
+        return cls(record.hostname, record.url, record.arn, record.stype, record.zone, record.state)
+
+    def state_label(self):
+        # Need to figure out highlighting of cells
+        if self.state != "ENABLED":
+            return "(red). %s" % self.state
+        return self.state
+
+    def no_name(self):
+        return (self.url, self.state_label(), self.arn, self.stype)
+
+    def values(self):
+        return (self.hostname, self.state_label(), self.url, self.arn, self.stype, self.zone)
+
+
+class ServiceStore(object):
+    """
+    The services of a cloud indexed by type, zone, hostname and state.
+    Every lookup returns the services in the order they were added.
+    """
+    def __init__(self):
+        self.__services = []
+        self.__top_level = []
+        self.__by_stype = {}
+        self.__by_zone_stype = {}
+        self.__by_hostname = {}
+        self.__by_state = {}
+
+    def add(self, service):
+        self.__services.append(service)
+        if service.stype not in ZONE_STYPES:
+            self.__top_level.append(service)
+        self.__by_stype.setdefault(service.stype, []).append(service)
+        self.__by_zone_stype.setdefault((service.zone, service.stype), []).append(service)
+        self.__by_hostname.setdefault(service.hostname, []).append(service)
+        self.__by_state.setdefault(service.state, []).append(service)
+
+    def __len__(self):
+        return len(self.__services)
+
+    def __iter__(self):
+        return iter(self.__services)
+
+    def getTopLevel(self):
+        """
+        Returns the cloud wide services, the ones not in ZONE_STYPES.
+        """
+        return self.__top_level
+
+    def getByType(self, stype):
+        return self.__by_stype.get(stype, [])
+
+    def getByZone(self, zone, stype):
+        return self.__by_zone_stype.get((zone, stype), [])
+
+    def getByHostname(self, hostname):
+        return self.__by_hostname.get(hostname, [])
+
+    def getByState(self, state):
+        return self.__by_state.get(state, [])
+
+    def getZones(self):
+        """
+        Returns the sorted availability zones that have a cluster.
+        """
+        return sorted(set([zone for zone, stype in self.__by_zone_stype if stype == "cluster"]))
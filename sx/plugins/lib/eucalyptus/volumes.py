@@ -0,0 +1,285 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+A column oriented store of the volumes in euca-describe-vols-v output.
+
+Each attribute of the volumes is kept in its own column. Sizes and
+creation times are parsed into integer arrays, and the few distinct
+zones, states and volume types are interned and stored as small integer
+codes, so a cloud with tens of thousands of volumes costs a handful of
+arrays instead of a tuple of strings per volume.
+
+The ATTACHMENT records of the same output are kept alongside, also by
+column, with hash indexes from volume and instance to the attachments
+built on first use.
+
+@version   :  1.0
+"""
+import time
+import calendar
+from array import array
+
+
+# The epoch of each hour seen by parse_timestamp(), the volumes of a
+# cloud are created over a few thousand distinct hours at most.
+_hour_epochs = {}
+
+
+def parse_timestamp(value):
+    """
+    Returns the UTC epoch of an ISO 8601 timestamp as written by the
+    euca2ools (2015-05-12T13:42:27.000Z), or -1 if it can't be parsed.
+    """
+    try:
+        hour = _hour_epochs.get(value[0:13])
+        if hour is None:
+            hour = calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), 0, 0, 0, 0, 0))
+            _hour_epochs[value[0:13]] = hour
+        return hour + int(value[14:16]) * 60 + int(value[17:19])
+    except (ValueError, IndexError):
+        return -1
+
+
+def format_timestamp(epoch):
+    if epoch < 0:
+        return ""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+class VolumeStore(object):
+    """
+    The volumes of a cloud, one column per attribute.
+    """
+    def __init__(self):
+        self.names = []
+        self.snapshots = []
+        self.sizes = array("l")
+        self.created = array("l")
+        self.zone_codes = array("H")
+        self.state_codes = array("H")
+        self.type_codes = array("H")
+        self.attach_volumes = []
+        self.attach_instances = []
+        self.attach_device_codes = array("H")
+        self.attach_status_codes = array("H")
+        self.attach_times = array("l")
+        self.__values = []
+        self.__codes = {}
+        # Derived indexes, built on first use.
+        self.__by_name = None
+        self.__attach_by_volume = None
+        self.__attach_by_instance = None
+
+    def __invalidate(self):
+        self.__by_name = None
+        self.__attach_by_volume = None
+        self.__attach_by_instance = None
+
+    def __intern(self, value):
+        code = self.__codes.get(value)
+        if code is None:
+            code = len(self.__values)
+            self.__codes[value] = code
+            self.__values.append(value)
+        return code
+
+    def getValue(self, code):
+        """
+        Returns the zone, state, type, device or attachment status string
+        of a code.
+        """
+        return self.__values[code]
+
+    def getCode(self, value):
+        """
+        Returns the code of a zone, state or type, or None if no volume
+        has it.
+        """
+        return self.__codes.get(value)
+
+    def add(self, fields):
+        """
+        Adds a volume from the fields of a VOLUME line (without the
+        leading 'VOLUME'): name, size, snapshot, zone, state, timestamp,
+        type.
+        """
+        self.load([("VOLUME", fields)])
+
+    def add_attachment(self, fields):
+        """
+        Adds an attachment from the fields of an ATTACHMENT line (without
+        the leading 'ATTACHMENT'): volume, instance, device, status,
+        timestamp.
+        """
+        self.load([("ATTACHMENT", fields)])
+
+    def load(self, records):
+        """
+        Adds the (record_type, fields) VOLUME and ATTACHMENT records of
+        parsers.iter_volume_records(). This is the bulk version of add()
+        and add_attachment(), with the columns bound to locals, for
+        dumps of hundreds of thousands of volumes.
+        """
+        names, sizes, snapshots, created = self.names, self.sizes, self.snapshots, self.created
+        zone_codes, state_codes, type_codes = self.zone_codes, self.state_codes, self.type_codes
+        attach_volumes, attach_instances = self.attach_volumes, self.attach_instances
+        attach_device_codes, attach_status_codes = self.attach_device_codes, self.attach_status_codes
+        attach_times = self.attach_times
+        codes = self.__codes
+        intern_value = self.__intern
+        for record_type, fields in records:
+            if record_type == "VOLUME":
+                if len(fields) < 7:
+                    fields = list(fields) + [""] * (7 - len(fields))
+                try:
+                    size = int(fields[1])
+                except ValueError:
+                    size = -1
+                names.append(fields[0])
+                sizes.append(size)
+                snapshots.append(fields[2] or "")
+                code = codes.get(fields[3])
+                zone_codes.append(code if code is not None else intern_value(fields[3]))
+                code = codes.get(fields[4])
+                state_codes.append(code if code is not None else intern_value(fields[4]))
+                created.append(parse_timestamp(fields[5]))
+                code = codes.get(fields[6])
+                type_codes.append(code if code is not None else intern_value(fields[6]))
+            elif record_type == "ATTACHMENT":
+                if len(fields) < 5:
+                    fields = list(fields) + [""] * (5 - len(fields))
+                attach_volumes.append(fields[0])
+                attach_instances.append(fields[1])
+                code = codes.get(fields[2])
+                attach_device_codes.append(code if code is not None else intern_value(fields[2]))
+                code = codes.get(fields[3])
+                attach_status_codes.append(code if code is not None else intern_value(fields[3]))
+                attach_times.append(parse_timestamp(fields[4]))
+        self.__invalidate()
+
+    def extend(self, other):
+        """
+        Appends the volumes of another store.
+        """
+        for i in xrange(len(other)):
+            self.names.append(other.names[i])
+            self.sizes.append(other.sizes[i])
+            self.snapshots.append(other.snapshots[i])
+            self.zone_codes.append(self.__intern(other.getValue(other.zone_codes[i])))
+            self.state_codes.append(self.__intern(other.getValue(other.state_codes[i])))
+            self.created.append(other.created[i])
+            self.type_codes.append(self.__intern(other.getValue(other.type_codes[i])))
+        for i in xrange(other.getAttachmentCount()):
+            self.attach_volumes.append(other.attach_volumes[i])
+            self.attach_instances.append(other.attach_instances[i])
+            self.attach_device_codes.append(self.__intern(other.getValue(other.attach_device_codes[i])))
+            self.attach_status_codes.append(self.__intern(other.getValue(other.attach_status_codes[i])))
+            self.attach_times.append(other.attach_times[i])
+        self.__invalidate()
+
+    def __len__(self):
+        return len(self.names)
+
+    def getZone(self, i):
+        return self.__values[self.zone_codes[i]]
+
+    def getState(self, i):
+        return self.__values[self.state_codes[i]]
+
+    def row(self, i):
+        """
+        Returns (name, size, snapshot, zone, state, created) of volume i
+        for display.
+        """
+        size = self.sizes[i]
+        return (self.names[i], size if size >= 0 else "", self.snapshots[i],
+                self.__values[self.zone_codes[i]], self.__values[self.state_codes[i]],
+                format_timestamp(self.created[i]))
+
+    def getStateCounts(self):
+        """
+        Returns a dict of state to number of volumes.
+        """
+        counts = {}
+        for code in self.state_codes:
+            counts[code] = counts.get(code, 0) + 1
+        return dict((self.__values[c], n) for c, n in counts.items())
+
+    def getGroups(self):
+        """
+        Returns a dict of (zone, state) to the array of the indexes of the
+        volumes in that zone and state, in store order.
+        """
+        groups = {}
+        for i in xrange(len(self.names)):
+            key = (self.zone_codes[i], self.state_codes[i])
+            indexes = groups.get(key)
+            if indexes is None:
+                indexes = groups[key] = array("l")
+            indexes.append(i)
+        return dict(((self.__values[z], self.__values[s]), idx) for (z, s), idx in groups.items())
+
+    def getVolumeIndex(self, name):
+        """
+        Returns the index of the volume called name, or None.
+        """
+        if self.__by_name is None:
+            self.__by_name = dict((n, i) for i, n in enumerate(self.names))
+        return self.__by_name.get(name)
+
+    def getAttachmentCount(self):
+        return len(self.attach_volumes)
+
+    def __build_attachment_indexes(self):
+        by_volume = {}
+        by_instance = {}
+        for i in xrange(len(self.attach_volumes)):
+            by_volume.setdefault(self.attach_volumes[i], []).append(i)
+            by_instance.setdefault(self.attach_instances[i], []).append(i)
+        self.__attach_by_volume = by_volume
+        self.__attach_by_instance = by_instance
+
+    def getAttachmentsByVolume(self, name):
+        """
+        Returns the indexes of the attachments of a volume.
+        """
+        if self.__attach_by_volume is None:
+            self.__build_attachment_indexes()
+        return self.__attach_by_volume.get(name, [])
+
+    def getAttachmentsByInstance(self, instance_id):
+        """
+        Returns the indexes of the attachments to an instance.
+        """
+        if self.__attach_by_instance is None:
+            self.__build_attachment_indexes()
+        return self.__attach_by_instance.get(instance_id, [])
+
+    def getAttachedInstances(self):
+        """
+        Returns the ids of the instances with at least one attachment.
+        """
+        if self.__attach_by_instance is None:
+            self.__build_attachment_indexes()
+        return self.__attach_by_instance.keys()
+
+    def attachment_row(self, a):
+        """
+        Returns (volume, size, device, status, attached) of attachment a
+        for display.
+        """
+        i = self.getVolumeIndex(self.attach_volumes[a])
+        size = self.sizes[i] if i is not None and self.sizes[i] >= 0 else ""
+        return (self.attach_volumes[a], size, self.__values[self.attach_device_codes[a]],
+                self.__values[self.attach_status_codes[a]], format_timestamp(self.attach_times[a]))
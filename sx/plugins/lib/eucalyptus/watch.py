@@ -0,0 +1,204 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Incremental analysis of a case as sosreports arrive in a drop directory.
+
+DropDirectory polls a directory for new sosreport archives and extracted
+report directories. An arrival is only picked up once its size has not
+changed for a whole poll interval, so uploads in progress are left
+alone, and archives are extracted sparsely with archive.extract().
+
+Watcher runs the plugins over the reports received so far. The cloud
+model only parses the new reports, so each plugin's setup() is cheap
+once the first reports are in, and only the plugins that read a file
+present in the new reports rewrite their pages before the site plugins
+(the ones without REPORT_PATHS, like Eucahugo) rebuild the site.
+
+@version   :  1.0
+"""
+import os
+import glob
+import time
+import logging
+
+import sx
+from sx.plugins.lib.eucalyptus import archive
+
+
+def _tree_state(path):
+    """
+    Returns (files, bytes, newest mtime) of a file or directory tree.
+    """
+    if not os.path.isdir(path):
+        st = os.stat(path)
+        return 1, st.st_size, st.st_mtime
+    files = 0
+    nbytes = 0
+    newest = 0
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            files += 1
+            nbytes += st.st_size
+            newest = max(newest, st.st_mtime)
+    return files, nbytes, newest
+
+
+def has_report_files(report_path, patterns):
+    """
+    Returns True if an extracted report has a file matching one of the
+    patterns, relative to the report root.
+    """
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(report_path, pattern)):
+            if os.path.isfile(path):
+                return True
+    return False
+
+
+class DropDirectory(object):
+    """
+    The reports arriving in a directory, as archives or extracted report
+    directories.
+    """
+    def __init__(self, drop_dir, case_dir, patterns):
+        """
+        @param drop_dir: The directory reports are uploaded to.
+        @type drop_dir: String
+        @param case_dir: The directory archives are extracted to.
+        @type case_dir: String
+        @param patterns: The report files extracted from the archives.
+        @type patterns: Array
+        """
+        self.drop_dir = drop_dir
+        self.case_dir = case_dir
+        self.patterns = patterns
+        # Entry name -> state at the previous poll
+        self.__pending = {}
+        # Entry name -> state it was picked up with
+        self.__done = {}
+
+    def poll(self):
+        """
+        Returns the paths of the extracted reports that arrived since the
+        last poll, in name order.
+        """
+        ready = []
+        for name in sorted(os.listdir(self.drop_dir)):
+            path = os.path.join(self.drop_dir, name)
+            if name.startswith(".") or os.path.realpath(path) == os.path.realpath(self.case_dir):
+                continue
+            is_archive = name.endswith(archive.ARCHIVE_SUFFIXES)
+            if not is_archive and not os.path.isdir(path):
+                continue
+            try:
+                state = _tree_state(path)
+            except OSError:
+                continue
+            if self.__done.get(name) == state:
+                continue
+            if self.__pending.get(name) != state:
+                # Not seen yet or still growing, wait for the next poll.
+                self.__pending[name] = state
+                continue
+            del self.__pending[name]
+            self.__done[name] = state
+            if not is_archive:
+                ready.append(path)
+                continue
+            dest_dir = os.path.join(self.case_dir, archive.report_name(name))
+            try:
+                archive.extract(path, dest_dir, self.patterns)
+            except (archive.ArchiveError, IOError, OSError), e:
+                logging.getLogger(sx.MAIN_LOGGER_NAME).warning("Unable to extract %s: %s" % (path, e))
+                continue
+            ready.append(dest_dir)
+        return ready
+
+
+class Watcher(object):
+    """
+    Runs plugins over a growing set of reports.
+    """
+    def __init__(self, plugins, make_report):
+        """
+        @param plugins: The plugins, in the order they are run.
+        @type plugins: Array
+        @param make_report: Returns the report object handed to the
+        plugins for the path of an extracted report, like
+        extracted.ExtractedReport.
+        @type make_report: Function
+        """
+        self.plugins = plugins
+        self.make_report = make_report
+        self.reports = []
+        self.runs = 0
+
+    def getAffectedPlugins(self, paths):
+        """
+        Returns the plugins that read a file of one of the reports, and the
+        site plugins, which declare no report files.
+        """
+        affected = []
+        for plugin in self.plugins:
+            patterns = getattr(plugin, "REPORT_PATHS", [])
+            if not patterns or [p for p in paths if has_report_files(p, patterns)]:
+                affected.append(plugin)
+        return affected
+
+    def add(self, paths):
+        """
+        Adds the reports at paths and runs the plugins. Every plugin runs
+        for the first reports, afterwards only the affected ones rewrite
+        their pages.
+
+        @return: The plugins whose pages were written.
+        @rtype: Array
+        """
+        known = set([r.getPathToExtractedReport() for r in self.reports])
+        paths = [p for p in paths if p not in known]
+        if not paths:
+            return []
+        self.reports.extend([self.make_report(p) for p in paths])
+        if self.runs == 0:
+            affected = list(self.plugins)
+        else:
+            affected = self.getAffectedPlugins(paths)
+        start = time.time()
+        # The model is shared, setup() only parses the new reports.
+        for plugin in self.plugins:
+            plugin.setup(self.reports)
+        for phase in ("execute", "report", "action"):
+            for plugin in affected:
+                getattr(plugin, phase)()
+        self.runs += 1
+        logging.getLogger(sx.MAIN_LOGGER_NAME).status("Added %d reports (%d in total), updated %s in %.2fs"
+                                                      % (len(paths), len(self.reports),
+                                                         ", ".join([p.getName() for p in affected]),
+                                                         time.time() - start))
+        return affected
+
+    def run(self, drop, interval=2.0):
+        """
+        Polls a DropDirectory and adds its reports until interrupted.
+        """
+        self.add(drop.poll())
+        while True:
+            time.sleep(interval)
+            paths = drop.poll()
+            if paths:
+                self.add(paths)
@@ -0,0 +1,63 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Makes sx.plugins.lib.eucalyptus importable by the tests, from the
+installed sxconsole or, without it, on the benchmark's stand-in for the
+sx package. Import it before the library.
+
+$ python -m unittest discover -s tests
+
+@version   :  1.0
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools"))
+
+import sxenv
+
+try:
+    sxenv.require_sx()
+except ImportError:
+    import benchmark
+    benchmark.install_sx_stub()
+
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    A test case with a temporary directory, removed after each test.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix="eucasx-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, True)
+
+    def write(self, relpath, data):
+        """
+        Writes a file below the temporary directory and returns its path.
+        """
+        path = os.path.join(self.tmp_dir, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fout = open(path, "wb")
+        try:
+            fout.write(data)
+        finally:
+            fout.close()
+        return path
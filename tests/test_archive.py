@@ -0,0 +1,144 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Tests of the sparse extraction of sosreport archives, with archives
+crafted to write outside of the extraction directory.
+
+@version   :  1.0
+"""
+import os
+import tarfile
+import unittest
+from StringIO import StringIO
+
+import support
+
+from sx.plugins.lib.eucalyptus import archive
+
+TOP = "sosreport-clc-20160314152000"
+
+
+class ArchiveTestCase(support.TempDirTestCase):
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.dest = os.path.join(self.tmp_dir, "out", TOP)
+
+    def __archive(self, members, name=TOP + ".tar.gz"):
+        """
+        Writes an archive of (name, data) members, data being a string
+        for a file or ("link", target) for a symlink, and returns its
+        path.
+        """
+        path = os.path.join(self.tmp_dir, name)
+        tar = tarfile.open(path, "w:gz")
+        try:
+            for member_name, data in members:
+                info = tarfile.TarInfo(member_name)
+                if isinstance(data, tuple):
+                    info.type = tarfile.SYMTYPE
+                    info.linkname = data[1]
+                    tar.addfile(info)
+                else:
+                    info.size = len(data)
+                    tar.addfile(info, StringIO(data))
+        finally:
+            tar.close()
+        return path
+
+    def __files_outside_dest(self):
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.tmp_dir):
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                if not (path + os.sep).startswith(self.dest + os.sep) and \
+                        not self.dest.startswith(path + os.sep) and not path.endswith(".tar.gz"):
+                    found.append(os.path.relpath(path, self.tmp_dir))
+        return found
+
+    def test_report_name(self):
+        self.assertEqual(archive.report_name("/a/sosreport-nc1-20150512135434-4c57.tar.xz"),
+                         "sosreport-nc1-20150512135434-4c57")
+        self.assertEqual(archive.report_name("sosreport-nc1.tgz"), "sosreport-nc1")
+        self.assertEqual(archive.report_name("sosreport-nc1.tar"), "sosreport-nc1")
+        self.assertEqual(archive.report_name("sosreport-nc1.zip"), "sosreport-nc1.zip")
+
+    def test_extracts_wanted_and_identity_paths(self):
+        path = self.__archive([
+            (TOP + "/date", "Mon Mar 14 15:20:00 UTC 2016\n"),
+            (TOP + "/sos_commands/general/hostname", "clc.example.com\n"),
+            (TOP + "/hostname", ("link", "sos_commands/general/hostname")),
+            (TOP + "/var/log/eucalyptus/cloud-output.log", "2016-03-14 15:20:00 INFO up\n"),
+            (TOP + "/var/log/eucalyptus/cloud-debug.log", "skipped\n"),
+            (TOP + "/etc/passwd", "skipped\n"),
+        ])
+        extracted = archive.extract(path, self.dest, ["var/log/eucalyptus/*-output.log"])
+        self.assertEqual(extracted, ["date", "hostname", "sos_commands/general/hostname",
+                                     "var/log/eucalyptus/cloud-output.log"])
+        self.assertTrue(os.path.islink(os.path.join(self.dest, "hostname")))
+        fin = open(os.path.join(self.dest, "hostname"))
+        try:
+            self.assertEqual(fin.read(), "clc.example.com\n")
+        finally:
+            fin.close()
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "var/log/eucalyptus/cloud-debug.log")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "etc")))
+
+    def test_link_to_earlier_member(self):
+        # The target is passed before the link in the stream.
+        path = self.__archive([
+            (TOP + "/sos_commands/general/hostname", "nc1\n"),
+            (TOP + "/hostname", ("link", "sos_commands/general/hostname")),
+        ])
+        self.assertEqual(archive.extract(path, self.dest, []), ["hostname", "sos_commands/general/hostname"])
+
+    def test_member_path_traversal(self):
+        path = self.__archive([
+            (TOP + "/../../evil", "x"),
+            (TOP + "/var/../../../evil2", "x"),
+            ("/abs/evil3", "x"),
+            ("../evil4", "x"),
+            ("hostname", "x"),
+            (TOP + "/var/log/ok.log", "x"),
+        ])
+        self.assertEqual(archive.extract(path, self.dest, ["*"]), ["var/log/ok.log"])
+        self.assertEqual(self.__files_outside_dest(), [])
+
+    def test_escaping_symlinks_not_created(self):
+        path = self.__archive([
+            (TOP + "/var/log/passwd", ("link", "../../../etc/passwd")),
+            (TOP + "/var/log/shadow", ("link", "/etc/shadow")),
+            (TOP + "/var/log/up", ("link", "../../..")),
+            (TOP + "/hostname", ("link", "../hostname")),
+            (TOP + "/var/log/ok.log", "x"),
+        ])
+        self.assertEqual(archive.extract(path, self.dest, ["var/log/*"]), ["var/log/ok.log"])
+        for name in ("var/log/passwd", "var/log/shadow", "var/log/up", "hostname"):
+            self.assertFalse(os.path.lexists(os.path.join(self.dest, name)), name)
+        self.assertEqual(self.__files_outside_dest(), [])
+
+    def test_link_target_stays_in_report(self):
+        self.assertEqual(archive._link_target("var/log/a", "../b"), "var/b")
+        self.assertEqual(archive._link_target("hostname", "sos_commands/general/hostname"),
+                         "sos_commands/general/hostname")
+        self.assertEqual(archive._link_target("var/a", "../../b"), None)
+        self.assertEqual(archive._link_target("var/a", ".."), None)
+        self.assertEqual(archive._link_target("var/a", "/etc/b"), None)
+
+    def test_not_an_archive(self):
+        path = self.write(TOP + ".tar.gz", "not an archive")
+        self.assertRaises(archive.ArchiveError, archive.extract, path, self.dest, ["*"])
+
+
+if __name__ == "__main__":
+    unittest.main()
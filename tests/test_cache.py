@@ -0,0 +1,186 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Tests of the on-disk report cache: reuse, invalidation and eviction.
+
+@version   :  1.0
+"""
+import os
+import time
+import cPickle
+import unittest
+
+import support
+
+from sx.plugins.lib.eucalyptus import cache
+from sx.plugins.lib.eucalyptus.parallel import ReportInfo
+
+# Parser name -> number of calls
+calls = {}
+# The key of parse_keyed's results
+current_key = ["a"]
+
+
+def _count(name):
+    calls[name] = calls.get(name, 0) + 1
+
+
+@cache.parser(1, ["a.txt"])
+def parse_a(info):
+    _count("parse_a")
+    fin = open(os.path.join(info.path, "a.txt"), "r")
+    try:
+        return fin.read()
+    finally:
+        fin.close()
+
+
+@cache.parser(1, ["logs/*.log"])
+def parse_logs(info):
+    _count("parse_logs")
+    return sorted(os.listdir(os.path.join(info.path, "logs")))
+
+
+@cache.parser(1, ["a.txt"], key=lambda: current_key[0])
+def parse_keyed(info):
+    _count("parse_keyed")
+    return current_key[0]
+
+
+class _Exploit(object):
+    # Unpickling this writes a file, as a crafted cache entry could.
+    def __reduce__(self):
+        return (open, (os.path.join(os.environ["EUCASX_TEST_MARKER_DIR"], "pwned"), "w"))
+
+
+class CacheTestCase(support.TempDirTestCase):
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.__saved = (cache.CACHE_ROOT, cache.REGISTRY_PATH)
+        cache.CACHE_ROOT = os.path.join(self.tmp_dir, "home", "eucasx-cache")
+        cache.REGISTRY_PATH = os.path.join(self.tmp_dir, "home", "eucasx-cache.json")
+        calls.clear()
+        current_key[0] = "a"
+        self.report = os.path.join(self.tmp_dir, "report")
+        self.info = ReportInfo("host", None, self.report)
+        self.write("report/a.txt", "first")
+
+    def tearDown(self):
+        cache.CACHE_ROOT, cache.REGISTRY_PATH = self.__saved
+        support.TempDirTestCase.tearDown(self)
+
+    def test_reuses_entry(self):
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "first")
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "first")
+        self.assertEqual(calls["parse_a"], 1)
+
+    def test_cache_outside_report(self):
+        cache.load_or_parse(parse_a, self.info)
+        cache_dir = cache.get_cache_dir(self.report)
+        self.assertTrue(cache_dir.startswith(cache.CACHE_ROOT + os.sep))
+        self.assertTrue(os.path.isfile(os.path.join(cache_dir, "parse_a.pickle")))
+        self.assertEqual(os.listdir(self.report), ["a.txt"])
+        self.assertEqual(os.stat(cache_dir).st_mode & 0777, 0700)
+
+    def test_ignores_pickles_shipped_in_report(self):
+        os.environ["EUCASX_TEST_MARKER_DIR"] = self.tmp_dir
+        try:
+            for name in ("parse_a", "parse_logs"):
+                self.write("report/.eucasx-cache/%s.pickle" % name, cPickle.dumps({"data": _Exploit()}))
+            self.assertEqual(cache.load_or_parse(parse_a, self.info), "first")
+        finally:
+            del os.environ["EUCASX_TEST_MARKER_DIR"]
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "pwned")))
+        self.assertEqual(calls["parse_a"], 1)
+
+    def test_invalid_when_source_changes(self):
+        cache.load_or_parse(parse_a, self.info)
+        self.write("report/a.txt", "second, longer")
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "second, longer")
+        self.assertEqual(calls["parse_a"], 2)
+
+    def test_invalid_when_same_size_content_changes(self):
+        cache.load_or_parse(parse_a, self.info)
+        path = self.write("report/a.txt", "fixed")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "fixed")
+        self.assertEqual(calls["parse_a"], 2)
+
+    def test_valid_when_only_mtime_changes(self):
+        cache.load_or_parse(parse_a, self.info)
+        path = os.path.join(self.report, "a.txt")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "first")
+        self.assertEqual(calls["parse_a"], 1)
+
+    def test_invalid_when_source_removed(self):
+        self.write("report/logs/one.log", "1")
+        cache.load_or_parse(parse_logs, self.info)
+        os.remove(os.path.join(self.report, "logs", "one.log"))
+        self.assertEqual(cache.load_or_parse(parse_logs, self.info), [])
+        self.assertEqual(calls["parse_logs"], 2)
+
+    def test_invalid_when_version_changes(self):
+        cache.load_or_parse(parse_a, self.info)
+        parse_a.cache_version = 2
+        try:
+            cache.load_or_parse(parse_a, self.info)
+        finally:
+            parse_a.cache_version = 1
+        self.assertEqual(calls["parse_a"], 2)
+
+    def test_invalid_when_key_changes(self):
+        self.assertEqual(cache.load_or_parse(parse_keyed, self.info), "a")
+        current_key[0] = "b"
+        self.assertEqual(cache.load_or_parse(parse_keyed, self.info), "b")
+        self.assertEqual(calls["parse_keyed"], 2)
+
+    def test_invalid_when_glob_matches_change(self):
+        self.write("report/logs/one.log", "1")
+        self.assertEqual(cache.load_or_parse(parse_logs, self.info), ["one.log"])
+        self.assertEqual(cache.load_or_parse(parse_logs, self.info), ["one.log"])
+        self.write("report/logs/two.log", "2")
+        self.assertEqual(cache.load_or_parse(parse_logs, self.info), ["one.log", "two.log"])
+        self.assertEqual(calls["parse_logs"], 2)
+
+    def test_corrupt_entry_is_reparsed(self):
+        cache.load_or_parse(parse_a, self.info)
+        fout = open(os.path.join(cache.get_cache_dir(self.report), "parse_a.pickle"), "wb")
+        fout.write("not a pickle")
+        fout.close()
+        self.assertEqual(cache.load_or_parse(parse_a, self.info), "first")
+        self.assertEqual(calls["parse_a"], 2)
+
+    def test_enforce_limit_removes_least_recently_used(self):
+        roots = []
+        for n in range(3):
+            root = os.path.join(self.tmp_dir, "case%d" % n)
+            self.write("case%d/a.txt" % n, "x" * 1000)
+            cache.load_or_parse(parse_a, ReportInfo("host%d" % n, None, root))
+            self.write(os.path.join(cache.get_cache_dir(root), "padding"), "x" * 10000)
+            roots.append(root)
+            cache.enforce_limit([root], 10 ** 9)
+            time.sleep(0.01)
+        # The least recently used caches go first, except the ones in use,
+        # until the total fits.
+        cache.enforce_limit([roots[1]], 15000)
+        self.assertFalse(os.path.isdir(cache.get_cache_dir(roots[0])))
+        self.assertTrue(os.path.isdir(cache.get_cache_dir(roots[1])))
+        self.assertFalse(os.path.isdir(cache.get_cache_dir(roots[2])))
+        cache.enforce_limit([], 0)
+        self.assertFalse(os.path.isdir(cache.get_cache_dir(roots[1])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Tests of the time windows extracted from the logs, compared with a
+plain scan of the lines.
+
+@version   :  1.0
+"""
+import time
+import random
+import calendar
+import unittest
+
+import support
+
+from sx.plugins.lib.eucalyptus import logindex
+from sx.plugins.lib.eucalyptus import logscan
+
+BASE_EPOCH = calendar.timegm((2016, 3, 14, 15, 0, 0, 0, 0, 0))
+
+
+def iso_line(epoch, text):
+    return "%s,%03d %s" % (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch)), epoch % 1000, text)
+
+
+def c_line(epoch, text):
+    return "[%s] %s" % (time.strftime("%a %b %d %H:%M:%S %Y", time.gmtime(epoch)), text)
+
+
+def naive_window(lines, start, end):
+    """
+    Returns the lines from the first one stamped at or after start until
+    the first one stamped after end, the lines without a timestamp going
+    with the last line that had one.
+    """
+    window = []
+    stamp = None
+    for line in lines:
+        stamp = logscan.get_timestamp(line) or stamp
+        if stamp is not None and start <= stamp <= end:
+            window.append(line)
+        elif stamp is not None and stamp > end:
+            break
+    return window
+
+
+class ParseWindowTestCase(unittest.TestCase):
+    def test_minutes(self):
+        self.assertEqual(logindex.parse_window("2016-03-14T15:20/15:35"),
+                         ("2016-03-14 15:20:00", "2016-03-14 15:35:59"))
+
+    def test_seconds_and_end_day(self):
+        self.assertEqual(logindex.parse_window(" 2016-03-14 23:50:10/2016-03-15T00:10:05 "),
+                         ("2016-03-14 23:50:10", "2016-03-15 00:10:05"))
+
+    def test_single_minute(self):
+        self.assertEqual(logindex.parse_window("2016-03-14T15:20/15:20"),
+                         ("2016-03-14 15:20:00", "2016-03-14 15:20:59"))
+
+    def test_invalid(self):
+        for value in ("", "2016-03-14T15:20", "15:20/15:35", "2016-03-14T15:20-15:35",
+                      "2016-3-14T15:20/15:35", "2016-03-14T15:20/15:35/15:40", "yesterday/today"):
+            self.assertRaises(ValueError, logindex.parse_window, value)
+
+    def test_ends_before_start(self):
+        self.assertRaises(ValueError, logindex.parse_window, "2016-03-14T15:35/15:20")
+        self.assertRaises(ValueError, logindex.parse_window, "2016-03-15T00:10/2016-03-14T23:50")
+
+
+class ExtractWindowTestCase(support.TempDirTestCase):
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        rng = random.Random(1)
+        self.lines = ["no timestamp before the first line"]
+        epoch = BASE_EPOCH
+        for n in range(40000):
+            # Several lines per second and gaps of a few minutes.
+            epoch += rng.choice((0, 0, 0, 1, 2, 5)) + (rng.random() < 0.001) * 300
+            self.lines.append(iso_line(epoch, "INFO line %d %s" % (n, "x" * rng.randint(0, 120))))
+            if rng.random() < 0.05:
+                self.lines.append("java.lang.IllegalStateException: trace of line %d" % n)
+                self.lines.append("\tat com.eucalyptus.Foo.bar(Foo.java:%d)" % n)
+        self.path = self.write("cloud-output.log", "\n".join(self.lines) + "\n")
+        self.index = self.__index(self.path)
+        self.last_epoch = epoch
+
+    def __index(self, path):
+        index = []
+        logscan.scan_file(path, {}, {}, path, index)
+        return index
+
+    def __stamp(self, epoch):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+    def test_index_is_sparse_and_sorted(self):
+        self.assertTrue(len(self.index) > 10)
+        self.assertEqual(self.index, sorted(self.index))
+        for (_, a), (_, b) in zip(self.index, self.index[1:]):
+            self.assertTrue(b - a >= logscan.INDEX_STEP)
+
+    def test_random_windows_match_scan(self):
+        rng = random.Random(2)
+        span = self.last_epoch - BASE_EPOCH
+        for _ in range(60):
+            first = BASE_EPOCH - 60 + rng.randint(0, span + 120)
+            last = first + rng.choice((0, 1, 30, 120, 900))
+            start, end = self.__stamp(first), self.__stamp(last)
+            expected = naive_window(self.lines, start, end)
+            lines, truncated = logindex.extract_window(self.path, self.index, start, end, len(self.lines))
+            self.assertEqual(lines, expected, "%s/%s" % (start, end))
+            self.assertFalse(truncated)
+            # The index only narrows the search down.
+            self.assertEqual(logindex.extract_window(self.path, [], start, end, len(self.lines))[0], expected)
+
+    def test_window_outside_log(self):
+        self.assertEqual(logindex.extract_window(self.path, self.index, "2016-03-13 00:00:00", "2016-03-13 23:59:59"),
+                         ([], False))
+        self.assertEqual(logindex.extract_window(self.path, self.index, "2016-03-20 00:00:00", "2016-03-20 23:59:59"),
+                         ([], False))
+
+    def test_whole_log(self):
+        lines, truncated = logindex.extract_window(self.path, self.index, "2016-01-01 00:00:00",
+                                                   "2016-12-31 23:59:59", len(self.lines))
+        self.assertEqual(lines, self.lines[1:])
+        self.assertFalse(truncated)
+
+    def test_max_lines(self):
+        start, end = self.__stamp(BASE_EPOCH), self.__stamp(self.last_epoch)
+        lines, truncated = logindex.extract_window(self.path, self.index, start, end, 100)
+        self.assertEqual(lines, naive_window(self.lines, start, end)[:100])
+        self.assertTrue(truncated)
+
+    def test_c_component_log(self):
+        lines = [c_line(BASE_EPOCH + n // 3, "[EUCAINFO ] line %d" % n) for n in range(20000)]
+        path = self.write("nc.log", "\n".join(lines))
+        index = self.__index(path)
+        start, end = self.__stamp(BASE_EPOCH + 1000), self.__stamp(BASE_EPOCH + 1500)
+        self.assertEqual(logindex.extract_window(path, index, start, end, len(lines)),
+                         (naive_window(lines, start, end), False))
+
+    def test_empty_log(self):
+        path = self.write("empty.log", "")
+        self.assertEqual(self.__index(path), [])
+        self.assertEqual(logindex.extract_window(path, [], "2016-03-14 15:00:00", "2016-03-14 16:00:00"), ([], False))
+
+
+if __name__ == "__main__":
+    unittest.main()
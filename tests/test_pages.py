@@ -0,0 +1,74 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Tests of the front matter values written for names taken from the
+reports, read back by the builtin renderer.
+
+@version   :  1.0
+"""
+import os
+import unittest
+
+import support
+
+from sx.plugins.lib.eucalyptus import pages
+from sx.plugins.lib.eucalyptus import render
+
+
+class _Plugin(object):
+    """
+    The part of a plugin that pages.Page writes through.
+    """
+    def __init__(self, report_dir):
+        self.report_dir = report_dir
+
+    def getName(self):
+        return "TestPages"
+
+    def write(self, filename, data):
+        fout = open(os.path.join(self.report_dir, filename), "a")
+        try:
+            fout.write(data + "\n")
+        finally:
+            fout.close()
+
+
+class TomlStringTestCase(support.TempDirTestCase):
+    def test_escapes(self):
+        self.assertEqual(pages.toml_string('Volumes in one, available'), '"Volumes in one, available"')
+        self.assertEqual(pages.toml_string('a "zone"'), '"a \\"zone\\""')
+        self.assertEqual(pages.toml_string('C:\\zone\\'), '"C:\\\\zone\\\\"')
+        self.assertEqual(pages.toml_string("two\nlines\t\x01"), '"two\\nlines\\t\\u0001"')
+        self.assertEqual(pages.toml_string(3), '"3"')
+
+    def test_round_trip(self):
+        plugin = _Plugin(self.tmp_dir)
+        for n, value in enumerate(['plain', 'a "zone"', 'back\\slash', 'end\\', '\\"', '\\\\"quoted\\\\"',
+                                   "new\nline", "tab\tand\x01control", "[not a table]", "a = b # c"]):
+            page = pages.Page(plugin, "page%d.html" % n)
+            page.front_matter("title=%s" % pages.toml_string(value), "weight=0")
+            page.write("body")
+            page.close()
+            fin = open(os.path.join(self.tmp_dir, "page%d.html" % n), "r")
+            try:
+                front_matter, content = render.split_front_matter(fin.read())
+            finally:
+                fin.close()
+            self.assertEqual(front_matter["title"], value)
+            self.assertEqual(front_matter["weight"], 0)
+            self.assertEqual(content.strip(), "body")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Times the setup(), execute(), report() and action() phases of the
+Eucalyptus plugins on a case of extracted sosreports, like the ones
+written by gensosreport.py.
+
+sxconsole is not needed: the plugins run on a minimal stand-in for
+sx.plugins.PluginBase and the sx logger, so only the plugins' own work is
+measured. The phases run in the order sxconsole runs them, every plugin's
+setup() first, and the peak RSS of the process is recorded after each
+phase. The results can be saved as JSON and compared with a previous run.
+
+$ python tools/gensosreport.py -o /var/tmp/bigcase --ncs 200 --volumes 100000
+$ python tools/benchmark.py /var/tmp/bigcase --json before.json
+$ python tools/benchmark.py /var/tmp/bigcase --compare before.json
+
+@version   :  1.0
+"""
+import os
+import imp
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import optparse
+import resource
+import tempfile
+
+from sxenv import PLUGINS, PLUGINS_DIR, ROOT_DIR, STATUS, load_plugins
+
+PHASES = ["setup", "execute", "report", "action"]
+
+
+class PluginBase(object):
+    """
+    The part of sx.plugins.PluginBase the Eucalyptus plugins use.
+    """
+    def __init__(self, name, description, reportTypes, isEnabled, isEnabledByDefault, options,
+                 pathToPluginReportDir=""):
+        self.__name = name
+        self.__options = dict([(key, None) for key in options])
+        self.__report_dir = pathToPluginReportDir
+
+    def getName(self):
+        return self.__name
+
+    def getOptionValue(self, key):
+        return self.__options.get(key)
+
+    def setOptionValue(self, key, value):
+        self.__options[key] = value
+
+    def getPathToPluginReportDir(self):
+        return self.__report_dir
+
+    def isValidReportType(self, report):
+        return True
+
+    def clean(self):
+        if os.path.exists(self.__report_dir):
+            shutil.rmtree(self.__report_dir)
+
+    def write(self, filename, data, appendToFile=True):
+        if not os.path.exists(self.__report_dir):
+            os.makedirs(self.__report_dir)
+        fout = open(os.path.join(self.__report_dir, filename), "a" if appendToFile else "w")
+        try:
+            fout.write(data)
+            fout.write("\n")
+        finally:
+            fout.close()
+
+
+def install_sx_stub():
+    """
+    Registers stand-in sx, sx.plugins, sx.plugins.lib and sx.logwriter
+    modules, with the package paths pointing at this tree so that
+    sx.plugins.lib.eucalyptus is the library being measured.
+    """
+    def status(self, msg, *args, **kwargs):
+        self.log(STATUS, msg, *args, **kwargs)
+    logging.addLevelName(STATUS, "STATUS")
+    logging.Logger.status = status
+
+    sx = imp.new_module("sx")
+    sx.__path__ = []
+    sx.MAIN_LOGGER_NAME = "sxconsole"
+    plugins = imp.new_module("sx.plugins")
+    plugins.__path__ = [PLUGINS_DIR]
+    plugins.PluginBase = PluginBase
+    lib = imp.new_module("sx.plugins.lib")
+    lib.__path__ = [os.path.join(PLUGINS_DIR, "lib")]
+    logwriter = imp.new_module("sx.logwriter")
+    logwriter.LogWriter = object
+    sx.plugins = plugins
+    sx.logwriter = logwriter
+    plugins.lib = lib
+    sys.modules.update({"sx": sx, "sx.plugins": plugins, "sx.plugins.lib": lib, "sx.logwriter": logwriter})
+
+
+def get_max_rss_kb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(case_dir, output_dir, names, options):
+    """
+    Returns a list of result dicts, one per plugin and phase.
+    """
+    from sx.plugins.lib.eucalyptus.extracted import ExtractedReport
+    reports = [ExtractedReport(path) for path in sorted(glob.glob(os.path.join(case_dir, "*"))) if os.path.isdir(path)]
+    plugins = load_plugins(names, output_dir, options)
+    results = []
+    for phase in PHASES:
+        for name, plugin in plugins:
+            start = time.time()
+            if phase == "setup":
+                plugin.setup(reports)
+            else:
+                getattr(plugin, phase)()
+            results.append({"plugin": name, "phase": phase,
+                            "seconds": round(time.time() - start, 4),
+                            "max_rss_kb": get_max_rss_kb()})
+    return len(reports), results
+
+
+def format_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        for result in baseline.get("results", []):
+            previous[(result["plugin"], result["phase"])] = result
+    lines = ["%-14s %-8s %10s %14s %s" % ("Plugin", "Phase", "Seconds", "Peak RSS (MB)",
+                                         "Change" if baseline is not None else "")]
+    for result in results:
+        change = ""
+        old = previous.get((result["plugin"], result["phase"]))
+        if old is not None and old["seconds"] > 0:
+            change = "%+.0f%%" % ((result["seconds"] - old["seconds"]) * 100.0 / old["seconds"])
+        lines.append("%-14s %-8s %10.3f %14.1f %s" % (result["plugin"], result["phase"], result["seconds"],
+                                                    result["max_rss_kb"] / 1024.0, change))
+    total = sum([r["seconds"] for r in results])
+    lines.append("%-14s %-8s %10.3f" % ("total", "", total))
+    return "\n".join(lines)
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] CASE_DIR")
+    parser.add_option("-p", "--plugins", default=",".join(PLUGINS),
+                      help="Comma separated plugins to run. [%s]" % ",".join(PLUGINS))
+    parser.add_option("-O", "--option", action="append", default=[], metavar="[PLUGIN.]KEY=VALUE",
+                      help="Plugin option, for every plugin unless prefixed by a plugin name.")
+    parser.add_option("-o", "--output", help="Directory the reports are written to. [a temporary directory]")
+    parser.add_option("--json", help="Write the results to this JSON file.")
+    parser.add_option("--compare", help="Show the change from the results in this JSON file.")
+    parser.add_option("-v", "--verbose", action="store_true", default=False, help="Show the plugins' logging.")
+    opts, args = parser.parse_args()
+    if len(args) != 1 or not os.path.isdir(args[0]):
+        parser.error("A case directory of extracted reports is required.")
+
+    # Measure the parsing by default, not the result cache, and render the
+    # site in-process so Hugo doesn't need to be installed.
+    options = [("cache", "off"), ("eucahugo.renderer", "builtin"), ("eucahugo.serve", "off"),
+               ("eucahugo.skelfiles", os.path.join(ROOT_DIR, "hugo"))]
+    for option in opts.option:
+        if "=" not in option:
+            parser.error("Invalid option %s, expected KEY=VALUE." % option)
+        options.append(tuple(option.split("=", 1)))
+
+    logging.basicConfig(level=logging.INFO if opts.verbose else logging.WARNING,
+                        format="%(levelname)-9s %(message)s")
+    install_sx_stub()
+    output_dir = opts.output or tempfile.mkdtemp(prefix="eucasx-benchmark-")
+    try:
+        report_count, results = run(os.path.abspath(args[0]), output_dir,
+                                    [n.strip() for n in opts.plugins.split(",") if n.strip()], options)
+    finally:
+        if not opts.output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    baseline = None
+    if opts.compare:
+        fin = open(opts.compare, "r")
+        try:
+            baseline = json.load(fin)
+        finally:
+            fin.close()
+    print "%d reports in %s" % (report_count, args[0])
+    print format_results(results, baseline)
+    if opts.json:
+        fout = open(opts.json, "w")
+        try:
+            json.dump({"case": os.path.abspath(args[0]), "reports": report_count, "results": results},
+                      fout, indent=1, sort_keys=True)
+        finally:
+            fout.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Generates a case of synthetic extracted sosreports for the Eucalyptus
+plugins, one directory per host, to measure the plugins at scale.
+
+The CLC report gets the frontend command output (services, properties,
+volumes, instances and nodes), every host gets hostname, etc/hosts,
+ifconfig, date, etc/eucalyptus/eucalyptus.conf and the log of its Eucalyptus component
+with a few errors in it. The output is deterministic for a given seed.
+
+$ python tools/gensosreport.py -o /var/tmp/bigcase --zones 4 --ncs 200 --volumes 100000
+
+@version   :  1.0
+"""
+import os
+import sys
+import json
+import time
+import random
+import optparse
+
+DEFAULT_CONF = [("EUCA_USER", '"eucalyptus"'),
+                ("LOGLEVEL", '"INFO"'),
+                ("NC_PORT", '"8775"'),
+                ("CC_PORT", '"8774"'),
+                ("SCHEDPOLICY", '"ROUNDROBIN"'),
+                ("HYPERVISOR", '"kvm"'),
+                ("MAX_CORES", '"8"'),
+                ("NC_WORK_SIZE", "50000"),
+                ("NC_CACHE_SIZE", "50000"),
+                ("INSTANCE_PATH", '"/var/lib/eucalyptus/instances"'),
+                ("VNET_MODE", '"EDGE"'),
+                ("VNET_PRIVINTERFACE", '"br0"'),
+                ("VNET_PUBINTERFACE", '"br0"'),
+                ("VNET_BRIDGE", '"br0"')]
+DRIFT_CONF = [("LOGLEVEL", '"DEBUG"'), ("MAX_CORES", '"16"'), ("HYPERVISOR", '"qemu"'),
+              ("NC_CACHE_SIZE", "100000")]
+VOLUME_STATES = ["available", "available", "in-use", "in-use", "in-use", "deleting", "error"]
+BASE_EPOCH = 1431463287
+# Log file of each role, and the errors sprinkled in it.
+LOG_FILES = {"clc": "cloud-output.log", "sc": "cloud-output.log", "cc": "cc.log", "nc": "nc.log"}
+JAVA_ERRORS = ["ERROR [AsyncRequests:pool-12] com.eucalyptus.util.EucalyptusCloudException: Failed to attach volume vol-%08x",
+               "ERROR [Databases:pool-3] org.postgresql.util.PSQLException: FATAL: sorry, too many clients already (%d)",
+               "WARN  [ServiceTransitions:pool-7] storage service is NOTREADY: %08x",
+               "ERROR [AsyncRequests:pool-12] java.net.SocketTimeoutException: Read timed out after %d ms"]
+C_ERRORS = ["[EUCAERROR ] doRunInstance(): failed to start instance i-%08x",
+            "[EUCAERROR ] libvirt: internal error: process exited while connecting to monitor (%d)",
+            "[EUCAWARN  ] Connection refused by 10.0.0.1:8773 (%d)",
+            "[EUCAERROR ] write failed: No space left on device (%d)"]
+
+
+class Host(object):
+    def __init__(self, name, ip, role, zone=""):
+        self.name = name
+        self.ip = ip
+        self.role = role
+        self.zone = zone
+
+
+def iso_time(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(epoch))
+
+
+def date_output(epoch):
+    # Written as PDT, like a cloud on the US west coast.
+    return time.strftime("%a %b %d %H:%M:%S PDT %Y", time.gmtime(epoch - 7 * 3600))
+
+
+def log_lines(options, rng, host):
+    """
+    Yields the lines of a host's log, one every 5 seconds up to
+    BASE_EPOCH, and an error in options.logerrors of them.
+    """
+    java = LOG_FILES[host.role] == "cloud-output.log"
+    start = BASE_EPOCH - options.loglines * 5
+    for n in range(options.loglines):
+        epoch = start + n * 5
+        error = rng.random() < options.logerrors
+        if java:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+            if error:
+                yield "%s %s" % (stamp, rng.choice(JAVA_ERRORS) % rng.randint(0, 0xffff))
+                yield "\tat com.eucalyptus.util.async.AsyncRequests.sendSync(AsyncRequests.java:%d)" % rng.randint(1, 300)
+            else:
+                yield "%s INFO  [Bootstrap:pool-1] request %d served" % (stamp, n)
+        else:
+            stamp = time.strftime("[%a %b %d %H:%M:%S %Y]", time.gmtime(epoch))
+            if error:
+                yield "%s[%06d]%s" % (stamp, 4000 + n % 7, rng.choice(C_ERRORS) % rng.randint(0, 0xffff))
+            else:
+                yield "%s[%06d][EUCAINFO  ] polled resources, %d cores free" % (stamp, 4000 + n % 7, n % 8)
+
+
+def write_file(root, relpath, lines):
+    path = os.path.join(root, relpath)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    fout = open(path, "w")
+    try:
+        for line in lines:
+            fout.write(line)
+            fout.write("\n")
+    finally:
+        fout.close()
+
+
+def make_hosts(options):
+    zones = ["zone-%d" % (z + 1) for z in range(options.zones)]
+    hosts = [Host("clc", "10.0.0.1", "clc")]
+    for z, zone in enumerate(zones):
+        hosts.append(Host("cc-%d" % (z + 1), "10.%d.0.2" % (z + 1), "cc", zone))
+        hosts.append(Host("sc-%d" % (z + 1), "10.%d.0.3" % (z + 1), "sc", zone))
+    for n in range(options.ncs):
+        z = n % len(zones)
+        i = n // len(zones)
+        hosts.append(Host("nc-%04d" % (n + 1), "10.%d.%d.%d" % (z + 1, 1 + i // 250, 10 + i % 250), "nc", zones[z]))
+    return zones, hosts
+
+
+def services_lines(hosts):
+    yield "SERVICE\teucalyptus\teucalyptus\tclc\tENABLED\t22\thttp://10.0.0.1:8773/services/Eucalyptus\tarn:euca:eucalyptus:::eucalyptus/"
+    yield "SERVICE\twalrusbackend\twalrus\twalrus\tENABLED\t22\thttp://10.0.0.1:8773/services/WalrusBackend\tarn:euca:eucalyptus:::walrusbackend/"
+    for host in hosts:
+        if host.role == "cc":
+            yield ("SERVICE\tcluster\t%s\t%s\tENABLED\t22\thttp://%s:8774/axis2/services/EucalyptusCC\tarn:euca:eucalyptus:%s:cluster:%s/"
+                   % (host.zone, host.name, host.ip, host.zone, host.name))
+        elif host.role == "sc":
+            yield ("SERVICE\tstorage\t%s\t%s\tENABLED\t22\thttp://%s:8773/services/Storage\tarn:euca:eucalyptus:%s:storage:%s/"
+                   % (host.zone, host.name, host.ip, host.zone, host.name))
+        elif host.role == "nc":
+            yield ("SERVICE\tnode\t%s\t%s\tENABLED\t22\thttp://%s:8775/axis2/services/EucalyptusNC\tarn:euca:bootstrap:%s:node:%s/"
+                   % (host.zone, host.ip, host.ip, host.zone, host.ip))
+
+
+def properties_lines(options, zones):
+    config = {"InstanceDnsServers": ["10.0.0.1"],
+              "PublicIps": ["172.16.0.10-172.16.%d.250" % max(options.zones - 1, 0)],
+              "Clusters": [{"Name": zone, "PrivateIps": ["10.%d.128.10-10.%d.191.250" % (z + 1, z + 1)]}
+                           for z, zone in enumerate(zones)]}
+    yield "PROPERTY\tcloud.network.network_configuration\t" + json.dumps(config, indent=2)
+    for p in range(options.properties):
+        yield "PROPERTY\tsynthetic.section%03d.property%05d\tvalue-%d" % (p % 100, p, p)
+
+
+def volume_lines(options, rng, zones, nodes, instances):
+    """
+    Yields the VOLUME and ATTACHMENT lines and fills instances with the
+    (zone, node) of every instance a volume is attached to.
+    """
+    for v in range(options.volumes):
+        zone = zones[v % len(zones)]
+        state = rng.choice(VOLUME_STATES)
+        created = BASE_EPOCH - rng.randint(0, 365 * 86400)
+        snapshot = "snap-%08x" % rng.randint(0, 0xffff) if rng.random() < 0.1 else ""
+        yield "VOLUME\tvol-%08x\t%d\t%s\t%s\t%s\t%s\tstandard\t" % (v, rng.randint(1, 100), snapshot, zone, state,
+                                                                  iso_time(created))
+        if state == "in-use" and nodes:
+            instance_id = "i-%08x" % rng.randint(0, max(options.volumes // 4, 1))
+            instances.setdefault(instance_id, (zone, rng.choice(nodes.get(zone) or nodes.values()[0])))
+            yield "ATTACHMENT\tvol-%08x\t%s\t/dev/vd%s\tattached\t%s" % (v, instance_id, chr(ord("b") + v % 20),
+                                                                         iso_time(created + 60))
+
+
+def instances_lines(instances):
+    for instance_id in sorted(instances):
+        zone, node = instances[instance_id]
+        yield ("INSTANCE\t%s\temi-00000001\teuca-%s\teuca-%s\trunning\tkey\t0\t\tm1.small\t%s\t%s\t"
+               "eki-00000001\teri-00000001\t\tmonitoring-disabled\t172.16.0.10\t10.1.128.10\t\t\tinstance-store"
+               % (instance_id, instance_id, instance_id, iso_time(BASE_EPOCH), zone))
+
+
+def nodes_lines(instances):
+    by_node = {}
+    for instance_id, (zone, node) in instances.items():
+        by_node.setdefault(node, []).append(instance_id)
+    for node in sorted(by_node, key=lambda n: n.name):
+        yield "NODE\t%s\t%s\t%s" % (node.zone, node.ip, " ".join(sorted(by_node[node])))
+
+
+def generate(options):
+    rng = random.Random(options.seed)
+    zones, hosts = make_hosts(options)
+    nodes = {}
+    for host in hosts:
+        if host.role == "nc":
+            nodes.setdefault(host.zone, []).append(host)
+    hosts_lines = ["127.0.0.1 localhost localhost.localdomain"] + ["%s %s %s.example.com" % (h.ip, h.name, h.name)
+                                                                 for h in hosts]
+    for host in hosts:
+        root = os.path.join(options.output, host.name)
+        write_file(root, "hostname", [host.name])
+        write_file(root, "etc/hosts", hosts_lines)
+        write_file(root, "ifconfig", ["eth0      Link encap:Ethernet",
+                                      "          inet addr:%s  Bcast:10.255.255.255  Mask:255.0.0.0" % host.ip,
+                                      "lo        Link encap:Local Loopback",
+                                      "          inet addr:127.0.0.1  Mask:255.0.0.0"])
+        skew = rng.randint(-options.skew, options.skew) if options.skew else 0
+        write_file(root, "date", [date_output(BASE_EPOCH + skew)])
+        conf = list(DEFAULT_CONF)
+        if rng.random() < options.drift:
+            conf.append(rng.choice(DRIFT_CONF))
+        write_file(root, "etc/eucalyptus/eucalyptus.conf", ["# synthetic"] + ["%s=%s" % kv for kv in conf])
+        if options.loglines:
+            write_file(root, "var/log/eucalyptus/" + LOG_FILES[host.role], log_lines(options, rng, host))
+        if host.role == "clc":
+            frontend = "sos_commands/eucafrontend"
+            write_file(root, frontend + "/euca-describe-services-all", services_lines(hosts))
+            write_file(root, frontend + "/euca-describe-properties", properties_lines(options, zones))
+            instances = {}
+            write_file(root, frontend + "/euca-describe-vols-v", volume_lines(options, rng, zones, nodes, instances))
+            write_file(root, frontend + "/euca-describe-instances-verbose", instances_lines(instances))
+            write_file(root, frontend + "/euca-describe-nodes", nodes_lines(instances))
+    return hosts
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog -o DIR [options]")
+    parser.add_option("-o", "--output", help="Directory the reports are written to.")
+    parser.add_option("--zones", type="int", default=2, help="Availability zones, each with a CC and a SC. [2]")
+    parser.add_option("--ncs", type="int", default=10, help="Node controllers. [10]")
+    parser.add_option("--properties", type="int", default=500, help="Cloud properties. [500]")
+    parser.add_option("--volumes", type="int", default=1000, help="Volumes. [1000]")
+    parser.add_option("--skew", type="int", default=5, help="Maximum clock skew of a host in seconds. [5]")
+    parser.add_option("--drift", type="float", default=0.05,
+                      help="Fraction of hosts whose eucalyptus.conf differs. [0.05]")
+    parser.add_option("--loglines", type="int", default=1000, help="Lines of the log of each host. [1000]")
+    parser.add_option("--logerrors", type="float", default=0.02,
+                      help="Fraction of the log lines that are errors. [0.02]")
+    parser.add_option("--seed", type="int", default=1, help="Random seed. [1]")
+    options, args = parser.parse_args()
+    if not options.output:
+        parser.error("The output directory is required.")
+    if options.zones < 1:
+        parser.error("At least one zone is required.")
+    if os.path.exists(options.output) and os.listdir(options.output):
+        parser.error("The output directory %s is not empty." % options.output)
+    hosts = generate(options)
+    print "Wrote %d reports to %s" % (len(hosts), options.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Extracts only the files the Eucalyptus plugins read from sosreport
+archives, one directory per report, into a case directory sxconsole runs
+the plugins on with -p.
+
+The files come from the REPORT_PATHS of the plugins, plus any --path
+given, and the files identifying each host (archive.IDENTITY_PATHS), so
+the reports get the same hostnames as fully extracted ones. The plugin
+classes are loaded on the installed sxconsole. The archives are
+extracted in parallel, each streamed once.
+
+$ python tools/sparseextract.py -o /var/tmp/case1 sosreport-*.tar.xz
+$ sxconsole -p /var/tmp/case1 -e eucatopology -e eucaconfig -e eucavolumes -e eucahugo
+
+@version   :  1.0
+"""
+import os
+import sys
+import time
+import optparse
+import multiprocessing
+
+from sxenv import PLUGINS, load_plugin_classes, require_sx
+
+
+def get_plugin_paths(names):
+    from sx.plugins.lib.eucalyptus import archive
+    return archive.get_report_paths(load_plugin_classes(names))
+
+
+def extract_one(args):
+    """
+    Extracts an archive for the worker pool. Returns (archive_path,
+    extracted paths, seconds, error).
+    """
+    from sx.plugins.lib.eucalyptus import archive
+    archive_path, output_dir, patterns = args
+    start = time.time()
+    try:
+        dest_dir = os.path.join(output_dir, archive.report_name(archive_path))
+        extracted = archive.extract(archive_path, dest_dir, patterns)
+    except (archive.ArchiveError, IOError, OSError), e:
+        return archive_path, [], time.time() - start, str(e)
+    return archive_path, extracted, time.time() - start, None
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog -o CASE_DIR [options] ARCHIVE...")
+    parser.add_option("-o", "--output", help="Directory the reports are extracted to.")
+    parser.add_option("-p", "--plugins", default=",".join(PLUGINS),
+                      help="Comma separated plugins whose files are extracted. [%s]" % ",".join(PLUGINS))
+    parser.add_option("--path", action="append", default=[], metavar="PATTERN",
+                      help="Another file to extract, relative to the report root. fnmatch patterns are allowed.")
+    parser.add_option("-j", "--jobs", type="int", default=multiprocessing.cpu_count(),
+                      help="Archives extracted at the same time. [%d]" % multiprocessing.cpu_count())
+    parser.add_option("-l", "--list", action="store_true", default=False,
+                      help="Show the paths that would be extracted and exit.")
+    opts, args = parser.parse_args()
+
+    try:
+        require_sx()
+    except ImportError, e:
+        parser.error("sxconsole must be installed to load the plugins: %s" % e)
+    patterns = sorted(set(get_plugin_paths([n.strip() for n in opts.plugins.split(",") if n.strip()]) + opts.path))
+    if opts.list:
+        from sx.plugins.lib.eucalyptus import archive
+        print "\n".join(sorted(set(patterns + archive.IDENTITY_PATHS)))
+        return 0
+    if not opts.output:
+        parser.error("The output directory is required.")
+    if not args:
+        parser.error("At least one archive is required.")
+
+    jobs = [(os.path.abspath(path), opts.output, patterns) for path in args]
+    if opts.jobs > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(opts.jobs, len(jobs)))
+        try:
+            results = pool.map(extract_one, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(extract_one, jobs)
+
+    failed = 0
+    for archive_path, extracted, seconds, error in results:
+        if error is not None:
+            failed += 1
+            print "%s: %s" % (archive_path, error)
+        else:
+            print "%s: %d files in %.2fs" % (archive_path, len(extracted), seconds)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
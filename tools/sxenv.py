@@ -0,0 +1,84 @@
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+The plugins of this tree loaded on the installed sxconsole, for the tools
+that run them outside of the sxconsole command (sparseextract.py and
+watch.py).
+
+The plugins are imported from this tree and run on sxconsole's own
+PluginBase. The shared library is taken from the sxconsole installation
+when it is installed there, and from this tree otherwise.
+
+@version   :  1.0
+"""
+import os
+import sys
+import logging
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PLUGINS_DIR = os.path.join(ROOT_DIR, "sx", "plugins")
+PLUGINS = ["eucatopology", "eucaconfig", "eucavolumes", "eucatimezone", "eucalogs", "eucahugo"]
+# The level of the status() messages, added by sxconsole's logging setup.
+STATUS = 25
+
+
+def require_sx():
+    """
+    Imports sxconsole's sx package. Raises ImportError if sxconsole isn't
+    installed.
+    """
+    import sx
+    import sx.plugins
+    import sx.plugins.lib
+    lib_dir = os.path.join(PLUGINS_DIR, "lib")
+    if lib_dir not in sx.plugins.lib.__path__:
+        sx.plugins.lib.__path__.append(lib_dir)
+    if not hasattr(logging.Logger, "status"):
+        # The sxconsole command adds it when it sets up its logging.
+        def status(self, msg, *args, **kwargs):
+            self.log(STATUS, msg, *args, **kwargs)
+        logging.addLevelName(STATUS, "STATUS")
+        logging.Logger.status = status
+    return sx
+
+
+def load_plugin_classes(names):
+    """
+    Returns the plugin classes of the plugin module names.
+    """
+    if PLUGINS_DIR not in sys.path:
+        sys.path.insert(0, PLUGINS_DIR)
+    return [getattr(__import__(name), name.capitalize()) for name in names]
+
+
+def load_plugins(names, output_dir, options):
+    """
+    Returns (name, plugin) tuples of the plugins, writing their reports
+    below output_dir.
+
+    @param options: (key, value) tuples, the key prefixed by a plugin
+    name and a dot for the options of that plugin only.
+    @type options: Array
+    """
+    plugins = []
+    for name, plugin_class in zip(names, load_plugin_classes(names)):
+        plugin = plugin_class(os.path.join(output_dir, name))
+        for key, value in options:
+            if "." in key:
+                plugin_name, key = key.split(".", 1)
+                if plugin_name != name:
+                    continue
+            plugin.setOptionValue(key, value)
+        plugins.append((name, plugin))
+    return plugins
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+# (c) Copyright 2016 Hewlett Packard Enterprise Development Company LP
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+"""
+Watches a drop directory and keeps the site of a case up to date as
+sosreports arrive, archives or extracted directories.
+
+Only the new reports are parsed, only the plugins that read one of their
+files rewrite their pages, and Eucahugo rebuilds the site after each
+arrival. The plugins run on the installed sxconsole, and the reports get
+their hostname and date from the report's own files as in an sxconsole
+run. Stop it with Ctrl-C.
+
+$ python tools/watch.py /srv/upload/case1 -o /var/tmp/case1-site -O eucahugo.renderer=builtin
+
+@version   :  1.0
+"""
+import os
+import sys
+import logging
+import optparse
+
+from sxenv import PLUGINS, ROOT_DIR, load_plugins, require_sx
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] DROP_DIR")
+    parser.add_option("-o", "--output", help="Directory the site is written to.")
+    parser.add_option("-c", "--case", help="Directory the archives are extracted to. [OUTPUT/reports]")
+    parser.add_option("-p", "--plugins", default=",".join(PLUGINS),
+                      help="Comma separated plugins to run. [%s]" % ",".join(PLUGINS))
+    parser.add_option("-O", "--option", action="append", default=[], metavar="[PLUGIN.]KEY=VALUE",
+                      help="Plugin option, for every plugin unless prefixed by a plugin name.")
+    parser.add_option("-i", "--interval", type="float", default=2.0,
+                      help="Seconds between two scans of the drop directory. [2]")
+    opts, args = parser.parse_args()
+    if len(args) != 1 or not os.path.isdir(args[0]):
+        parser.error("A drop directory is required.")
+    if not opts.output:
+        parser.error("The output directory is required.")
+
+    options = [("eucahugo.skelfiles", os.path.join(ROOT_DIR, "hugo"))]
+    for option in opts.option:
+        if "=" not in option:
+            parser.error("Invalid option %s, expected KEY=VALUE." % option)
+        options.append(tuple(option.split("=", 1)))
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-9s %(message)s")
+    try:
+        require_sx()
+    except ImportError, e:
+        parser.error("sxconsole must be installed to run the plugins: %s" % e)
+    from sx.plugins.lib.eucalyptus import archive
+    from sx.plugins.lib.eucalyptus import extracted
+    from sx.plugins.lib.eucalyptus import server
+    from sx.plugins.lib.eucalyptus import watch
+
+    output_dir = os.path.abspath(opts.output)
+    case_dir = os.path.abspath(opts.case or os.path.join(output_dir, "reports"))
+    for path in (output_dir, case_dir):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    plugins = [plugin for name, plugin in load_plugins([n.strip() for n in opts.plugins.split(",") if n.strip()],
+                                                       output_dir, options)]
+    drop = watch.DropDirectory(os.path.abspath(args[0]), case_dir, archive.get_report_paths(plugins))
+    logging.getLogger("sxconsole").status("Watching %s, hit Ctrl-C to stop" % args[0])
+    try:
+        watch.Watcher(plugins, extracted.ExtractedReport).run(drop, opts.interval)
+    except KeyboardInterrupt:
+        # Ctrl-C stops the watch and the server of eucahugo.serve=on.
+        server.stop_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())